@@ -1,42 +1,140 @@
 import calendar
 import datetime as dt
 import glob
+import json
+import logging
 import os
 import smtplib
+import sqlite3
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from email.message import EmailMessage
 from enum import Enum
+from functools import partial
 from pathlib import Path
+from typing import Any, Optional, cast
 
+import numpy as np
 import pandas as pd
 
+from noaa_metrics.constants.defaults import EACH_DATASET
 from noaa_metrics.constants.paths import (
     JSON_OUTPUT_DIR,
     REPORT_OUTPUT_DIR,
     REPORT_OUTPUT_FILEPATH,
 )
+from noaa_metrics.partitions import (
+    PartitionFormat,
+    find_partition,
+    partition_filepath,
+    partition_is_empty,
+    read_partition,
+)
+from noaa_metrics.report_cache import ReportCache, ReportTables, report_cache_key
+from noaa_metrics.rollups import (
+    ROLLUP_SKETCH_PRECISION,
+    read_rollups,
+    rollup_filepath,
+    rollup_ip_sketch,
+)
+from noaa_metrics.run_metrics import stage
+from noaa_metrics.util.dataclasses import ReportSpec, RollupFields
+from noaa_metrics.util.hyperloglog import HyperLogLog, hash_value, precision_for_error
 
+logger = logging.getLogger(__name__)
 
-def create_dataframe(
+# The columns the report tables are built from. Files are counted by rows, so the
+# file paths, by far the largest column, aren't read.
+REPORT_COLUMNS = ["date", "ip_address", "download_bytes", "dataset", "ip_location"]
+
+
+def read_partition_timed(
+    filepath: Path,
+    *,
+    columns: Optional[list[str]] = None,
+    dataset: Optional[str] = None,
+) -> tuple[Optional[pd.DataFrame], float]:
+    """Read a daily partition and time how long it took.
+
+    Returns no dataframe for days without downloads.
+    """
+    start = time.perf_counter()
+    data = None
+    if not partition_is_empty(filepath):
+        data = read_partition(filepath, columns=columns, dataset=dataset)
+    return data, time.perf_counter() - start
+
+
+def find_partitions(
     JSON_OUTPUT_DIR: Path, *, start_date: dt.date, end_date: dt.date
-) -> pd.DataFrame:
-    """Create dataframe from JSON files."""
-    dates = pd.date_range(start_date, end_date, freq="d").tolist()
-    filepaths = [
-        Path(JSON_OUTPUT_DIR / f"noaa-metrics-{date:%Y-%m-%d}.json") for date in dates
-    ]
-    expected_paths_nonexistent = [p for p in filepaths if not p.is_file()]
+) -> list[Path]:
+    """Find the daily partition file of each day of the period, in date order."""
+    dates = pd.date_range(start_date, end_date, freq="d").date.tolist()
+    filepaths = []
+    expected_paths_nonexistent = []
+    for date in dates:
+        filepath = find_partition(date, output_dir=JSON_OUTPUT_DIR)
+        if filepath is None:
+            expected_paths_nonexistent.append(
+                partition_filepath(
+                    date,
+                    partition_format=PartitionFormat.JSON,
+                    output_dir=JSON_OUTPUT_DIR,
+                )
+            )
+        else:
+            filepaths.append(filepath)
     if expected_paths_nonexistent:
         raise FileNotFoundError(
             f"Some expected paths don't exist: {expected_paths_nonexistent}"
         )
+    return filepaths
+
+
+def create_dataframe(
+    JSON_OUTPUT_DIR: Path,
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    columns: Optional[list[str]] = None,
+    dataset: Optional[str] = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """Create dataframe from the daily partition files.
+
+    Each day may be stored in any `PartitionFormat`. Only `columns` and the rows of
+    `dataset` are read, if given. With more than one worker, the files are read by
+    a process pool.
+    """
+    filepaths = find_partitions(
+        JSON_OUTPUT_DIR, start_date=start_date, end_date=end_date
+    )
+    read = partial(read_partition_timed, columns=columns, dataset=dataset)
+    results: Iterable[tuple[Optional[pd.DataFrame], float]]
+    if workers > 1:
+        # Files are parsed in parallel, but results still arrive in date order.
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(read, filepaths)
+    else:
+        executor = None
+        results = map(read, filepaths)
 
     dfs = []
-    for f in filepaths:
-        if os.path.getsize(f) > 2:
-            data = pd.read_json(f)
-            dfs.append(data)
     try:
-        log_df = pd.concat(dfs)
+        for f, (data, seconds) in zip(filepaths, results):
+            logger.info(f"Read {f} in {seconds:.3f}s")
+            if data is not None:
+                dfs.append(data)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    try:
+        # One concatenation, so the result is allocated once at its final size.
+        log_df = pd.concat(dfs, copy=False)
     except ValueError:
         raise Exception(
             (
@@ -53,14 +151,46 @@ def filter_by_dataset(log_df: pd.DataFrame, *, dataset: str) -> pd.DataFrame:
     return filtered_df
 
 
-def get_summary_stats(log_df: pd.DataFrame) -> pd.DataFrame:
-    """Collect stats for entire period."""
-    unique_users_df = log_df.agg({"ip_address": ["nunique"]})
-    total_download_bytes_df = log_df.agg({"download_bytes": ["sum"]})
-    total_files_df = log_df.agg({"file_path": ["count"]})
-    unique_users = unique_users_df.iloc[0][0]
-    total_download_bytes = total_download_bytes_df.iloc[0][0]
-    total_files = total_files_df.iloc[0][0]
+def create_rollups(
+    JSON_OUTPUT_DIR: Path, *, start_date: dt.date, end_date: dt.date
+) -> list[RollupFields]:
+    """Collect the daily rollups of the period."""
+    dates = pd.date_range(start_date, end_date, freq="d").date.tolist()
+    rollups = []
+    expected_paths_nonexistent = []
+    for date in dates:
+        day_rollups = read_rollups(date, output_dir=JSON_OUTPUT_DIR)
+        if day_rollups is None:
+            expected_paths_nonexistent.append(
+                rollup_filepath(date, output_dir=JSON_OUTPUT_DIR)
+            )
+        else:
+            rollups.extend(day_rollups)
+    if expected_paths_nonexistent:
+        raise FileNotFoundError(
+            f"Some expected paths don't exist: {expected_paths_nonexistent}"
+        )
+
+    if not rollups:
+        raise Exception(
+            (
+                "There are no rollups to merge. These day(s) may have no "
+                "downloads look in /share/logs/noaa-web/ingest to get more info."
+            )
+        )
+    return rollups
+
+
+def filter_rollups_by_dataset(
+    rollups: list[RollupFields], *, dataset: str
+) -> list[RollupFields]:
+    """Select only specified dataset."""
+    return [rollup for rollup in rollups if rollup.dataset == dataset]
+
+
+def format_summary_stats(
+    *, total_files: int, total_download_bytes: int, unique_users: int
+) -> pd.DataFrame:
     summary = {
         "Files Transmitted During Summary Period": total_files,
         "Volume in MB of files Transmitted During Summary Period": total_download_bytes,
@@ -71,23 +201,119 @@ def get_summary_stats(log_df: pd.DataFrame) -> pd.DataFrame:
     return summary_df
 
 
+def ip_sketches(
+    log_df: pd.DataFrame, by: Optional[str], *, error: float
+) -> dict[Any, HyperLogLog]:
+    """Sketch the distinct IP addresses of each group of `log_df`.
+
+    Each distinct address is hashed once; the registers of every group are then
+    filled in one vectorized pass. Without `by`, the only group is None.
+    """
+    precision = precision_for_error(error)
+    ip_codes, ip_addresses = pd.factorize(log_df["ip_address"])
+    ip_hashes = np.fromiter(
+        (hash_value(ip_address) for ip_address in ip_addresses),
+        dtype=np.uint64,
+        count=len(ip_addresses),
+    )[ip_codes]
+
+    index_bits = 64 - precision
+    indexes = (ip_hashes >> np.uint64(index_bits)).astype(np.intp)
+    rest = ip_hashes & np.uint64((1 << index_bits) - 1)
+    # The exponent is the bit length, exactly, since `rest` fits in a float.
+    ranks = (index_bits - np.frexp(rest.astype(np.float64))[1] + 1).astype(np.uint8)
+
+    if by is None:
+        group_codes, groups = np.zeros(len(log_df), dtype=np.intp), [None]
+    else:
+        group_codes, groups = pd.factorize(log_df[by])
+    register_keys = group_codes * 2**precision + indexes
+    register_ranks = pd.Series(ranks).groupby(register_keys).max()
+    registers = np.zeros(len(groups) * 2**precision, dtype=np.uint8)
+    registers[register_ranks.index.to_numpy()] = register_ranks.to_numpy()
+    registers = registers.reshape(len(groups), 2**precision)
+    return {
+        group: HyperLogLog(precision, bytearray(group_registers.tobytes()))
+        for group, group_registers in zip(groups, registers)
+    }
+
+
+def get_summary_stats(
+    log_df: pd.DataFrame, *, approximate_users: Optional[float] = None
+) -> pd.DataFrame:
+    """Collect stats for entire period.
+
+    With `approximate_users`, distinct users are estimated to that relative
+    error.
+    """
+    if approximate_users is None:
+        unique_users_df = log_df.agg({"ip_address": ["nunique"]})
+        unique_users = unique_users_df.iloc[0][0]
+    else:
+        unique_users = ip_sketches(log_df, None, error=approximate_users)[None].count()
+    total_download_bytes_df = log_df.agg({"download_bytes": ["sum"]})
+    total_files_df = log_df.agg({"file_path": ["count"]})
+    total_download_bytes = total_download_bytes_df.iloc[0][0]
+    total_files = total_files_df.iloc[0][0]
+    return format_summary_stats(
+        total_files=total_files,
+        total_download_bytes=total_download_bytes,
+        unique_users=unique_users,
+    )
+
+
+def merge_rollup_sketches(
+    rollups: Iterable[RollupFields], *, error: float
+) -> HyperLogLog:
+    """Merge the sketches of the rollups' IP addresses.
+
+    The addresses of rollups without a stored sketch are added directly, rather
+    than building a whole sketch of a few addresses to merge.
+    """
+    # Stored sketches are no more precise than this anyway.
+    merged = HyperLogLog(min(precision_for_error(error), ROLLUP_SKETCH_PRECISION))
+    for rollup in rollups:
+        if rollup.ip_sketch is None:
+            merged.update(rollup.ip_addresses)
+        else:
+            merged.merge(rollup_ip_sketch(rollup))
+    if merged.precision < precision_for_error(error):
+        logger.warning(
+            f"Rollup sketches can't count distinct users to within {error}; using"
+            f" precision {merged.precision} instead."
+        )
+    return merged
+
+
+def rollup_summary_stats(
+    rollups: list[RollupFields], *, approximate_users: Optional[float] = None
+) -> pd.DataFrame:
+    """Collect stats for entire period from daily rollups."""
+    if approximate_users is None:
+        ip_addresses: set[str] = set()
+        for rollup in rollups:
+            ip_addresses.update(rollup.ip_addresses)
+        unique_users = len(ip_addresses)
+    else:
+        unique_users = merge_rollup_sketches(rollups, error=approximate_users).count()
+    return format_summary_stats(
+        total_files=sum(rollup.files for rollup in rollups),
+        total_download_bytes=sum(rollup.download_bytes for rollup in rollups),
+        unique_users=unique_users,
+    )
+
+
 class AggregateBy(Enum):
     DATE = "date"
     DATASET = "dataset"
     TLD = "ip_location"
 
 
-def downloads_by(
-    log_df: pd.DataFrame, by: AggregateBy, *, column_header: str
+def format_downloads_by(
+    aggregated_df: pd.DataFrame, by: AggregateBy, *, column_header: str
 ) -> pd.DataFrame:
-    """Group log_df by dataset.
-
-    Count distinct users, sum total volume, and count number of files.
-    """
-    aggregated_df = log_df.groupby(by.value).agg(
-        {"ip_address": ["nunique"], "file_path": ["count"], "download_bytes": ["sum"]}
-    )
-    aggregated_df.columns = aggregated_df.columns.droplevel(0)
+    """Label the distinct users ("nunique"), files ("count") and volume ("sum") of
+    each group and add a total row."""
     aggregated_df = aggregated_df.rename(
         columns={
             "nunique": "Distinct Users",
@@ -103,6 +329,137 @@ def downloads_by(
     return aggregated_df
 
 
+def downloads_by(
+    log_df: pd.DataFrame,
+    by: AggregateBy,
+    *,
+    column_header: str,
+    approximate_users: Optional[float] = None,
+) -> pd.DataFrame:
+    """Group log_df by dataset.
+
+    Count distinct users, sum total volume, and count number of files. With
+    `approximate_users`, distinct users are estimated to that relative error.
+    """
+    aggregations = {"file_path": ["count"], "download_bytes": ["sum"]}
+    if approximate_users is None:
+        aggregations = {"ip_address": ["nunique"], **aggregations}
+    # Columns read from columnar partitions are categorical; leave out categories
+    # that have no rows, e.g. other datasets when filtering by one. Observed groups
+    # aren't sorted, so sort them explicitly.
+    aggregated_df = (
+        log_df.groupby(by.value, observed=True).agg(aggregations).sort_index()
+    )
+    aggregated_df.columns = aggregated_df.columns.droplevel(0)
+    if approximate_users is not None:
+        sketches = ip_sketches(log_df, by.value, error=approximate_users)
+        aggregated_df.insert(
+            0, "nunique", [sketches[key].count() for key in aggregated_df.index]
+        )
+    return format_downloads_by(aggregated_df, by, column_header=column_header)
+
+
+def aggregate_downloads(
+    log_df: pd.DataFrame, *, approximate_users: Optional[float] = None
+) -> tuple[pd.DataFrame, dict[AggregateBy, pd.DataFrame]]:
+    """Build the summary and every `downloads_by` table in one pass over `log_df`.
+
+    The IP addresses and the columns grouped by are converted to integer codes
+    once. Files and volume are totalled per (date, dataset, location) and summed up
+    into each table; distinct users are counted from the distinct pairs of those
+    groups and IP addresses. Returns the summary and the tables by each
+    `AggregateBy`, to be labelled with `format_downloads_by`.
+    """
+    ip_codes, ip_addresses = pd.factorize(log_df["ip_address"])
+    group_codes = {}
+    groups = {}
+    for by in AggregateBy:
+        group_codes[by], groups[by] = pd.factorize(log_df[by.value], sort=True)
+
+    # The rows of each (date, dataset, location) share a code.
+    combined_codes = np.zeros(len(log_df), dtype=np.int64)
+    for by in AggregateBy:
+        combined_codes = combined_codes * len(groups[by]) + group_codes[by]
+    fine_codes, fine_keys = pd.factorize(combined_codes)
+    fine_df = pd.DataFrame(
+        {
+            "count": np.bincount(fine_codes),
+            "sum": pd.Series(log_df["download_bytes"].to_numpy())
+            .groupby(fine_codes)
+            .sum()
+            .to_numpy(),
+        }
+    )
+    for by in reversed(AggregateBy):
+        fine_keys, fine_df[by.value] = divmod(fine_keys, len(groups[by]))
+
+    # Each distinct (group, IP address) pair, as a single integer
+    fine_users = pd.unique(fine_codes * len(ip_addresses) + ip_codes)
+    fine_user_groups, fine_user_ips = divmod(fine_users, len(ip_addresses))
+
+    tables = {}
+    for by in AggregateBy:
+        aggregated_df = fine_df.groupby(by.value)[["count", "sum"]].sum()
+        if approximate_users is None:
+            by_codes = fine_df[by.value].to_numpy()[fine_user_groups]
+            by_users = pd.unique(by_codes * len(ip_addresses) + fine_user_ips)
+            unique_users = np.bincount(
+                by_users // len(ip_addresses), minlength=len(groups[by])
+            )
+        else:
+            sketches = ip_sketches(log_df, by.value, error=approximate_users)
+            unique_users = np.array([sketches[group].count() for group in groups[by]])
+        aggregated_df.insert(0, "nunique", unique_users)
+        aggregated_df.index = pd.Index(groups[by], name=by.value)
+        tables[by] = aggregated_df
+
+    if approximate_users is None:
+        total_users = len(ip_addresses)
+    else:
+        total_users = ip_sketches(log_df, None, error=approximate_users)[None].count()
+    summary_df = format_summary_stats(
+        total_files=len(log_df),
+        total_download_bytes=log_df["download_bytes"].sum(),
+        unique_users=total_users,
+    )
+    return summary_df, tables
+
+
+def rollup_downloads_by(
+    rollups: list[RollupFields],
+    by: AggregateBy,
+    *,
+    column_header: str,
+    approximate_users: Optional[float] = None,
+) -> pd.DataFrame:
+    """Merge daily rollups into the same table as `downloads_by`."""
+    rollups_by: defaultdict[Any, list[RollupFields]] = defaultdict(list)
+    for rollup in rollups:
+        rollups_by[getattr(rollup, by.value)].append(rollup)
+
+    aggregated = {}
+    for key in sorted(rollups_by):
+        group_rollups = rollups_by[key]
+        if approximate_users is None:
+            unique_users = len(
+                set().union(*(rollup.ip_addresses for rollup in group_rollups))
+            )
+        else:
+            unique_users = merge_rollup_sketches(
+                group_rollups, error=approximate_users
+            ).count()
+        aggregated[key] = [
+            unique_users,
+            sum(rollup.files for rollup in group_rollups),
+            sum(rollup.download_bytes for rollup in group_rollups),
+        ]
+
+    aggregated_df = pd.DataFrame.from_dict(
+        aggregated, orient="index", columns=["nunique", "count", "sum"]
+    )
+    return format_downloads_by(aggregated_df, by, column_header=column_header)
+
+
 def df_to_csv(df: pd.DataFrame, *, header: str, output_csv: Path):
     with open(output_csv, "a") as file:
         file.write(header)
@@ -129,29 +486,258 @@ def send_mail(*, mailto: str, filename: str, subject: str, full_report: Path) ->
     with open(full_report) as fp:
         metrics_data = fp.read()
     msg.add_attachment(metrics_data, filename=filename)
-    with smtplib.SMTP("localhost") as s:
+    with stage("mail"), smtplib.SMTP("localhost") as s:
         s.send_message(msg)
 
 
-def aggregate_logs(
-    *, start_date: dt.date, end_date: dt.date, mailto: str, dataset: str
+def report_tables(
+    log_df: pd.DataFrame, *, approximate_users: Optional[float] = None
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Build the summary and the by day, dataset and location tables of a report."""
+    with stage("aggregate", records_in=len(log_df)):
+        summary_df, tables = aggregate_downloads(
+            log_df, approximate_users=approximate_users
+        )
+        by_day_df = format_downloads_by(
+            tables[AggregateBy.DATE], AggregateBy.DATE, column_header="Date"
+        )
+        by_dataset_df = format_downloads_by(
+            tables[AggregateBy.DATASET], AggregateBy.DATASET, column_header="Dataset"
+        )
+        by_location_df = format_downloads_by(
+            tables[AggregateBy.TLD], AggregateBy.TLD, column_header="Domain"
+        )
+    return summary_df, by_day_df, by_dataset_df, by_location_df
+
+
+def rollup_report_tables(
+    rollups: list[RollupFields], *, approximate_users: Optional[float] = None
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Build the same tables as `report_tables` from daily rollups."""
+    with stage("aggregate", records_in=len(rollups)):
+        summary_df = rollup_summary_stats(rollups, approximate_users=approximate_users)
+        by_day_df = rollup_downloads_by(
+            rollups,
+            AggregateBy.DATE,
+            column_header="Date",
+            approximate_users=approximate_users,
+        )
+        by_dataset_df = rollup_downloads_by(
+            rollups,
+            AggregateBy.DATASET,
+            column_header="Dataset",
+            approximate_users=approximate_users,
+        )
+        by_location_df = rollup_downloads_by(
+            rollups,
+            AggregateBy.TLD,
+            column_header="Domain",
+            approximate_users=approximate_users,
+        )
+    return summary_df, by_day_df, by_dataset_df, by_location_df
+
+
+class SpilledUsers:
+    """The distinct IP addresses of each group, kept in a SQLite database on disk
+    rather than in memory.
+
+    Addresses are added a day at a time, and only the first sighting of each in a
+    group is stored, so the database grows with the distinct users, not the
+    downloads. It's deleted on `close`.
+    """
+
+    def __init__(self, spill_dir: Optional[Path] = None) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory(dir=spill_dir)
+        self._db = sqlite3.connect(Path(self._tmp_dir.name) / "users.sqlite")
+        # A scratch database: nothing to recover if the run dies.
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute(
+            "CREATE TABLE users (grouping TEXT, grp TEXT, ip_address TEXT,"
+            " PRIMARY KEY (grouping, grp, ip_address)) WITHOUT ROWID"
+        )
+
+    def add(self, grouping: str, pairs: Iterable[tuple[str, str]]) -> None:
+        """Add the (group, IP address) pairs of a grouping, like "dataset"."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO users VALUES (?, ?, ?)",
+                ((grouping, group, ip_address) for group, ip_address in pairs),
+            )
+
+    def counts(self, grouping: str) -> dict[str, int]:
+        """Count the distinct IP addresses of each group of a grouping."""
+        return dict(
+            self._db.execute(
+                "SELECT grp, COUNT(*) FROM users WHERE grouping = ? GROUP BY grp",
+                (grouping,),
+            )
+        )
+
+    def close(self) -> None:
+        self._db.close()
+        self._tmp_dir.cleanup()
+
+
+def stream_report_tables(
+    JSON_OUTPUT_DIR: Path,
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    dataset: str = "all",
+    approximate_users: Optional[float] = None,
+    spill_dir: Optional[Path] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Build the same tables as `report_tables`, reading one day at a time.
+
+    Files and volume are added up per group as each day is read. A day's distinct
+    users are counted within it; those of each dataset, location and the whole
+    period are kept in `SpilledUsers` under `spill_dir`, or, with
+    `approximate_users`, as HyperLogLog sketches merged day by day. So memory is
+    bounded by a day of downloads and the number of groups, not by the period.
+    """
+    filepaths = find_partitions(
+        JSON_OUTPUT_DIR, start_date=start_date, end_date=end_date
+    )
+    # Group -> [distinct users, files, volume], for each table
+    totals: dict[AggregateBy, dict[Any, list[int]]] = {by: {} for by in AggregateBy}
+    sketches: dict[Optional[str], dict[Any, HyperLogLog]] = defaultdict(dict)
+    spilled_users = SpilledUsers(spill_dir) if approximate_users is None else None
+    found_downloads = False
+    try:
+        for filepath in filepaths:
+            with stage("read") as read_stage:
+                day_df, seconds = read_partition_timed(
+                    filepath,
+                    columns=REPORT_COLUMNS,
+                    dataset=None if dataset == "all" else dataset,
+                )
+                logger.info(f"Read {filepath} in {seconds:.3f}s")
+                if day_df is None:
+                    continue
+                found_downloads = True
+                read_stage.records_out = len(day_df)
+
+            with stage("aggregate", records_in=len(day_df)):
+                _add_day_totals(day_df, totals=totals)
+                if spilled_users is not None:
+                    _spill_day_users(day_df, totals=totals, spilled_users=spilled_users)
+                else:
+                    _sketch_day_users(
+                        day_df,
+                        totals=totals,
+                        sketches=sketches,
+                        error=cast(float, approximate_users),
+                    )
+
+        if not found_downloads:
+            raise Exception(
+                (
+                    "There are no files to aggregate. These day(s) may have no "
+                    "downloads look in /share/logs/noaa-web/ingest to get more info."
+                )
+            )
+
+        with stage("aggregate"):
+            if spilled_users is not None:
+                for by in (AggregateBy.DATASET, AggregateBy.TLD):
+                    for group, users in spilled_users.counts(by.value).items():
+                        totals[by][group][0] = users
+                unique_users = spilled_users.counts("total").get("", 0)
+            else:
+                for by in (AggregateBy.DATASET, AggregateBy.TLD):
+                    for group, sketch in sketches[by.value].items():
+                        totals[by][group][0] = sketch.count()
+                total_sketch = sketches[None].get(None)
+                unique_users = total_sketch.count() if total_sketch else 0
+    finally:
+        if spilled_users is not None:
+            spilled_users.close()
+
+    tables = {}
+    for by, column_header in (
+        (AggregateBy.DATE, "Date"),
+        (AggregateBy.DATASET, "Dataset"),
+        (AggregateBy.TLD, "Domain"),
+    ):
+        aggregated_df = pd.DataFrame.from_dict(
+            {group: totals[by][group] for group in sorted(totals[by])},
+            orient="index",
+            columns=["nunique", "count", "sum"],
+        )
+        tables[by] = format_downloads_by(aggregated_df, by, column_header=column_header)
+
+    by_date = totals[AggregateBy.DATE].values()
+    summary_df = format_summary_stats(
+        total_files=sum(files for _, files, _ in by_date),
+        total_download_bytes=sum(volume for _, _, volume in by_date),
+        unique_users=unique_users,
+    )
+    return (
+        summary_df,
+        tables[AggregateBy.DATE],
+        tables[AggregateBy.DATASET],
+        tables[AggregateBy.TLD],
+    )
+
+
+def _add_day_totals(
+    day_df: pd.DataFrame, *, totals: dict[AggregateBy, dict[Any, list[int]]]
 ) -> None:
-    """Aggregate log data for date period and dataset and send email report."""
-    start_date_str = start_date.isoformat()
-    end_date_str = end_date.isoformat()
-    log_df = create_dataframe(JSON_OUTPUT_DIR, start_date=start_date, end_date=end_date)
+    for by in AggregateBy:
+        day_totals = day_df.groupby(by.value, observed=True)["download_bytes"].agg(
+            ["size", "sum"]
+        )
+        for group, files, volume in day_totals.itertuples():
+            group_totals = totals[by].setdefault(group, [0, 0, 0])
+            group_totals[1] += files
+            group_totals[2] += volume
 
-    if dataset != "all":
-        log_df = filter_by_dataset(log_df, dataset=dataset)
 
+def _spill_day_users(
+    day_df: pd.DataFrame,
+    *,
+    totals: dict[AggregateBy, dict[Any, list[int]]],
+    spilled_users: SpilledUsers,
+) -> None:
+    # Each date is in a single day's file, so its users can be counted right away.
+    for date, users in day_df.groupby("date")["ip_address"].nunique().items():
+        totals[AggregateBy.DATE][date][0] = users
+    for by in (AggregateBy.DATASET, AggregateBy.TLD):
+        pairs_df = day_df[[by.value, "ip_address"]].drop_duplicates()
+        spilled_users.add(by.value, pairs_df.itertuples(index=False, name=None))
+    spilled_users.add(
+        "total", (("", ip_address) for ip_address in day_df["ip_address"].unique())
+    )
+
+
+def _sketch_day_users(
+    day_df: pd.DataFrame,
+    *,
+    totals: dict[AggregateBy, dict[Any, list[int]]],
+    sketches: dict[Optional[str], dict[Any, HyperLogLog]],
+    error: float,
+) -> None:
+    for date, sketch in ip_sketches(day_df, "date", error=error).items():
+        totals[AggregateBy.DATE][date][0] = sketch.count()
+    for by in (AggregateBy.DATASET.value, AggregateBy.TLD.value, None):
+        # Merged sketches are the same as sketches of the whole period.
+        for group, sketch in ip_sketches(day_df, by, error=error).items():
+            merged = sketches[by].get(group)
+            if merged is None:
+                sketches[by][group] = sketch
+            else:
+                merged.merge(sketch)
+
+
+def report_names(
+    *, start_date: dt.date, end_date: dt.date, dataset: str
+) -> tuple[str, str, str]:
+    """Get the summary header, email subject and file name of a report."""
     start_month = get_month_name(start_date)
     end_month = get_month_name(end_date)
     start_year = get_year(start_date)
     end_year = get_year(end_date)
-    summary_df = get_summary_stats(log_df)
-    by_dataset_df = downloads_by(log_df, AggregateBy.DATASET, column_header="Dataset")
-    by_day_df = downloads_by(log_df, AggregateBy.DATE, column_header="Date")
-    by_location_df = downloads_by(log_df, AggregateBy.TLD, column_header="Domain")
 
     if start_month == end_month and start_year == end_year:
         # Show the dataset if we are filtering by one.
@@ -173,25 +759,170 @@ def aggregate_logs(
             summary_header = f"NOAA Downloads {start_month} - {end_month}\n\n"
             subject = f"NOAA Downloads {start_month} {start_year} - {end_month} {end_year}"
             filename = f"NOAA-{start_month}-{start_year}-{end_month}-{end_year}.csv"
-    # remove existing file so that it doesn't concatenate multiple times
-    if os.path.exists(REPORT_OUTPUT_FILEPATH):
-        os.remove(REPORT_OUTPUT_FILEPATH)
+    return summary_header, subject, filename
 
-    summary_csv = df_to_csv(
-        summary_df, header=summary_header, output_csv=REPORT_OUTPUT_FILEPATH
-    )
-    by_day_csv = df_to_csv(
-        by_day_df, header="\nTransfers by Day\n\n", output_csv=REPORT_OUTPUT_FILEPATH
-    )
-    by_dataset_csv = df_to_csv(
-        by_dataset_df,
-        header="\nTransfers by Dataset\n\n",
-        output_csv=REPORT_OUTPUT_FILEPATH,
+
+def write_report(
+    tables: tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame],
+    *,
+    summary_header: str,
+    output_csv: Path,
+) -> None:
+    """Write the tables from `report_tables` to a CSV report."""
+    with stage("write_report"):
+        summary_df, by_day_df, by_dataset_df, by_location_df = tables
+        # remove existing file so that it doesn't concatenate multiple times
+        if os.path.exists(output_csv):
+            os.remove(output_csv)
+
+        summary_csv = df_to_csv(
+            summary_df, header=summary_header, output_csv=output_csv
+        )
+        by_day_csv = df_to_csv(
+            by_day_df, header="\nTransfers by Day\n\n", output_csv=output_csv
+        )
+        by_dataset_csv = df_to_csv(
+            by_dataset_df,
+            header="\nTransfers by Dataset\n\n",
+            output_csv=output_csv,
+        )
+        all_csv = df_to_csv(
+            by_location_df,
+            header="\nTransfers by Domain\n\n",
+            output_csv=output_csv,
+        )
+
+
+def build_report_tables(
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    dataset: str,
+    workers: int = 1,
+    from_rollups: bool = False,
+    approximate_users: Optional[float] = None,
+    streaming: bool = False,
+    spill_dir: Optional[Path] = None,
+) -> ReportTables:
+    """Read the period's daily files and build the tables of its report.
+
+    With `from_rollups`, the report is built from the daily rollups instead of
+    every download record. With `approximate_users`, distinct users are estimated
+    to that relative error with HyperLogLog sketches instead of counted exactly.
+    With `streaming`, the days are aggregated one at a time by
+    `stream_report_tables`, spilling distinct users to `spill_dir`, so periods
+    larger than memory can be reported on.
+    """
+    if streaming:
+        return stream_report_tables(
+            JSON_OUTPUT_DIR,
+            start_date=start_date,
+            end_date=end_date,
+            dataset=dataset,
+            approximate_users=approximate_users,
+            spill_dir=spill_dir,
+        )
+
+    if from_rollups:
+        with stage("read") as read_stage:
+            rollups = create_rollups(
+                JSON_OUTPUT_DIR, start_date=start_date, end_date=end_date
+            )
+            read_stage.records_out = len(rollups)
+        if dataset != "all":
+            rollups = filter_rollups_by_dataset(rollups, dataset=dataset)
+
+        return rollup_report_tables(rollups, approximate_users=approximate_users)
+
+    with stage("read") as read_stage:
+        log_df = create_dataframe(
+            JSON_OUTPUT_DIR,
+            start_date=start_date,
+            end_date=end_date,
+            columns=REPORT_COLUMNS,
+            dataset=None if dataset == "all" else dataset,
+            workers=workers,
+        )
+        read_stage.records_out = len(log_df)
+
+    return report_tables(log_df, approximate_users=approximate_users)
+
+
+def report_inputs(
+    JSON_OUTPUT_DIR: Path,
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    from_rollups: bool = False,
+) -> list[Path]:
+    """Get the daily files the report of the period is built from."""
+    if from_rollups:
+        dates = pd.date_range(start_date, end_date, freq="d").date.tolist()
+        return [rollup_filepath(date, output_dir=JSON_OUTPUT_DIR) for date in dates]
+    return find_partitions(JSON_OUTPUT_DIR, start_date=start_date, end_date=end_date)
+
+
+def aggregate_logs(
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    mailto: str,
+    dataset: str,
+    workers: int = 1,
+    from_rollups: bool = False,
+    approximate_users: Optional[float] = None,
+    streaming: bool = False,
+    spill_dir: Optional[Path] = None,
+    use_cache: bool = True,
+) -> None:
+    """Aggregate log data for date period and dataset and send email report.
+
+    The tables are built by `build_report_tables`, which takes the same options.
+    With `use_cache`, they're kept in a `ReportCache`, and a report whose daily
+    files haven't changed since it was last run reuses them instead.
+    """
+    cache = ReportCache() if use_cache else None
+    cache_key = None
+    tables = None
+    if cache is not None:
+        with stage("cache"):
+            cache_key = report_cache_key(
+                report_inputs(
+                    JSON_OUTPUT_DIR,
+                    start_date=start_date,
+                    end_date=end_date,
+                    from_rollups=from_rollups,
+                ),
+                start_date=start_date,
+                end_date=end_date,
+                dataset=dataset,
+                approximate_users=approximate_users,
+                from_rollups=from_rollups,
+            )
+            tables = cache.get(cache_key)
+        if tables is not None:
+            logger.info(f"Reusing the cached tables of {cache_key}")
+
+    if tables is None:
+        tables = build_report_tables(
+            start_date=start_date,
+            end_date=end_date,
+            dataset=dataset,
+            workers=workers,
+            from_rollups=from_rollups,
+            approximate_users=approximate_users,
+            streaming=streaming,
+            spill_dir=spill_dir,
+        )
+        if cache is not None and cache_key is not None:
+            with stage("cache"):
+                cache.set(cache_key, tables)
+
+    summary_header, subject, filename = report_names(
+        start_date=start_date, end_date=end_date, dataset=dataset
     )
-    all_csv = df_to_csv(
-        by_location_df,
-        header="\nTransfers by Domain\n\n",
-        output_csv=REPORT_OUTPUT_FILEPATH,
+    write_report(
+        tables, summary_header=summary_header, output_csv=REPORT_OUTPUT_FILEPATH
     )
 
     send_mail(
@@ -200,3 +931,185 @@ def aggregate_logs(
         subject=subject,
         full_report=REPORT_OUTPUT_FILEPATH,
     )
+
+
+def monthly_report_specs(
+    *, start_date: dt.date, end_date: dt.date, datasets: Iterable[str]
+) -> list[ReportSpec]:
+    """Specify a report of each dataset for each month from `start_date` to
+    `end_date`. The first and last months are cut short at those dates."""
+    specs: list[ReportSpec] = []
+    month_start = start_date
+    while month_start <= end_date:
+        days_in_month = calendar.monthrange(month_start.year, month_start.month)[1]
+        month_end = min(month_start.replace(day=days_in_month), end_date)
+        specs.extend(
+            ReportSpec(dataset=dataset, start_date=month_start, end_date=month_end)
+            for dataset in datasets
+        )
+        month_start = month_end + dt.timedelta(days=1)
+    return specs
+
+
+def read_report_specs(filepath: Path) -> list[ReportSpec]:
+    """Read a JSON list of `{"dataset": ..., "start_date": ..., "end_date": ...}`
+    report specs, with dates as YYYY-MM-DD."""
+    with open(filepath) as f:
+        spec_dicts = json.load(f)
+    return [
+        ReportSpec(
+            dataset=spec_dict["dataset"],
+            start_date=dt.date.fromisoformat(spec_dict["start_date"]),
+            end_date=dt.date.fromisoformat(spec_dict["end_date"]),
+        )
+        for spec_dict in spec_dicts
+    ]
+
+
+def _expand_report_specs(
+    report_specs: Iterable[ReportSpec], *, datasets: Iterable[str]
+) -> list[ReportSpec]:
+    """Replace the "each" dataset of specs with every dataset in `datasets`."""
+    expanded: list[ReportSpec] = []
+    for spec in report_specs:
+        if spec.dataset == EACH_DATASET:
+            expanded.extend(
+                ReportSpec(
+                    dataset=dataset, start_date=spec.start_date, end_date=spec.end_date
+                )
+                for dataset in sorted(datasets)
+            )
+        else:
+            expanded.append(spec)
+    return expanded
+
+
+def _report_rollups(
+    rollups: list[RollupFields], spec: ReportSpec
+) -> list[RollupFields]:
+    return [
+        rollup
+        for rollup in rollups
+        if spec.start_date <= rollup.date <= spec.end_date
+        and spec.dataset in ("all", rollup.dataset)
+    ]
+
+
+def _report_frame(
+    log_df: pd.DataFrame,
+    spec: ReportSpec,
+    *,
+    dates: np.ndarray,
+    positions_by_dataset: dict[Any, np.ndarray],
+) -> pd.DataFrame:
+    """Select the rows of a report from `log_df` without scanning all of them.
+
+    `dates` are the dates of the rows, in order, and `positions_by_dataset` the
+    positions of the rows of each dataset.
+    """
+    start, end = np.searchsorted(
+        dates,
+        [
+            np.datetime64(spec.start_date),
+            np.datetime64(spec.end_date + dt.timedelta(days=1)),
+        ],
+    )
+    if spec.dataset == "all":
+        return log_df.iloc[start:end]
+
+    positions = positions_by_dataset.get(spec.dataset, np.array([], dtype=np.intp))
+    return log_df.iloc[
+        positions[np.searchsorted(positions, start) : np.searchsorted(positions, end)]
+    ]
+
+
+def aggregate_logs_batch(
+    report_specs: list[ReportSpec],
+    *,
+    output_dir: Path = REPORT_OUTPUT_DIR,
+    mailto: Sequence[str] = (),
+    workers: int = 1,
+    from_rollups: bool = False,
+    approximate_users: Optional[float] = None,
+) -> list[Path]:
+    """Write a report for each of `report_specs`, loading the downloads only once.
+
+    The daily files (or rollups) of all the periods are read together, then split
+    in memory for each report. Each report is written to its own file in
+    `output_dir`, named like the attachment of `aggregate_logs`, and mailed to
+    `mailto` if any. Returns the paths of the reports, in the order specified.
+    """
+    start_date = min(spec.start_date for spec in report_specs)
+    end_date = max(spec.end_date for spec in report_specs)
+
+    all_tables: Iterable[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]
+    if from_rollups:
+        with stage("read") as read_stage:
+            rollups = create_rollups(
+                JSON_OUTPUT_DIR, start_date=start_date, end_date=end_date
+            )
+            read_stage.records_out = len(rollups)
+        report_specs = _expand_report_specs(
+            report_specs, datasets={rollup.dataset for rollup in rollups}
+        )
+        all_tables = (
+            rollup_report_tables(
+                _report_rollups(rollups, spec), approximate_users=approximate_users
+            )
+            for spec in report_specs
+        )
+    else:
+        with stage("read") as read_stage:
+            log_df = create_dataframe(
+                JSON_OUTPUT_DIR,
+                start_date=start_date,
+                end_date=end_date,
+                columns=REPORT_COLUMNS,
+                workers=workers,
+            )
+            read_stage.records_out = len(log_df)
+        # Days are read in order, so the rows of each period are contiguous.
+        dates = log_df["date"].to_numpy()
+        positions_by_dataset = log_df.groupby("dataset", observed=True).indices
+        report_specs = _expand_report_specs(report_specs, datasets=positions_by_dataset)
+        all_tables = (
+            report_tables(
+                _report_frame(
+                    log_df,
+                    spec,
+                    dates=dates,
+                    positions_by_dataset=positions_by_dataset,
+                ),
+                approximate_users=approximate_users,
+            )
+            for spec in report_specs
+        )
+
+    names = [
+        report_names(
+            start_date=spec.start_date, end_date=spec.end_date, dataset=spec.dataset
+        )
+        for spec in report_specs
+    ]
+    filenames = [filename for _, _, filename in names]
+    duplicates = sorted({f for f in filenames if filenames.count(f) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Some reports would be written to the same file: {duplicates}"
+        )
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_csvs = []
+    for (summary_header, subject, filename), tables in zip(names, all_tables):
+        output_csv = output_dir / filename
+        write_report(tables, summary_header=summary_header, output_csv=output_csv)
+        logger.info(f"Wrote {output_csv}")
+        if mailto:
+            send_mail(
+                mailto=", ".join(mailto),
+                filename=filename,
+                subject=subject,
+                full_report=output_csv,
+            )
+        output_csvs.append(output_csv)
+    return output_csvs
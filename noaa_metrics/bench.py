@@ -0,0 +1,292 @@
+import dataclasses
+import datetime as dt
+import json
+import random
+import socket
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any, Optional, TypeVar, cast
+
+from noaa_metrics.aggregate_logs import AggregateBy, create_dataframe, downloads_by
+from noaa_metrics.constants.country_codes import COUNTRY_CODES
+from noaa_metrics.constants.defaults import BENCH_TOLERANCE
+from noaa_metrics.constants.paths import DATASET_RULES_FILEPATH
+from noaa_metrics.datasets import DatasetRules
+from noaa_metrics.ingest_logs import (
+    enrich_raw_fields,
+    filter_raw_fields,
+    get_log_lines,
+    lines_to_raw_fields,
+    log_dc_to_partition_files,
+)
+from noaa_metrics.partitions import PartitionFormat
+from noaa_metrics.reverse_dns import DnsCache
+from noaa_metrics.run_metrics import peak_rss_bytes
+from noaa_metrics.util.batches import RecordBatch, StringColumn
+from noaa_metrics.util.dataclasses import BenchStage, RawLogFields
+
+T = TypeVar("T")
+
+_MONTHS = "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()
+_TOP_LEVEL_DOMAINS = sorted(domain for domain in COUNTRY_CODES if domain)
+
+
+def _skewed_choice(rng: random.Random, n: int) -> int:
+    """Pick one of `n` items, the first far more often than the last, like the
+    popularity of datasets and the activity of users."""
+    return min(int(n ** rng.random()) - 1, n - 1)
+
+
+def _ip_address(index: int) -> str:
+    # Starts at 1.0.0.0, and distinct for every index.
+    address = index + (1 << 24)
+    return ".".join(str(address >> shift & 255) for shift in (24, 16, 8, 0))
+
+
+def synthetic_log_lines(
+    *,
+    start_date: dt.date,
+    days: int,
+    lines_per_day: int,
+    users: int,
+    datasets: int,
+    seed: int = 0,
+) -> Iterator[str]:
+    """Generate `download.log` lines in log order, as `line_to_raw_fields` reads them.
+
+    Downloads come from `users` distinct IP addresses of `datasets` datasets, a few
+    of each far more often than the rest. Some requests failed, were for robots.txt
+    or match no dataset rule, so every filter has something to do.
+    """
+    rng = random.Random(seed)
+    for day in range(days):
+        date = start_date + dt.timedelta(days=day)
+        day_string = f"{date.day:02}/{_MONTHS[date.month - 1]}/{date.year}"
+        for line in range(lines_per_day):
+            seconds = line * 86400 // lines_per_day
+            timestamp = (
+                f"[{day_string}:{seconds // 3600:02}:{seconds // 60 % 60:02}:"
+                f"{seconds % 60:02} +0000]"
+            )
+            kind = rng.random()
+            if kind < 0.01:
+                file_path = "/usr/share/nginx/html/robots.txt"
+            elif kind < 0.02:
+                file_path = f"/usr/share/nginx/html/misc/file{rng.randrange(100)}.txt"
+            else:
+                dataset = _skewed_choice(rng, datasets)
+                file_path = (
+                    f"/usr/share/nginx/html/NOAA/G{dataset:05}/"
+                    f"{rng.randrange(1000):03}/file{rng.randrange(100)}.tar"
+                )
+            status = "200" if rng.random() < 0.9 else rng.choice(["206", "304", "404"])
+            yield (
+                f"{timestamp} {rng.random() * 10:.3f}"
+                f" {_ip_address(_skewed_choice(rng, users))}"
+                f" {rng.randrange(1, 10**8)} {file_path} {status}"
+            )
+
+
+def write_synthetic_log(log_file: Path, **kwargs: Any) -> None:
+    """Write `synthetic_log_lines` to `log_file`; takes the same arguments."""
+    with open(log_file, "w") as f:
+        for log_line in synthetic_log_lines(**kwargs):
+            f.write(f"{log_line}\n")
+
+
+def fake_resolver(ip_address: str) -> str:
+    """Resolve without a network: a hostname in a top-level domain picked by the
+    address, or none for one address in ten."""
+    last_octet = int(ip_address.rpartition(".")[2])
+    if last_octet % 10 == 0:
+        raise socket.herror(1, "Unknown host")
+    domain = _TOP_LEVEL_DOMAINS[last_octet % len(_TOP_LEVEL_DOMAINS)]
+    return f"host-{ip_address.replace('.', '-')}.{domain}"
+
+
+def _time_stage(
+    stages: list[BenchStage], name: str, func: Callable[[], T], *, rows: int
+) -> T:
+    start = time.perf_counter()
+    result = func()
+    stages.append(
+        BenchStage(
+            name=name,
+            seconds=time.perf_counter() - start,
+            rows=rows,
+            peak_rss_bytes=peak_rss_bytes(),
+        )
+    )
+    return result
+
+
+def run_benchmark(
+    *,
+    days: int = 3,
+    lines_per_day: int = 100_000,
+    users: int = 20_000,
+    datasets: int = 50,
+    partition_format: PartitionFormat = PartitionFormat.JSON,
+    dataset_rules_filepath: Path = DATASET_RULES_FILEPATH,
+    seed: int = 0,
+) -> list[BenchStage]:
+    """Time each stage of an ingest and report on a synthetic log.
+
+    Everything is written to a temporary directory, and IP addresses are resolved
+    with `fake_resolver` and a cache that's never saved, so the timings don't depend
+    on the network or earlier runs.
+    """
+    start_date = dt.date(2023, 1, 1)
+    end_date = start_date + dt.timedelta(days=days - 1)
+    stages: list[BenchStage] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = Path(tmp_dir) / "download.log"
+        output_dir = Path(tmp_dir) / "ingest"
+        output_dir.mkdir()
+        write_synthetic_log(
+            log_file,
+            start_date=start_date,
+            days=days,
+            lines_per_day=lines_per_day,
+            users=users,
+            datasets=datasets,
+            seed=seed,
+        )
+        lines = days * lines_per_day
+
+        log_lines = _time_stage(
+            stages,
+            "read",
+            lambda: list(
+                get_log_lines(
+                    start_date=start_date, end_date=end_date, log_file=log_file
+                )
+            ),
+            rows=lines,
+        )
+        raw_batch = _time_stage(
+            stages,
+            "parse",
+            lambda: RecordBatch.from_records(
+                RawLogFields,
+                filter_raw_fields(
+                    lines_to_raw_fields(log_lines),
+                    start_date=start_date,
+                    end_date=end_date,
+                ),
+            ),
+            rows=lines,
+        )
+        del log_lines
+        downloads = len(raw_batch)
+
+        dataset_rules = DatasetRules.from_file(dataset_rules_filepath)
+        log_batch = _time_stage(
+            stages,
+            "enrich",
+            lambda: enrich_raw_fields(
+                raw_batch,
+                datasets=dataset_rules.classify_column(
+                    cast(StringColumn, raw_batch.columns["file_path"])
+                ),
+                resolver=fake_resolver,
+                dns_cache=DnsCache(None),
+            ),
+            rows=downloads,
+        )
+        _time_stage(
+            stages,
+            "write",
+            lambda: log_dc_to_partition_files(
+                log_batch,
+                start_date=start_date,
+                end_date=end_date,
+                partition_format=partition_format,
+                output_dir=output_dir,
+            ),
+            rows=downloads,
+        )
+        del raw_batch, log_batch
+
+        log_df = _time_stage(
+            stages,
+            "create_dataframe",
+            lambda: create_dataframe(
+                output_dir, start_date=start_date, end_date=end_date
+            ),
+            rows=downloads,
+        )
+        _time_stage(
+            stages,
+            "downloads_by",
+            lambda: [
+                downloads_by(log_df, by, column_header=by.value) for by in AggregateBy
+            ],
+            rows=downloads,
+        )
+    return stages
+
+
+def save_baseline(stages: list[BenchStage], *, config: dict, filepath: Path) -> None:
+    with open(filepath, "w") as f:
+        json.dump(
+            {
+                "config": config,
+                "stages": [dataclasses.asdict(stage) for stage in stages],
+            },
+            f,
+            indent=2,
+        )
+
+
+def read_baseline(filepath: Path, *, config: dict) -> dict[str, BenchStage]:
+    """Read the stages of a baseline saved by `save_baseline`, by name.
+
+    Timings of a different configuration can't be compared, so that's a ValueError.
+    """
+    with open(filepath) as f:
+        baseline = json.load(f)
+    if baseline["config"] != config:
+        raise ValueError(
+            f"The baseline in {filepath} was run with {baseline['config']}, not"
+            f" {config}."
+        )
+    return {stage["name"]: BenchStage(**stage) for stage in baseline["stages"]}
+
+
+def regressed(
+    stage: BenchStage,
+    baseline_stage: Optional[BenchStage],
+    *,
+    tolerance: float = BENCH_TOLERANCE,
+) -> bool:
+    """Whether `stage` took more than `tolerance` longer than in the baseline."""
+    return baseline_stage is not None and stage.seconds > baseline_stage.seconds * (
+        1 + tolerance
+    )
+
+
+def format_stages(
+    pairs: list[tuple[BenchStage, Optional[BenchStage]]],
+    *,
+    tolerance: float = BENCH_TOLERANCE,
+) -> str:
+    """Tabulate the stages, each against its baseline if there is one."""
+    lines = [
+        f"{'Stage':<18}{'Seconds':>9}{'Rows/s':>13}{'Peak RSS':>11}{'Baseline':>10}"
+    ]
+    for stage, baseline_stage in pairs:
+        line = (
+            f"{stage.name:<18}{stage.seconds:>9.3f}"
+            f"{stage.rows / stage.seconds:>13,.0f}"
+            f"{stage.peak_rss_bytes / 2**20:>8,.0f}MiB"
+        )
+        if baseline_stage is not None:
+            change = stage.seconds / baseline_stage.seconds - 1
+            line += f"{change:>+10.0%}"
+            if regressed(stage, baseline_stage, tolerance=tolerance):
+                line += "  slower"
+        lines.append(line)
+    return "\n".join(lines)
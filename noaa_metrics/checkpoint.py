@@ -0,0 +1,56 @@
+import datetime as dt
+import json
+import os
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+from noaa_metrics.constants.paths import INGEST_CHECKPOINT_FILEPATH
+from noaa_metrics.util.dataclasses import IngestCheckpoint
+from noaa_metrics.util.json import DateFriendlyJSONEncoder
+
+# Longest log line we expect when looking back from a checkpoint's offset.
+_MAX_LINE_BYTES = 64 * 1024
+
+
+def read_checkpoint(
+    filepath: Path = INGEST_CHECKPOINT_FILEPATH,
+) -> Optional[IngestCheckpoint]:
+    if not filepath.is_file():
+        return None
+
+    with open(filepath) as f:
+        checkpoint_dict = json.load(f)
+    last_timestamp = checkpoint_dict["last_timestamp"]
+    if last_timestamp is not None:
+        checkpoint_dict["last_timestamp"] = dt.datetime.fromisoformat(last_timestamp)
+    return IngestCheckpoint(**checkpoint_dict)
+
+
+def write_checkpoint(
+    checkpoint: IngestCheckpoint, filepath: Path = INGEST_CHECKPOINT_FILEPATH
+) -> None:
+    """Write the checkpoint, replacing the previous one atomically."""
+    tmp_filepath = filepath.with_name(f".{filepath.name}.tmp")
+    with open(tmp_filepath, "w") as f:
+        json.dump(asdict(checkpoint), f, cls=DateFriendlyJSONEncoder)
+    os.replace(tmp_filepath, filepath)
+
+
+def line_before_offset(log_file: Path, offset: int) -> Optional[str]:
+    """Get the complete line ending just before byte `offset` of the log."""
+    if offset == 0 or os.path.getsize(log_file) < offset:
+        return None
+
+    with open(log_file, "rb") as f:
+        start = max(0, offset - _MAX_LINE_BYTES)
+        f.seek(start)
+        chunk = f.read(offset - start)
+    if not chunk.endswith(b"\n"):
+        return None
+
+    lines = chunk[:-1].rsplit(b"\n", 1)
+    if len(lines) == 1 and start > 0:
+        # The line is longer than we looked back.
+        return None
+    return lines[-1].decode()
@@ -1,15 +1,100 @@
 import datetime as dt
+import glob
+import logging
+from pathlib import Path
+from typing import BinaryIO, Optional, cast
 
 import click
 
-from noaa_metrics.aggregate_logs import aggregate_logs
-from noaa_metrics.ingest_logs import ingest_logs
+from noaa_metrics.constants.defaults import (
+    BENCH_TOLERANCE,
+    EACH_DATASET,
+    SERVE_CACHE_SIZE,
+    SERVE_REFRESH_SECONDS,
+)
+from noaa_metrics.constants.paths import (
+    DATASET_RULES_FILEPATH,
+    IP_DATABASE_FILEPATH,
+    NGINX_DOWNLOAD_LOG_FILE,
+    REPORT_OUTPUT_DIR,
+)
+from noaa_metrics.ingest_logs import (
+    LocationEngine,
+    LogParser,
+    ingest_logs,
+    ingest_logs_incremental,
+)
+from noaa_metrics.partitions import PartitionFormat
+from noaa_metrics.run_metrics import record_error, record_run
 from noaa_metrics.util.cli import DateType
+from noaa_metrics.util.dataclasses import ReportSpec
+
+
+class _RecordedGroup(click.Group):
+    """Records the error a command fails with in the run's metrics, if recorded.
 
+    The run is closed as a resource of the context, which doesn't see exceptions.
+    """
 
-@click.group()
-def cli() -> None:
-    pass
+    def invoke(self, ctx: click.Context):
+        try:
+            return super().invoke(ctx)
+        except BaseException as e:
+            # `ctx.exit()` raises even on success.
+            if not (isinstance(e, click.exceptions.Exit) and e.exit_code == 0):
+                record_error(e)
+            raise
+
+
+@click.group(cls=_RecordedGroup)
+@click.option("-v", "--verbose", help="Log progress information.", is_flag=True)
+@click.option(
+    "--metrics-json",
+    "summary_filepath",
+    help=(
+        "Write a JSON summary of the run to this file: the wall and CPU time,"
+        " records in and out and peak memory of each stage, the lines dropped by"
+        " each filter, and DNS cache hits and lookup latencies."
+    ),
+    type=click.Path(dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--metrics-prometheus",
+    "prometheus_filepath",
+    help=(
+        "Write the same metrics in the Prometheus textfile format to this file,"
+        " e.g. for the node exporter's textfile collector."
+    ),
+    type=click.Path(dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--profile",
+    "profile_filepath",
+    help="Profile the run with cProfile and dump the stats to this file.",
+    type=click.Path(dir_okay=False, path_type=Path),
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    verbose: bool,
+    summary_filepath: Optional[Path],
+    prometheus_filepath: Optional[Path],
+    profile_filepath: Optional[Path],
+) -> None:
+    logging.basicConfig(
+        level=logging.INFO if verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    if summary_filepath or prometheus_filepath or profile_filepath:
+        # Written out when the command finishes, or fails; see `_RecordedGroup`.
+        ctx.with_resource(
+            record_run(
+                cast(str, ctx.invoked_subcommand),
+                summary_filepath=summary_filepath,
+                prometheus_filepath=prometheus_filepath,
+                profile_filepath=profile_filepath,
+            )
+        )
 
 
 @cli.command(
@@ -27,10 +112,174 @@ def cli() -> None:
     help="End date (YYYY-MM-DD)",
     type=DateType(),
 )
-def ingest(start_date: dt.date, end_date: dt.date):
+@click.option(
+    "-f",
+    "--format",
+    "partition_format",
+    help="File format of the daily output files.",
+    type=click.Choice([f.value for f in PartitionFormat]),
+    default=PartitionFormat.JSON.value,
+    show_default=True,
+)
+@click.option(
+    "-i",
+    "--incremental",
+    help=(
+        "Ingest only the lines logged since the last incremental run, merging them"
+        " into the existing daily files. Without a previous run, start at"
+        " --start_date. --end_date is ignored."
+    ),
+    is_flag=True,
+)
+@click.option(
+    "-p",
+    "--parser",
+    help=(
+        "Parse the log one line at a time, or in vectorized chunks of lines"
+        " (faster for large logs). Ignored with --incremental."
+    ),
+    type=click.Choice([p.value for p in LogParser]),
+    default=LogParser.LINE.value,
+    show_default=True,
+)
+@click.option(
+    "-D",
+    "--dataset-rules",
+    "dataset_rules_filepath",
+    help=(
+        "JSON file of rules telling which dataset a downloaded file belongs to."
+        " Defaults to the rules shipped with this package."
+    ),
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=DATASET_RULES_FILEPATH,
+)
+@click.option(
+    "-l",
+    "--log",
+    "log_patterns",
+    help=(
+        "Log file to ingest, or a glob of them like 'download.log*'. Can be given"
+        " more than once. Gzipped logs are read as they are, and only logs with"
+        " lines in the date range are read. Defaults to download.log. Ignored with"
+        " --incremental."
+    ),
+    multiple=True,
+)
+@click.option(
+    "-w",
+    "--workers",
+    help=(
+        "Number of processes parsing the log in parallel. With more than one,"
+        " --parser is ignored. Ignored with --incremental."
+    ),
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "-L",
+    "--location-engine",
+    help=(
+        "Locate downloads by the country code domain of the reverse DNS hostname,"
+        " or by the country of the address in a local IP database (no network"
+        " lookups)."
+    ),
+    type=click.Choice([e.value for e in LocationEngine]),
+    default=LocationEngine.DNS.value,
+    show_default=True,
+)
+@click.option(
+    "--ip-database",
+    "ip_database_filepath",
+    help=(
+        "CSV of 'network,country_code' or 'first_ip,last_ip,country_code' rows,"
+        " optionally gzipped, for --location-engine ip-database."
+    ),
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=IP_DATABASE_FILEPATH,
+    show_default=True,
+)
+def ingest(
+    start_date: dt.date,
+    end_date: dt.date,
+    partition_format: str,
+    incremental: bool,
+    parser: str,
+    dataset_rules_filepath: Path,
+    log_patterns: tuple[str, ...],
+    workers: int,
+    location_engine: str,
+    ip_database_filepath: Path,
+):
     """Ingest NOAA downloads log and write to JSON."""
 
-    ingest_logs(start_date=start_date, end_date=end_date)
+    if (
+        LocationEngine(location_engine) == LocationEngine.IP_DATABASE
+        and not ip_database_filepath.is_file()
+    ):
+        raise click.BadParameter(
+            f"{ip_database_filepath} does not exist.", param_hint="--ip-database"
+        )
+
+    if incremental:
+        ingest_logs_incremental(
+            start_date=start_date,
+            partition_format=PartitionFormat(partition_format),
+            dataset_rules_filepath=dataset_rules_filepath,
+            location_engine=LocationEngine(location_engine),
+            ip_database_filepath=ip_database_filepath,
+        )
+        return
+
+    log_files = [NGINX_DOWNLOAD_LOG_FILE]
+    if log_patterns:
+        log_files = sorted(
+            {Path(p) for pattern in log_patterns for p in glob.glob(pattern)}
+        )
+        if not log_files:
+            raise click.BadParameter(
+                f"No files match {log_patterns}.", param_hint="--log"
+            )
+
+    ingest_logs(
+        start_date=start_date,
+        end_date=end_date,
+        partition_format=PartitionFormat(partition_format),
+        parser=LogParser(parser),
+        dataset_rules_filepath=dataset_rules_filepath,
+        workers=workers,
+        log_files=log_files,
+        location_engine=LocationEngine(location_engine),
+        ip_database_filepath=ip_database_filepath,
+    )
+
+
+@cli.command(
+    short_help="Convert nginx access logs to the download log format.",
+)
+@click.argument(
+    "access_logs",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-o",
+    "--output",
+    help="Download log to write, or '-' for stdout.",
+    type=click.File("wb"),
+    default="-",
+    show_default=True,
+)
+def convert(access_logs: tuple[Path, ...], output: BinaryIO):
+    """Convert nginx access logs to the download log format.
+
+    For recovering days when download.log wasn't written. ACCESS_LOGS may be
+    gzipped, and are converted in the order given.
+    """
+    from noaa_metrics.convert_logs import convert_logs
+
+    convert_logs(access_logs, output)
 
 
 @cli.command(
@@ -55,13 +304,383 @@ def ingest(start_date: dt.date, end_date: dt.date):
     help="Select a specific dataset or 'all' (default).",
     default="all",
 )
-def report(start_date, end_date, mailto, dataset):
+@click.option(
+    "-w",
+    "--workers",
+    help="Number of processes reading the daily files in parallel.",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "-r",
+    "--from-rollups",
+    help="Build the report from the daily rollups instead of every download.",
+    is_flag=True,
+)
+@click.option(
+    "-a",
+    "--approximate-users",
+    help=(
+        "Estimate distinct users with HyperLogLog sketches to this relative error"
+        " (e.g. 0.01) instead of counting them exactly."
+    ),
+    type=click.FloatRange(min=0, max=1, min_open=True, max_open=True),
+)
+@click.option(
+    "--streaming",
+    help=(
+        "Aggregate one day at a time, so memory is bounded by the number of"
+        " datasets, locations and users rather than downloads. Ignores --workers."
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--spill-dir",
+    help=(
+        "Directory for the temporary database of distinct users when streaming"
+        " (default: the system temporary directory)."
+    ),
+    type=click.Path(file_okay=False, exists=True, path_type=Path),
+)
+@click.option(
+    "--no-cache",
+    help=(
+        "Rebuild the report even if an identical report was run since its daily"
+        " files last changed."
+    ),
+    is_flag=True,
+)
+def report(
+    start_date,
+    end_date,
+    mailto,
+    dataset,
+    workers,
+    from_rollups,
+    approximate_users,
+    streaming,
+    spill_dir,
+    no_cache,
+):
     """Generate NOAA downlaods metric report."""
+    if streaming and from_rollups:
+        raise click.UsageError("--streaming and --from-rollups can't be combined.")
+    # Imported here, like the other heavy modules, so the CLI starts quickly.
+    from noaa_metrics.aggregate_logs import aggregate_logs
 
     aggregate_logs(
-        start_date=start_date, end_date=end_date, mailto=mailto, dataset=dataset
+        start_date=start_date,
+        end_date=end_date,
+        mailto=mailto,
+        dataset=dataset,
+        workers=workers,
+        from_rollups=from_rollups,
+        approximate_users=approximate_users,
+        streaming=streaming,
+        spill_dir=spill_dir,
+        use_cache=not no_cache,
+    )
+
+
+@cli.command(
+    short_help="Generate many NOAA downloads metric reports at once.",
+)
+@click.option(
+    "-s",
+    "--start_date",
+    help="Start date (YYYY-MM-DD)",
+    type=DateType(),
+)
+@click.option(
+    "-e",
+    "--end_date",
+    help="End date (YYYY-MM-DD)",
+    type=DateType(),
+)
+@click.option(
+    "-d",
+    "--dataset",
+    "datasets",
+    help=(
+        "Dataset to report on, 'all' for all of them together, or"
+        f" '{EACH_DATASET}' for a report of each dataset with downloads. Can be"
+        " given more than once. Defaults to 'all'."
+    ),
+    multiple=True,
+)
+@click.option(
+    "--monthly",
+    help="Report on each month from --start_date to --end_date separately.",
+    is_flag=True,
+)
+@click.option(
+    "--specs",
+    "specs_filepath",
+    help=(
+        "JSON list of reports to generate, as"
+        ' {"dataset": ..., "start_date": ..., "end_date": ...} objects. Replaces'
+        " the other options choosing reports."
+    ),
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    help="Directory to write the reports to, each to its own file.",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=REPORT_OUTPUT_DIR,
+    show_default=True,
+)
+@click.option("-m", "--mailto", help="Email(s) to send the reports to.", multiple=True)
+@click.option(
+    "-w",
+    "--workers",
+    help="Number of processes reading the daily files in parallel.",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "-r",
+    "--from-rollups",
+    help="Build the reports from the daily rollups instead of every download.",
+    is_flag=True,
+)
+@click.option(
+    "-a",
+    "--approximate-users",
+    help=(
+        "Estimate distinct users with HyperLogLog sketches to this relative error"
+        " (e.g. 0.01) instead of counting them exactly."
+    ),
+    type=click.FloatRange(min=0, max=1, min_open=True, max_open=True),
+)
+def batch_report(
+    start_date: dt.date,
+    end_date: dt.date,
+    datasets: tuple[str, ...],
+    monthly: bool,
+    specs_filepath: Optional[Path],
+    output_dir: Path,
+    mailto: tuple[str, ...],
+    workers: int,
+    from_rollups: bool,
+    approximate_users: Optional[float],
+):
+    """Generate many NOAA downloads metric reports at once.
+
+    The downloads of all the reports are read only once. Reports are mailed only
+    if --mailto is given.
+    """
+    from noaa_metrics.aggregate_logs import (
+        aggregate_logs_batch,
+        monthly_report_specs,
+        read_report_specs,
     )
 
+    if specs_filepath is not None:
+        report_specs = read_report_specs(specs_filepath)
+    else:
+        if start_date is None or end_date is None:
+            raise click.UsageError(
+                "--start_date and --end_date are required without --specs."
+            )
+        datasets = datasets or ("all",)
+        if monthly:
+            report_specs = monthly_report_specs(
+                start_date=start_date, end_date=end_date, datasets=datasets
+            )
+        else:
+            report_specs = [
+                ReportSpec(dataset=dataset, start_date=start_date, end_date=end_date)
+                for dataset in datasets
+            ]
+    if not report_specs:
+        raise click.UsageError("No reports to generate.")
+
+    aggregate_logs_batch(
+        report_specs,
+        output_dir=output_dir,
+        mailto=mailto,
+        workers=workers,
+        from_rollups=from_rollups,
+        approximate_users=approximate_users,
+    )
+
+
+@cli.command(
+    short_help="Serve NOAA downloads metrics over HTTP.",
+)
+@click.option(
+    "-H",
+    "--host",
+    help="Address to listen on.",
+    default="127.0.0.1",
+    show_default=True,
+)
+@click.option(
+    "-p",
+    "--port",
+    help="Port to listen on.",
+    type=click.IntRange(min=0, max=65535),
+    default=8000,
+    show_default=True,
+)
+@click.option(
+    "--refresh-seconds",
+    help="How often to check for new or changed daily files.",
+    type=click.FloatRange(min=0, min_open=True),
+    default=SERVE_REFRESH_SECONDS,
+    show_default=True,
+)
+@click.option(
+    "--cache-size",
+    help="Number of query results to keep cached.",
+    type=click.IntRange(min=0),
+    default=SERVE_CACHE_SIZE,
+    show_default=True,
+)
+def serve(host: str, port: int, refresh_seconds: float, cache_size: int):
+    """Serve NOAA downloads metrics over HTTP.
+
+    The daily files are loaded into memory once, and reloaded only when they
+    change. GET /summary and GET /downloads?by=date|dataset|ip_location answer with
+    the report's tables as JSON, for any start_date, end_date and dataset given
+    as query parameters.
+    """
+    from noaa_metrics.serve import serve_metrics
+
+    serve_metrics(
+        host=host,
+        port=port,
+        refresh_seconds=refresh_seconds,
+        cache_size=cache_size,
+    )
+
+
+@cli.command(
+    short_help="Benchmark ingest and report on a synthetic log.",
+)
+@click.option(
+    "--days",
+    help="Number of days in the synthetic log.",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+)
+@click.option(
+    "--lines-per-day",
+    help="Number of log lines per day.",
+    type=click.IntRange(min=1),
+    default=100_000,
+    show_default=True,
+)
+@click.option(
+    "--users",
+    help="Number of distinct IP addresses.",
+    type=click.IntRange(min=1),
+    default=20_000,
+    show_default=True,
+)
+@click.option(
+    "--datasets",
+    help="Number of distinct datasets.",
+    type=click.IntRange(min=1),
+    default=50,
+    show_default=True,
+)
+@click.option(
+    "-f",
+    "--format",
+    "partition_format",
+    help="File format of the daily files.",
+    type=click.Choice([f.value for f in PartitionFormat]),
+    default=PartitionFormat.JSON.value,
+    show_default=True,
+)
+@click.option(
+    "-b",
+    "--baseline",
+    "baseline_filepath",
+    help="JSON file of an earlier run to compare against.",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--save-baseline",
+    "save_baseline_filepath",
+    help="Save this run to a JSON file, to compare later runs against.",
+    type=click.Path(dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-t",
+    "--tolerance",
+    help="How much slower than the baseline a stage may be, as a fraction.",
+    type=click.FloatRange(min=0),
+    default=BENCH_TOLERANCE,
+    show_default=True,
+)
+def bench(
+    days: int,
+    lines_per_day: int,
+    users: int,
+    datasets: int,
+    partition_format: str,
+    baseline_filepath: Optional[Path],
+    save_baseline_filepath: Optional[Path],
+    tolerance: float,
+):
+    """Benchmark ingest and report on a synthetic log.
+
+    Times reading, parsing, enriching and writing the log, then reading the daily
+    files back and aggregating them, and reports throughput and peak memory. IP
+    addresses are resolved by a fake resolver, and nothing is written outside a
+    temporary directory. With --baseline, exits with an error if any stage is
+    slower than in the baseline by more than --tolerance.
+    """
+    from noaa_metrics.bench import (
+        format_stages,
+        read_baseline,
+        regressed,
+        run_benchmark,
+        save_baseline,
+    )
+
+    config = {
+        "days": days,
+        "lines_per_day": lines_per_day,
+        "users": users,
+        "datasets": datasets,
+        "partition_format": partition_format,
+    }
+    baseline_stages = {}
+    if baseline_filepath is not None:
+        try:
+            baseline_stages = read_baseline(baseline_filepath, config=config)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--baseline")
+
+    stages = run_benchmark(
+        days=days,
+        lines_per_day=lines_per_day,
+        users=users,
+        datasets=datasets,
+        partition_format=PartitionFormat(partition_format),
+    )
+    pairs = [(stage, baseline_stages.get(stage.name)) for stage in stages]
+    click.echo(format_stages(pairs, tolerance=tolerance))
+
+    if save_baseline_filepath is not None:
+        save_baseline(stages, config=config, filepath=save_baseline_filepath)
+
+    slower = [
+        stage.name
+        for stage, baseline_stage in pairs
+        if regressed(stage, baseline_stage, tolerance=tolerance)
+    ]
+    if slower:
+        raise click.ClickException(f"Slower than the baseline: {', '.join(slower)}.")
+
 
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,13 @@
+# Defaults of the CLI's options. They're kept apart from the modules using them so
+# the CLI can show them without importing pandas.
+
+# The dataset of a batch report spec that stands for one report per dataset
+EACH_DATASET = "each"
+
+# How often `serve` checks for new or changed daily files, and how many query
+# results it keeps cached
+SERVE_REFRESH_SECONDS = 60.0
+SERVE_CACHE_SIZE = 1024
+
+# How much slower than its baseline a `bench` stage may be, as a fraction
+BENCH_TOLERANCE = 0.2
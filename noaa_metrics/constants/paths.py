@@ -12,3 +12,18 @@ PROJECT_DIR = PACKAGE_DIR.parent
 JSON_OUTPUT_DIR = LOG_DIR / "ingest"
 REPORT_OUTPUT_DIR = LOG_DIR / "report"
 REPORT_OUTPUT_FILEPATH = REPORT_OUTPUT_DIR / "noaa-downloads.csv"
+
+# Tables of earlier reports, reused when a report is run again on the same inputs
+REPORT_CACHE_DIR = LOG_DIR / "report-cache"
+
+# Where incremental ingest left off in the download log
+INGEST_CHECKPOINT_FILEPATH = LOG_DIR / "ingest-checkpoint.json"
+
+# Reverse DNS lookups shared across runs
+DNS_CACHE_FILEPATH = LOG_DIR / "dns-cache.json"
+
+# IP address ranges and their countries, for locating downloads without DNS
+IP_DATABASE_FILEPATH = LOG_DIR / "ip-country.csv"
+
+# Rules for telling which dataset a downloaded file belongs to
+DATASET_RULES_FILEPATH = PACKAGE_DIR / "constants" / "dataset_rules.json"
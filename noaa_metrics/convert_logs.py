@@ -0,0 +1,87 @@
+import re
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+from noaa_metrics.ingest_logs import open_log
+
+# Lines are converted a chunk of about this many bytes at a time.
+CONVERT_CHUNK_BYTES = 8 * 1024 * 1024
+
+DUMMY_REQUEST_TIME = b"1.234"
+FILENAME_PREFIX = b"/usr/share/nginx/html"
+
+# '$remote_addr - $remote_user [$time_local] "$request" $status $body_bytes_sent ...'
+# Fields can't span lines, so a whole chunk of lines is searched at once. Every line
+# is consumed, matching or not, so the search never restarts inside a line. No
+# possessive quantifiers; they need Python 3.11.
+_ACCESS_LOG_LINE_REGEX = re.compile(
+    rb'(?:([^ \n]+) [^ \n]+ [^ \n]+ (\[.*\]) ("[^"\n]+") ([^ \n]+) ([^ \n]+))?'
+    rb"[^\n]*\n?"
+)
+_GET_PREFIX = b'"GET '
+
+
+def _file_path_has_extension(file_path: bytes) -> bool:
+    """Check for an extension, like the script's '([^\\ ]+\\.[a-zA-Z0-9]+)$'."""
+    head, dot, extension = file_path.rpartition(b".")
+    return bool(dot) and extension.isalnum() and head[-1:] not in (b"", b"\\", b" ")
+
+
+def convert_access_lines(access_lines: bytes) -> bytes:
+    """Convert a chunk of whole access log lines to download log lines.
+
+    Follows `scripts/parse_nginx_lines.sh`: only GET requests for paths ending in a
+    file extension are kept. The access log has no request time, so a dummy one is
+    filled in.
+    """
+    download_lines = []
+    for (
+        ip_address,
+        timestamp,
+        request,
+        status,
+        body_bytes,
+    ) in _ACCESS_LOG_LINE_REGEX.findall(access_lines):
+        # '"GET /NOAA/G02158/file.tar HTTP/1.1"'. Lines that don't match at all
+        # have no fields.
+        if not request.startswith(_GET_PREFIX):
+            continue
+        file_path, space, _ = request[len(_GET_PREFIX) :].partition(b" ")
+        if not (file_path and space and _file_path_has_extension(file_path)):
+            continue
+
+        download_lines.append(
+            b"%s %s %s %s %s%s %s\n"
+            % (
+                timestamp,
+                DUMMY_REQUEST_TIME,
+                ip_address,
+                body_bytes,
+                FILENAME_PREFIX,
+                file_path,
+                status,
+            )
+        )
+    return b"".join(download_lines)
+
+
+def read_access_chunks(
+    access_log_files: Iterable[Path], *, chunk_bytes: int = CONVERT_CHUNK_BYTES
+) -> Iterator[bytes]:
+    """Lazily read the logs in chunks of whole lines. Gzipped logs are streamed."""
+    for access_log_file in access_log_files:
+        with open_log(access_log_file) as f:
+            while access_lines := f.readlines(chunk_bytes):
+                yield b"".join(access_lines)
+
+
+def convert_logs(
+    access_log_files: Iterable[Path],
+    download_log: BinaryIO,
+    *,
+    chunk_bytes: int = CONVERT_CHUNK_BYTES,
+) -> None:
+    """Write the download log lines for `access_log_files`, in order."""
+    for access_lines in read_access_chunks(access_log_files, chunk_bytes=chunk_bytes):
+        download_log.write(convert_access_lines(access_lines))
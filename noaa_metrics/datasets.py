@@ -0,0 +1,113 @@
+import json
+import re
+from pathlib import Path
+from typing import Optional, cast
+
+from noaa_metrics.constants.paths import DATASET_RULES_FILEPATH
+from noaa_metrics.util.batches import StringColumn
+
+# Downloads that match no rule are counted under this dataset.
+UNKNOWN_DATASET = "Unknown"
+
+_DATASET_GROUP = "dataset"
+
+
+class DatasetRules:
+    """Tell which dataset a downloaded file belongs to, from an ordered list of rules.
+
+    Each rule has a regex `pattern`, searched for in the file path, and either a
+    fixed `dataset` name or a `(?P<dataset>...)` group in the pattern to take the
+    name from. The first rule that matches wins.
+
+    All rules are compiled into a single regex. A few thousand directories hold
+    millions of downloads, so the first rule matching each directory is cached. A
+    file in it is then only matched against the rules before that one, which may
+    still match its name, and otherwise classified by its directory. A rule that
+    takes the dataset from its group is matched against the whole path again, as
+    the group may capture more of it than of the directory.
+    """
+
+    def __init__(self, rules: list[dict]) -> None:
+        if not rules:
+            raise ValueError("At least one dataset rule is required.")
+
+        self._datasets: list[Optional[str]] = []
+        alternatives = []
+        for index, rule in enumerate(rules):
+            pattern = rule["pattern"]
+            dataset = rule.get("dataset")
+            if dataset is None and _DATASET_GROUP not in re.compile(pattern).groupindex:
+                raise ValueError(
+                    f"Dataset rule {rule} needs a 'dataset' or a"
+                    f" '(?P<{_DATASET_GROUP}>...)' group in its 'pattern'."
+                )
+            self._datasets.append(dataset)
+            # Group names must be unique across the combined regex.
+            pattern = pattern.replace(
+                f"(?P<{_DATASET_GROUP}>", f"(?P<_{_DATASET_GROUP}{index}>"
+            )
+            # Each rule is a lookahead from the start of the path, so the rules are
+            # tried in order rather than by where in the path they match.
+            alternatives.append(f"(?=.*?(?P<_rule{index}>{pattern}))")
+        self._alternatives = alternatives
+        self._regex = re.compile("|".join(alternatives), re.DOTALL)
+        # Number of rules -> regex of only the first that many rules
+        self._first_rules_regexes: dict[int, re.Pattern] = {}
+
+        # Directory -> index of the first rule matching it, or None when no rule does
+        self._by_directory: dict[str, Optional[int]] = {}
+
+    @classmethod
+    def from_file(cls, filepath: Path = DATASET_RULES_FILEPATH) -> "DatasetRules":
+        with open(filepath) as f:
+            return cls(json.load(f))
+
+    def _first_rules_regex(self, rules: int) -> re.Pattern:
+        try:
+            return self._first_rules_regexes[rules]
+        except KeyError:
+            regex = re.compile("|".join(self._alternatives[:rules]), re.DOTALL)
+            self._first_rules_regexes[rules] = regex
+            return regex
+
+    def _match(
+        self, path: str, *, rules: Optional[int] = None
+    ) -> Optional[tuple[int, str]]:
+        """Find the first rule matching `path`, of only the first `rules` if given."""
+        regex = self._regex if rules is None else self._first_rules_regex(rules)
+        match = regex.match(path)
+        if match is None:
+            return None
+
+        for index, dataset in enumerate(self._datasets[:rules]):
+            if match.group(f"_rule{index}") is not None:
+                if dataset is None:
+                    dataset = match.group(f"_{_DATASET_GROUP}{index}")
+                return index, dataset
+        return None
+
+    def classify(self, file_path: str) -> str:
+        directory = file_path.rpartition("/")[0]
+        try:
+            rule = self._by_directory[directory]
+        except KeyError:
+            directory_match = self._match(f"{directory}/")
+            rule = None if directory_match is None else directory_match[0]
+            self._by_directory[directory] = rule
+
+        if rule is None:
+            match = self._match(file_path)
+        elif self._datasets[rule] is None:
+            # Match up to and including the directory's rule, to capture from the
+            # whole path. A rule anchored to the end of the directory may not match
+            # the path at all, leaving the later rules.
+            match = self._match(file_path, rules=rule + 1) or self._match(file_path)
+        else:
+            match = self._match(file_path, rules=rule) if rule > 0 else None
+            if match is None:
+                match = rule, cast(str, self._datasets[rule])
+        return match[1] if match is not None else UNKNOWN_DATASET
+
+    def classify_column(self, file_paths: StringColumn) -> StringColumn:
+        """Classify a column of file paths, each distinct path only once."""
+        return file_paths.map(self.classify)
@@ -1,28 +1,206 @@
 import datetime as dt
-import json
-import socket
-from dataclasses import asdict
+import gzip
+import logging
+import os
+from collections.abc import Collection, Generator, Iterable, Iterator, Sequence
+from enum import Enum
+from functools import lru_cache
+from itertools import chain, dropwhile
 from pathlib import Path
-from socket import gethostbyaddr
+from typing import BinaryIO, Optional, cast
 
-import pandas as pd
+from noaa_metrics.checkpoint import (
+    line_before_offset,
+    read_checkpoint,
+    write_checkpoint,
+)
+from noaa_metrics.constants.paths import (
+    DATASET_RULES_FILEPATH,
+    INGEST_CHECKPOINT_FILEPATH,
+    IP_DATABASE_FILEPATH,
+    JSON_OUTPUT_DIR,
+    NGINX_DOWNLOAD_LOG_FILE,
+)
+from noaa_metrics.datasets import UNKNOWN_DATASET, DatasetRules
+from noaa_metrics.ip_database import IpDatabase
+from noaa_metrics.partitions import (
+    PartitionFormat,
+    find_partition,
+    partition_filepath,
+    read_partition_dicts,
+    remove_other_partitions,
+    write_partition,
+)
+from noaa_metrics.reverse_dns import (
+    DnsCache,
+    Resolver,
+    gethostname,
+    resolve_ip_locations,
+)
+from noaa_metrics.rollups import build_rollups, write_rollups
+from noaa_metrics.run_metrics import count, stage
+from noaa_metrics.util.batches import DateColumn, RecordBatch, StringColumn
+from noaa_metrics.util.dataclasses import (
+    IngestCheckpoint,
+    LogSource,
+    ProcessedLogFields,
+    RawLogFields,
+)
 
-from noaa_metrics.constants.country_codes import COUNTRY_CODES
-from noaa_metrics.constants.paths import JSON_OUTPUT_DIR, NGINX_DOWNLOAD_LOG_FILE
-from noaa_metrics.util.dataclasses import ProcessedLogFields, RawLogFields
-from noaa_metrics.util.json import DateFriendlyJSONEncoder
+logger = logging.getLogger(__name__)
 
 
-def get_log_lines() -> list[str]:
-    """Get log entries as a list of strings.
+def _line_start_at_or_after(log_file: BinaryIO, offset: int) -> int:
+    """Return the byte offset of the first line starting at or after `offset`."""
+    if offset == 0:
+        return 0
+    log_file.seek(offset - 1)
+    log_file.readline()
+    return log_file.tell()
 
-    From /share/logs/noaa-web/download.log.
+
+def find_date_offset(log_file: BinaryIO, date: dt.date) -> int:
+    """Find the byte offset of the first line logged on or after `date`.
+
+    The log is time-ordered, so we can binary search over byte offsets instead of
+    reading every line from the start of the file.
+    """
+    log_file.seek(0, os.SEEK_END)
+    lo, hi = 0, log_file.tell()
+    while lo < hi:
+        mid = (lo + hi) // 2
+        log_file.seek(_line_start_at_or_after(log_file, mid))
+        line = log_file.readline()
+        if not line or date_from_log_line(line.decode()) >= date:
+            hi = mid
+        else:
+            lo = mid + 1
+    return _line_start_at_or_after(log_file, lo)
+
+
+def _is_compressed(log_file: Path) -> bool:
+    return log_file.suffix == ".gz"
+
+
+def open_log(log_file: Path) -> BinaryIO:
+    """Open a log for reading, decompressing it as a stream if it's gzipped."""
+    if _is_compressed(log_file):
+        return cast(BinaryIO, gzip.open(log_file, "rb"))
+    return open(log_file, "rb")
+
+
+def read_log_from_date(log_file: Path, date: dt.date) -> Generator[bytes, None, None]:
+    """Lazily yield the raw lines of a log, from the first one logged on `date`.
+
+    Uncompressed logs are searched for that line. Compressed logs can't be seeked in
+    efficiently, so the lines before it are decompressed and skipped.
+    """
+    with open_log(log_file) as f:
+        if _is_compressed(log_file):
+            yield from dropwhile(
+                lambda raw_line: date_from_log_line(raw_line.decode()) < date, f
+            )
+        else:
+            f.seek(find_date_offset(f, date))
+            yield from f
+
+
+def get_log_lines(
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    log_file: Path = NGINX_DOWNLOAD_LOG_FILE,
+) -> Iterator[str]:
+    """Lazily yield the log entries logged from `start_date` to `end_date`.
+
+    From /share/logs/noaa-web/download.log by default. We start at the first line
+    of `start_date` and stop at the first line after `end_date`.
+    """
+    for raw_line in read_log_from_date(log_file, start_date):
+        log_line = raw_line.decode().rstrip()
+        if date_from_log_line(log_line) > end_date:
+            break
+        yield log_line
+
+
+def _first_log_line(log_file: Path) -> Optional[str]:
+    with open_log(log_file) as f:
+        raw_line = f.readline()
+    return raw_line.decode() if raw_line.strip() else None
+
+
+def get_log_sources(log_files: Iterable[Path]) -> list[LogSource]:
+    """Find the time range of each log, ordered by their first lines.
+
+    Only the first and last lines are read. The last line of a compressed log can't
+    be read without decompressing all of it, so a compressed log is taken to end
+    where the next one starts, e.g. in a logrotate series. Empty logs are left out.
+    """
+    log_sources = []
+    for log_file in log_files:
+        first_line = _first_log_line(log_file)
+        if first_line is None:
+            continue
+
+        last_timestamp = None
+        if not _is_compressed(log_file):
+            last_line = line_before_offset(log_file, os.path.getsize(log_file))
+            if last_line is not None:
+                last_timestamp = datetime_from_log_line(last_line)
+        log_sources.append(
+            LogSource(
+                log_file=log_file,
+                first_timestamp=datetime_from_log_line(first_line),
+                last_timestamp=last_timestamp,
+            )
+        )
+
+    log_sources.sort(key=lambda log_source: log_source.first_timestamp)
+    for log_source, next_log_source in zip(log_sources, log_sources[1:]):
+        if log_source.last_timestamp is None:
+            log_source.last_timestamp = next_log_source.first_timestamp
+    return log_sources
+
+
+def select_log_files(
+    log_files: Iterable[Path], *, start_date: dt.date, end_date: dt.date
+) -> list[Path]:
+    """Get the logs with lines from `start_date` to `end_date`, oldest first."""
+    selected_log_files = []
+    for log_source in get_log_sources(log_files):
+        if log_source.first_timestamp.date() > end_date or (
+            log_source.last_timestamp is not None
+            and log_source.last_timestamp.date() < start_date
+        ):
+            logger.info(f"Skipping {log_source.log_file}; it has no requested dates.")
+            continue
+        selected_log_files.append(log_source.log_file)
+    return selected_log_files
+
+
+def read_appended_lines(log_file: Path, *, offset: int) -> Iterator[tuple[str, int]]:
+    """Lazily yield the complete lines after byte `offset` of the log.
+
+    Each line comes with the offset just past it. A partial last line, still being
+    written, is left for the next run.
     """
-    log_lines = []
-    with open(NGINX_DOWNLOAD_LOG_FILE) as f:
-        log_lines = [line.rstrip() for line in f]
+    with open(log_file, "rb") as f:
+        f.seek(offset)
+        for raw_line in f:
+            if not raw_line.endswith(b"\n"):
+                break
+            offset += len(raw_line)
+            yield raw_line.decode().rstrip(), offset
 
-    return log_lines
+
+@lru_cache(maxsize=1024)
+def _parse_log_date(date_string: str) -> dt.date:
+    """Parse a log date string like '17/Feb/2023'.
+
+    Every line of a day shares the same date string, so caching avoids calling
+    `strptime` once per line.
+    """
+    return dt.datetime.strptime(date_string, "%d/%b/%Y").date()
 
 
 def date_from_split_line(split_line: list[str]) -> dt.date:
@@ -30,10 +208,21 @@ def date_from_split_line(split_line: list[str]) -> dt.date:
     to date object with just Year, month, day."""
     datetime_string = split_line[0].strip("[")
     date_string = datetime_string.split(":")[0]
-    date = dt.datetime.strptime(date_string, "%d/%b/%Y").date()
+    date = _parse_log_date(date_string)
     return date
 
 
+def date_from_log_line(log_line: str) -> dt.date:
+    """Get the date of a log line without splitting the whole line."""
+    return date_from_split_line(log_line.split(maxsplit=1))
+
+
+def datetime_from_log_line(log_line: str) -> dt.datetime:
+    """Get the full timestamp of a log line, ignoring its UTC offset."""
+    datetime_string = log_line.split(maxsplit=1)[0].strip("[")
+    return dt.datetime.strptime(datetime_string, "%d/%b/%Y:%H:%M:%S")
+
+
 def line_to_raw_fields(log_line: str) -> RawLogFields:
     """ "Place the necessary info from the line into the dataclass."""
     split_line = log_line.split()
@@ -47,96 +236,460 @@ def line_to_raw_fields(log_line: str) -> RawLogFields:
     return log_fields
 
 
-def lines_to_raw_fields(log_lines: list[str]) -> list[RawLogFields]:
-    """Convert log lines into self describing data structures."""
-    log_dicts_raw = [line_to_raw_fields(log_line) for log_line in log_lines]
+def lines_to_raw_fields(log_lines: Iterable[str]) -> Iterator[RawLogFields]:
+    """Lazily convert log lines into self describing data structures."""
+    log_dicts_raw = (line_to_raw_fields(log_line) for log_line in log_lines)
     return log_dicts_raw
 
 
-def ip_address_to_ip_location(log_fields_raw: RawLogFields) -> str:
-    """Take the ip address and use the country codes dictionary
-    to match with the country/domain location"""
-    ip = log_fields_raw.ip_address
-    try:
-        hostname = gethostbyaddr(ip)[0]
-        host_suffix = hostname.split(".")[-1]
-        if not host_suffix in COUNTRY_CODES:
-            # Add to unrecognized category if suffix isn't in list
-            ip_location = COUNTRY_CODES[""]
+def filter_raw_fields(
+    log_dicts_raw: Iterable[RawLogFields], *, start_date: dt.date, end_date: dt.date
+) -> Iterator[RawLogFields]:
+    """Lazily select successful downloads in the date range.
+
+    The lines dropped by each filter are counted once all have been read.
+    """
+    lines = failed = out_of_range = robots = 0
+    for log_fields_raw in log_dicts_raw:
+        lines += 1
+        if not log_fields_raw.status.startswith("2"):
+            failed += 1
+        elif not start_date <= log_fields_raw.date <= end_date:
+            out_of_range += 1
+        elif log_fields_raw.file_path.endswith("robots.txt"):
+            robots += 1
         else:
-            ip_location = COUNTRY_CODES[host_suffix]
-    except socket.herror:
-        ip_location = COUNTRY_CODES[""]
-    return ip_location
-
-
-def get_dataset_from_path(log_fields_raw: RawLogFields) -> str:
-
-    path = log_fields_raw.file_path
-    # NOTE: If a dataset that is not under 'NOAA/' is added, it must be added here too.
-    if "NOAA/" in path:
-        noaa_dataset = path.split("NOAA/")[1]
-        dataset = noaa_dataset.split("/")[0]
-    elif "nsidc-0057" in path:
-        dataset = "nsidc-0057"
-    elif "nsidc-0008" in path:
-        dataset = "nsidc-0008"
-    elif "GPDP" in path:
-        dataset = "GPDP"
-    else:
-        raise RuntimeError(f'Could not determine dataset from {path=}.')
-    return dataset
+            yield log_fields_raw
+    count_filtered_lines(
+        lines=lines, failed=failed, out_of_range=out_of_range, robots=robots
+    )
 
 
-def raw_fields_to_processed_fields(log_fields_raw: RawLogFields) -> ProcessedLogFields:
+def count_filtered_lines(
+    *, lines: int, failed: int, out_of_range: int, robots: int
+) -> None:
+    """Count the lines read and dropped by each filter in the run metrics."""
+    count("lines_read", lines)
+    count("lines_dropped_failed", failed)
+    count("lines_dropped_out_of_range", out_of_range)
+    count("lines_dropped_robots", robots)
 
-    processed_log_fields = ProcessedLogFields(
-        date=log_fields_raw.date,
-        ip_address=log_fields_raw.ip_address,
-        download_bytes=log_fields_raw.download_bytes,
-        dataset=get_dataset_from_path(log_fields_raw),
-        file_path=log_fields_raw.file_path,
-        ip_location=ip_address_to_ip_location(log_fields_raw),
-    )
-    return processed_log_fields
+
+class LocationEngine(Enum):
+    # The country code top-level domain of each address's reverse DNS hostname.
+    DNS = "dns"
+    # A local database of IP address ranges and their countries. Needs no network.
+    IP_DATABASE = "ip-database"
+
+
+def locate_ip_addresses(
+    ip_addresses: Collection[str],
+    *,
+    location_engine: LocationEngine = LocationEngine.DNS,
+    resolver: Resolver = gethostname,
+    ip_database_filepath: Path = IP_DATABASE_FILEPATH,
+    dns_cache: Optional[DnsCache] = None,
+) -> dict[str, str]:
+    """Look up the location of each distinct IP address with `location_engine`.
+
+    Reverse DNS lookups are cached across runs in the `DnsCache` on disk, unless
+    another `dns_cache` is given; saving that one is up to the caller.
+    """
+    if location_engine == LocationEngine.IP_DATABASE:
+        return IpDatabase.from_file(ip_database_filepath).locate(ip_addresses)
+
+    if dns_cache is not None:
+        return resolve_ip_locations(ip_addresses, cache=dns_cache, resolver=resolver)
+
+    dns_cache = DnsCache()
+    try:
+        return resolve_ip_locations(ip_addresses, cache=dns_cache, resolver=resolver)
+    finally:
+        # Keep the lookups done before a failure, too.
+        dns_cache.save()
+
+
+def enrich_raw_fields(
+    raw_batch: RecordBatch[RawLogFields],
+    *,
+    datasets: StringColumn,
+    location_engine: LocationEngine = LocationEngine.DNS,
+    resolver: Resolver = gethostname,
+    ip_database_filepath: Path = IP_DATABASE_FILEPATH,
+    dns_cache: Optional[DnsCache] = None,
+) -> RecordBatch[ProcessedLogFields]:
+    """Enrich filtered raw log data to include relevant information.
+
+    `datasets` holds the dataset of each download, from
+    `DatasetRules.classify_column`. Each distinct IP address is located once, rather
+    than once per log line. The batch is enriched a column at a time, without
+    creating a record per download.
+    """
+    ip_addresses = cast(StringColumn, raw_batch.columns["ip_address"])
+    with stage("locate", records_in=len(ip_addresses.values)) as locate_stage:
+        ip_locations = locate_ip_addresses(
+            ip_addresses.values,
+            location_engine=location_engine,
+            resolver=resolver,
+            ip_database_filepath=ip_database_filepath,
+            dns_cache=dns_cache,
+        )
+        locate_stage.records_out = len(ip_locations)
+
+    unknown_downloads = datasets.count(UNKNOWN_DATASET)
+    if unknown_downloads:
+        file_paths = cast(StringColumn, raw_batch.columns["file_path"])
+        unknown_file_paths = {
+            file_path
+            for file_path, dataset in zip(file_paths, datasets)
+            if dataset == UNKNOWN_DATASET
+        }
+        logger.warning(
+            f"{unknown_downloads} downloads of {len(unknown_file_paths)} files"
+            f" matched no dataset rule, e.g. {sorted(unknown_file_paths)[0]!r};"
+            f" counted as {UNKNOWN_DATASET!r}."
+        )
+
+    with stage("enrich", records_in=len(raw_batch)) as enrich_stage:
+        log_batch = RecordBatch(ProcessedLogFields)
+        log_batch.columns.update(
+            date=raw_batch.columns["date"],
+            ip_address=ip_addresses,
+            download_bytes=raw_batch.columns["download_bytes"],
+            dataset=datasets,
+            file_path=raw_batch.columns["file_path"],
+            ip_location=ip_addresses.map(ip_locations.__getitem__),
+        )
+        enrich_stage.records_out = len(log_batch)
+    return log_batch
+
+
+def classify_raw_fields(
+    raw_batch: RecordBatch[RawLogFields], *, dataset_rules: DatasetRules
+) -> StringColumn:
+    """Get the dataset of each download."""
+    with stage("classify", records_in=len(raw_batch)) as classify_stage:
+        datasets = dataset_rules.classify_column(
+            cast(StringColumn, raw_batch.columns["file_path"])
+        )
+        classify_stage.records_out = len(datasets)
+    return datasets
 
 
 def process_raw_fields(
-    log_dicts_raw: list[RawLogFields], *, start_date: dt.date, end_date: dt.date
-) -> list[ProcessedLogFields]:
+    log_dicts_raw: Iterable[RawLogFields],
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    dataset_rules: DatasetRules,
+    location_engine: LocationEngine = LocationEngine.DNS,
+    resolver: Resolver = gethostname,
+    ip_database_filepath: Path = IP_DATABASE_FILEPATH,
+) -> RecordBatch[ProcessedLogFields]:
     """Enrich raw log data to include relevant information."""
-    log_dc = [
-        raw_fields_to_processed_fields(log_fields_raw)
-        for log_fields_raw in log_dicts_raw
-        if log_fields_raw.status.startswith("2")
-        and start_date <= log_fields_raw.date <= end_date
-        and not log_fields_raw.file_path.endswith("robots.txt")
-    ]
-    return log_dc
+    with stage("filter") as filter_stage:
+        raw_batch = RecordBatch.from_records(
+            RawLogFields,
+            filter_raw_fields(log_dicts_raw, start_date=start_date, end_date=end_date),
+        )
+        filter_stage.records_out = len(raw_batch)
+    datasets = classify_raw_fields(raw_batch, dataset_rules=dataset_rules)
+    return enrich_raw_fields(
+        raw_batch,
+        datasets=datasets,
+        location_engine=location_engine,
+        resolver=resolver,
+        ip_database_filepath=ip_database_filepath,
+    )
 
 
-def log_dc_to_json_file(
-    log_dc: list[ProcessedLogFields], *, start_date: dt.date, end_date: dt.date
+def log_dc_to_partition_files(
+    log_batch: RecordBatch[ProcessedLogFields],
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    partition_format: PartitionFormat = PartitionFormat.JSON,
+    merge: bool = False,
+    output_dir: Path = JSON_OUTPUT_DIR,
 ) -> None:
-    """Create log processed data file."""
-    dates = pd.date_range(start_date, end_date, freq="d").date.tolist()
+    """Create log processed data file.
+
+    Records are partitioned by date in a single pass over `log_batch`. Every date in
+    the range gets a file, even if it had no downloads, along with its rollups for
+    the report. With `merge`, records already ingested for a date are kept and the
+    new ones added after them.
+    """
+    with stage("write", records_in=len(log_batch)) as write_stage:
+        write_stage.records_out = _write_partition_files(
+            log_batch,
+            start_date=start_date,
+            end_date=end_date,
+            partition_format=partition_format,
+            merge=merge,
+            output_dir=output_dir,
+        )
+
 
+def _write_partition_files(
+    log_batch: RecordBatch[ProcessedLogFields],
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    partition_format: PartitionFormat,
+    merge: bool,
+    output_dir: Path,
+) -> int:
+    indexes_by_date = log_batch.indexes_by("date")
+
+    dates = [
+        start_date + dt.timedelta(days=day)
+        for day in range((end_date - start_date).days + 1)
+    ]
+
+    records_written = 0
     for d in dates:
-        log_dict = [asdict(l) for l in log_dc if l.date == d]
-        log_json = json.dumps(log_dict, cls=DateFriendlyJSONEncoder)
-        write_json_to_file(log_json, date=d)
+        day_batch = log_batch.take(indexes_by_date.get(d, []))
+        if merge:
+            existing_filepath = find_partition(d, output_dir=output_dir)
+            if existing_filepath is not None:
+                existing_batch = RecordBatch.from_dicts(
+                    ProcessedLogFields, read_partition_dicts(existing_filepath)
+                )
+                existing_batch.extend_batch(day_batch)
+                day_batch = existing_batch
+
+        write_partition(
+            day_batch,
+            filepath=partition_filepath(
+                d, partition_format=partition_format, output_dir=output_dir
+            ),
+        )
+        remove_other_partitions(
+            d, partition_format=partition_format, output_dir=output_dir
+        )
+        write_rollups(build_rollups(day_batch), date=d, output_dir=output_dir)
+        records_written += len(day_batch)
+    return records_written
 
 
-def write_json_to_file(log_json: str, *, date: dt.date) -> None:
-    date_str = date.isoformat()
-    JSON_OUTPUT_FILEPATH = JSON_OUTPUT_DIR / f"noaa-metrics-{date_str}.json"
-    with open(JSON_OUTPUT_FILEPATH, "w") as f:
-        f.write(log_json)
+class LogParser(Enum):
+    # One line at a time, in pure Python.
+    LINE = "line"
+    # Chunks of lines at a time, into pandas frames.
+    BATCH = "batch"
+
+
+def get_filtered_raw_fields(
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    parser: LogParser,
+    log_files: Sequence[Path] = (NGINX_DOWNLOAD_LOG_FILE,),
+) -> RecordBatch[RawLogFields]:
+    """Parse and filter the log entries from `start_date` to `end_date`."""
+    selected_log_files = select_log_files(
+        log_files, start_date=start_date, end_date=end_date
+    )
+    if parser == LogParser.BATCH:
+        from noaa_metrics.parse_frames import (
+            extend_raw_batch,
+            filter_raw_frame,
+            read_raw_frames,
+        )
 
+        raw_batch = RecordBatch(RawLogFields)
+        for log_file in selected_log_files:
+            for raw_frame in read_raw_frames(
+                start_date=start_date, end_date=end_date, log_file=log_file
+            ):
+                extend_raw_batch(
+                    raw_batch,
+                    filter_raw_frame(
+                        raw_frame, start_date=start_date, end_date=end_date
+                    ),
+                )
+        return raw_batch
 
-def ingest_logs(*, start_date: dt.date, end_date: dt.date) -> None:
-    log_lines = get_log_lines()
+    log_lines = chain.from_iterable(
+        get_log_lines(start_date=start_date, end_date=end_date, log_file=log_file)
+        for log_file in selected_log_files
+    )
     log_dicts_raw = lines_to_raw_fields(log_lines)
-    log_dc = process_raw_fields(log_dicts_raw, start_date=start_date, end_date=end_date)
+    return RecordBatch.from_records(
+        RawLogFields,
+        filter_raw_fields(log_dicts_raw, start_date=start_date, end_date=end_date),
+    )
+
+
+def ingest_logs(
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    resolver: Resolver = gethostname,
+    partition_format: PartitionFormat = PartitionFormat.JSON,
+    parser: LogParser = LogParser.LINE,
+    dataset_rules_filepath: Path = DATASET_RULES_FILEPATH,
+    workers: int = 1,
+    log_files: Sequence[Path] = (NGINX_DOWNLOAD_LOG_FILE,),
+    location_engine: LocationEngine = LocationEngine.DNS,
+    ip_database_filepath: Path = IP_DATABASE_FILEPATH,
+    output_dir: Path = JSON_OUTPUT_DIR,
+) -> None:
+    """Ingest the log entries from `start_date` to `end_date`.
+
+    `log_files` may be given in any order and gzipped; only those with lines in the
+    date range are read. With more than one worker, the logs are parsed by the line
+    in a pool of processes, ignoring `parser`. The output is the same either way.
+    """
+    if workers > 1:
+        from noaa_metrics.shards import get_sharded_raw_fields
+
+        # The workers classify the downloads as well.
+        with stage("parse") as parse_stage:
+            raw_batch, datasets = get_sharded_raw_fields(
+                start_date=start_date,
+                end_date=end_date,
+                workers=workers,
+                log_files=log_files,
+                dataset_rules_filepath=dataset_rules_filepath,
+            )
+            parse_stage.records_out = len(raw_batch)
+    else:
+        dataset_rules = DatasetRules.from_file(dataset_rules_filepath)
+        with stage("parse") as parse_stage:
+            raw_batch = get_filtered_raw_fields(
+                start_date=start_date,
+                end_date=end_date,
+                parser=parser,
+                log_files=log_files,
+            )
+            parse_stage.records_out = len(raw_batch)
+        datasets = classify_raw_fields(raw_batch, dataset_rules=dataset_rules)
+
+    # Only the requested dates are held in memory, never the whole log.
+    log_batch = enrich_raw_fields(
+        raw_batch,
+        datasets=datasets,
+        location_engine=location_engine,
+        resolver=resolver,
+        ip_database_filepath=ip_database_filepath,
+    )
+
+    log_dc_to_partition_files(
+        log_batch,
+        start_date=start_date,
+        end_date=end_date,
+        partition_format=partition_format,
+        output_dir=output_dir,
+    )
+
+
+def _continues_checkpoint(
+    log_file: Path, checkpoint: IngestCheckpoint, *, check_inode: bool = True
+) -> bool:
+    """Check whether `log_file` still holds the lines up to the checkpoint.
+
+    Fails if the log was rotated away or truncated. A rotated copy of the log is
+    recognized by the line ending at the checkpoint's offset, so `check_inode` is
+    off for those.
+    """
+    if check_inode and os.stat(log_file).st_ino != checkpoint.inode:
+        return False
+    if checkpoint.last_timestamp is None:
+        return checkpoint.offset == 0
+
+    last_line = line_before_offset(log_file, checkpoint.offset)
+    return (
+        last_line is not None
+        and datetime_from_log_line(last_line) == checkpoint.last_timestamp
+    )
+
+
+def ingest_logs_incremental(
+    *,
+    start_date: Optional[dt.date] = None,
+    resolver: Resolver = gethostname,
+    partition_format: PartitionFormat = PartitionFormat.JSON,
+    log_file: Path = NGINX_DOWNLOAD_LOG_FILE,
+    checkpoint_filepath: Path = INGEST_CHECKPOINT_FILEPATH,
+    dataset_rules_filepath: Path = DATASET_RULES_FILEPATH,
+    location_engine: LocationEngine = LocationEngine.DNS,
+    ip_database_filepath: Path = IP_DATABASE_FILEPATH,
+    output_dir: Path = JSON_OUTPUT_DIR,
+) -> None:
+    """Ingest only the lines appended to the log since the last run.
+
+    New records are merged into the daily files of the dates they fall on. If the
+    log was rotated or truncated since the checkpoint, the rest of the old log is
+    read from `download.log.1` when it's still there, then the new log from the
+    start. Without a checkpoint, the log is ingested from `start_date` (or its
+    beginning) and the days it covers are overwritten.
+    """
+    dataset_rules = DatasetRules.from_file(dataset_rules_filepath)
+    checkpoint = read_checkpoint(checkpoint_filepath)
+    new_checkpoint = IngestCheckpoint(
+        inode=os.stat(log_file).st_ino, offset=0, last_timestamp=None
+    )
+    # (log file, offset to start reading from)
+    sources: list[tuple[Path, int]] = []
+    if checkpoint is None:
+        offset = 0
+        if start_date is not None:
+            with open(log_file, "rb") as f:
+                offset = find_date_offset(f, start_date)
+        sources.append((log_file, offset))
+    elif _continues_checkpoint(log_file, checkpoint):
+        new_checkpoint = checkpoint
+        sources.append((log_file, checkpoint.offset))
+    else:
+        rotated_log_file = Path(f"{log_file}.1")
+        if rotated_log_file.is_file() and _continues_checkpoint(
+            rotated_log_file, checkpoint, check_inode=False
+        ):
+            logger.warning(f"{log_file} was rotated; finishing {rotated_log_file}.")
+            sources.append((rotated_log_file, checkpoint.offset))
+        else:
+            logger.warning(
+                f"{log_file} was rotated or truncated and the rest of the old log"
+                " wasn't found; some downloads may be missing."
+            )
+        sources.append((log_file, 0))
+
+    raw_batch = RecordBatch(RawLogFields)
+    with stage("parse") as parse_stage:
+        for source, offset in sources:
+            for log_line, end_offset in read_appended_lines(source, offset=offset):
+                raw_batch.append(line_to_raw_fields(log_line))
+                if source == log_file:
+                    new_checkpoint.offset = end_offset
+                    new_checkpoint.last_timestamp = datetime_from_log_line(log_line)
+        parse_stage.records_out = len(raw_batch)
+
+    if len(raw_batch):
+        dates = cast(DateColumn, raw_batch.columns["date"]).ordinals
+        first_date = dt.date.fromordinal(min(dates))
+        if checkpoint is None and start_date is not None:
+            first_date = start_date
+        last_date = dt.date.fromordinal(max(dates))
+
+        log_batch = process_raw_fields(
+            raw_batch,
+            start_date=first_date,
+            end_date=last_date,
+            dataset_rules=dataset_rules,
+            location_engine=location_engine,
+            resolver=resolver,
+            ip_database_filepath=ip_database_filepath,
+        )
+
+        log_dc_to_partition_files(
+            log_batch,
+            start_date=first_date,
+            end_date=last_date,
+            partition_format=partition_format,
+            merge=checkpoint is not None,
+            output_dir=output_dir,
+        )
 
-    log_dc_to_json_file(log_dc, start_date=start_date, end_date=end_date)
+    # Only move the checkpoint once the records are safely written.
+    write_checkpoint(new_checkpoint, checkpoint_filepath)
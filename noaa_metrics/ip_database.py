@@ -0,0 +1,136 @@
+import csv
+import gzip
+import ipaddress
+import socket
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, MutableSequence
+from pathlib import Path
+from typing import Optional, TextIO, Union
+
+from noaa_metrics.constants.country_codes import COUNTRY_CODES
+from noaa_metrics.constants.paths import IP_DATABASE_FILEPATH
+
+IpAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+# IPv4 addresses embedded in IPv6, like "::ffff:192.0.2.1"
+_IPV4_MAPPED_PREFIX = bytes(10) + b"\xff\xff"
+
+
+class _RangeIndex:
+    """Non-overlapping integer ranges of one IP version, sorted by first address."""
+
+    def __init__(
+        self, firsts: MutableSequence[int], lasts: MutableSequence[int]
+    ) -> None:
+        self.firsts = firsts
+        self.lasts = lasts
+        # Index into `IpDatabase.country_codes` of each range
+        self.codes = array("i")
+
+    def find(self, address: int) -> Optional[int]:
+        index = bisect_right(self.firsts, address) - 1
+        if index < 0 or address > self.lasts[index]:
+            return None
+        return self.codes[index]
+
+
+class IpDatabase:
+    """Look up the country of IP addresses in a local database of address ranges.
+
+    Ranges are held in sorted arrays of integers, one index per IP version, and
+    searched with a binary search, so lookups need no network. IPv4-mapped IPv6
+    addresses are looked up as IPv4.
+    """
+
+    def __init__(self, ranges: Iterable[tuple[IpAddress, IpAddress, str]]) -> None:
+        self.country_codes: list[str] = []
+        codes_by_country: dict[str, int] = {}
+        # 128-bit IPv6 addresses don't fit an `array`.
+        self._indexes = {
+            4: _RangeIndex(array("Q"), array("Q")),
+            6: _RangeIndex([], []),
+        }
+
+        for first, last, country_code in sorted(ranges, key=lambda r: int(r[0])):
+            if first.version != last.version or int(first) > int(last):
+                raise ValueError(f"Invalid IP address range {first}-{last}.")
+
+            index = self._indexes[first.version]
+            if index.lasts and int(first) <= index.lasts[-1]:
+                raise ValueError(f"IP address range {first}-{last} overlaps another.")
+
+            code = codes_by_country.get(country_code)
+            if code is None:
+                code = codes_by_country[country_code] = len(self.country_codes)
+                self.country_codes.append(country_code)
+            index.firsts.append(int(first))
+            index.lasts.append(int(last))
+            index.codes.append(code)
+
+    @classmethod
+    def from_file(cls, filepath: Path = IP_DATABASE_FILEPATH) -> "IpDatabase":
+        """Load a CSV of `network,country_code` or `first_ip,last_ip,country_code`.
+
+        Networks are in CIDR notation, like "192.0.2.0/24", and country codes are
+        ISO 3166, like "US". A header row is skipped. The file may be gzipped.
+        """
+        f: TextIO
+        if filepath.suffix == ".gz":
+            f = gzip.open(filepath, "rt", newline="")
+        else:
+            f = open(filepath, newline="")
+        with f:
+            return cls(_read_ranges(csv.reader(f)))
+
+    def country_code(self, ip_address: str) -> Optional[str]:
+        """Get the country code of `ip_address`, or None if no range holds it."""
+        # Much faster than parsing with `ipaddress`.
+        try:
+            version, packed = 4, socket.inet_pton(socket.AF_INET, ip_address)
+        except OSError:
+            try:
+                version, packed = 6, socket.inet_pton(socket.AF_INET6, ip_address)
+            except OSError:
+                return None
+            if packed.startswith(_IPV4_MAPPED_PREFIX):
+                version, packed = 4, packed[len(_IPV4_MAPPED_PREFIX) :]
+
+        code = self._indexes[version].find(int.from_bytes(packed, "big"))
+        return None if code is None else self.country_codes[code]
+
+    def locate(self, ip_addresses: Iterable[str]) -> dict[str, str]:
+        """Get the location of each distinct IP address, named like the reverse DNS
+        locations."""
+        ip_locations = {}
+        for ip_address in set(ip_addresses):
+            country_code = self.country_code(ip_address) or ""
+            ip_locations[ip_address] = COUNTRY_CODES.get(
+                country_code.lower(), COUNTRY_CODES[""]
+            )
+        return ip_locations
+
+
+def _read_ranges(
+    rows: Iterable[list[str]],
+) -> Iterable[tuple[IpAddress, IpAddress, str]]:
+    for line_number, row in enumerate(rows, start=1):
+        row = [field.strip() for field in row]
+        if not any(row):
+            continue
+
+        try:
+            if len(row) == 2:
+                network = ipaddress.ip_network(row[0], strict=False)
+                first, last = network[0], network[-1]
+            elif len(row) == 3:
+                first, last = ipaddress.ip_address(row[0]), ipaddress.ip_address(row[1])
+            else:
+                raise ValueError(f"expected 2 or 3 columns, got {len(row)}")
+        except ValueError as e:
+            if line_number == 1:
+                # A header row
+                continue
+            raise ValueError(f"Invalid IP database row {line_number}: {e}") from e
+
+        yield first, last, row[-1]
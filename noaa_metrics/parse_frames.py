@@ -0,0 +1,147 @@
+import datetime as dt
+from collections.abc import Iterator
+from contextlib import closing
+from itertools import islice
+from pathlib import Path
+from typing import cast
+
+import numpy as np
+import pandas as pd
+
+from noaa_metrics.constants.paths import NGINX_DOWNLOAD_LOG_FILE
+from noaa_metrics.ingest_logs import (
+    _parse_log_date,
+    count_filtered_lines,
+    read_log_from_date,
+)
+from noaa_metrics.util.batches import DateColumn, IntColumn, RecordBatch, StringColumn
+from noaa_metrics.util.dataclasses import RawLogFields
+
+LOG_CHUNK_LINES = 100_000
+
+# Fields of a log line: timestamp, UTC offset, request time, IP address, bytes,
+# file path and status
+_LINE_FIELDS = 7
+
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+
+
+def _split_fields(log_lines: list[bytes]) -> list[bytes]:
+    """Split a chunk of log lines on whitespace into `_LINE_FIELDS` fields each.
+
+    The whole chunk is split at once. Lines with more fields than that, e.g. a file
+    path with a space, are split one at a time instead, and their extra fields
+    dropped, like `line_to_raw_fields` does.
+    """
+    fields = b"".join(log_lines).split()
+    # Every line starts with its '[' timestamp, so the chunk is aligned if every
+    # seventh field is one.
+    if len(fields) == _LINE_FIELDS * len(log_lines):
+        if (np.array(fields[::_LINE_FIELDS], dtype="S1") == b"[").all():
+            return fields
+
+    fields = []
+    for log_line in log_lines:
+        line_fields = log_line.split()
+        if len(line_fields) < _LINE_FIELDS:
+            raise ValueError(f"Log line has too few fields: {log_line!r}")
+        fields.extend(line_fields[:_LINE_FIELDS])
+    return fields
+
+
+def _categorical(values: list[bytes]) -> pd.Categorical:
+    """Encode byte strings as categorical strings, decoding each distinct one once."""
+    codes, uniques = pd.factorize(np.array(values, dtype=object))
+    return pd.Categorical.from_codes(codes, [value.decode() for value in uniques])
+
+
+def lines_to_raw_frame(log_lines: list[bytes]) -> pd.DataFrame:
+    """Parse a chunk of log lines into a frame with the `RawLogFields` columns.
+
+    Dates are parsed as datetimes, for vectorized filtering, and the strings are
+    categorical, so each distinct one is decoded and filtered once.
+    """
+    fields = _split_fields(log_lines)
+
+    # '[17/Feb/2023:08:49:35' -> '[17/Feb/2023' is a fixed width, so all the lines
+    # of a day share it and each day is parsed only once.
+    day_codes, day_strings = pd.factorize(
+        np.array(fields[0::_LINE_FIELDS], dtype="S12")
+    )
+    unique_dates = np.array(
+        [_parse_log_date(day_string[1:].decode()) for day_string in day_strings],
+        dtype="datetime64[D]",
+    )
+    return pd.DataFrame(
+        {
+            "date": unique_dates[day_codes],
+            "ip_address": _categorical(fields[3::_LINE_FIELDS]),
+            "download_bytes": np.array(fields[4::_LINE_FIELDS]).astype(np.int64),
+            "file_path": _categorical(fields[5::_LINE_FIELDS]),
+            "status": _categorical(fields[6::_LINE_FIELDS]),
+        }
+    )
+
+
+def read_raw_frames(
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    log_file: Path = NGINX_DOWNLOAD_LOG_FILE,
+    chunk_lines: int = LOG_CHUNK_LINES,
+) -> Iterator[pd.DataFrame]:
+    """Lazily parse the log from `start_date`, `chunk_lines` lines at a time.
+
+    Like `get_log_lines`, reading stops at the first line after `end_date`.
+    """
+    with closing(read_log_from_date(log_file, start_date)) as raw_lines:
+        while log_lines := list(islice(raw_lines, chunk_lines)):
+            raw_frame = lines_to_raw_frame(log_lines)
+            after_end = (raw_frame["date"] > pd.Timestamp(end_date)).to_numpy()
+            if after_end.any():
+                yield raw_frame.iloc[: after_end.argmax()]
+                break
+            yield raw_frame
+
+
+def filter_raw_frame(
+    raw_frame: pd.DataFrame, *, start_date: dt.date, end_date: dt.date
+) -> pd.DataFrame:
+    """Select successful downloads in the date range, like `filter_raw_fields`."""
+    successful = raw_frame["status"].str.startswith("2").to_numpy(dtype=bool)
+    in_range = raw_frame["date"].between(
+        pd.Timestamp(start_date), pd.Timestamp(end_date)
+    )
+    not_robots = ~raw_frame["file_path"].str.endswith("robots.txt").to_numpy(dtype=bool)
+    count_filtered_lines(
+        lines=len(raw_frame),
+        failed=int((~successful).sum()),
+        out_of_range=int((successful & ~in_range).sum()),
+        robots=int((successful & in_range & ~not_robots).sum()),
+    )
+    return raw_frame.loc[successful & in_range & not_robots]
+
+
+def _extend_string_column(column: StringColumn, values: pd.Series) -> None:
+    # Only the distinct values are looked up; the rows are recoded in one go.
+    recoded = np.array(column.encode(values.cat.categories), dtype=np.int32)
+    column.codes.frombytes(recoded[values.cat.codes.to_numpy()].tobytes())
+
+
+def extend_raw_batch(
+    raw_batch: RecordBatch[RawLogFields], raw_frame: pd.DataFrame
+) -> None:
+    """Append a frame's rows to a batch, a whole column at a time."""
+    dates = cast(DateColumn, raw_batch.columns["date"])
+    ordinals = raw_frame["date"].to_numpy().astype("datetime64[D]").astype(np.int32)
+    dates.ordinals.frombytes((ordinals + _EPOCH_ORDINAL).tobytes())
+
+    download_bytes = cast(IntColumn, raw_batch.columns["download_bytes"])
+    download_bytes.values.frombytes(
+        raw_frame["download_bytes"].to_numpy(dtype=np.int64).tobytes()
+    )
+
+    for name in ("ip_address", "file_path", "status"):
+        _extend_string_column(
+            cast(StringColumn, raw_batch.columns[name]), raw_frame[name]
+        )
@@ -0,0 +1,342 @@
+import datetime as dt
+import json
+import os
+from collections.abc import Iterator
+from enum import Enum
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, cast
+
+from noaa_metrics.constants.paths import JSON_OUTPUT_DIR
+from noaa_metrics.util.batches import (
+    Column,
+    DateColumn,
+    IntColumn,
+    RecordBatch,
+    StringColumn,
+)
+from noaa_metrics.util.dataclasses import ProcessedLogFields
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+
+
+class PartitionFormat(Enum):
+    """File format of the daily partitions written to `JSON_OUTPUT_DIR`.
+
+    Parquet needs the optional `pyarrow` dependency, which is imported only when
+    it's used.
+    """
+
+    JSON = "json"
+    # Newline-delimited JSON, one record per line, which can be read in chunks.
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+
+# When a day exists in more than one format, the first one listed wins.
+READ_PREFERENCE = (
+    PartitionFormat.PARQUET,
+    PartitionFormat.NDJSON,
+    PartitionFormat.JSON,
+)
+
+# Records of a newline-delimited partition parsed at a time.
+NDJSON_CHUNK_ROWS = 100_000
+# Records formatted before each write to a JSON partition.
+_JSON_WRITE_ROWS = 10_000
+
+
+def partition_filepath(
+    date: dt.date,
+    *,
+    partition_format: PartitionFormat,
+    output_dir: Path = JSON_OUTPUT_DIR,
+) -> Path:
+    return output_dir / f"noaa-metrics-{date:%Y-%m-%d}.{partition_format.value}"
+
+
+def find_partition(
+    date: dt.date, *, output_dir: Path = JSON_OUTPUT_DIR
+) -> Optional[Path]:
+    """Find the file holding `date`'s records, in whichever format it was written."""
+    for partition_format in READ_PREFERENCE:
+        filepath = partition_filepath(
+            date, partition_format=partition_format, output_dir=output_dir
+        )
+        if filepath.is_file():
+            return filepath
+    return None
+
+
+def partition_dates(output_dir: Path = JSON_OUTPUT_DIR) -> list[dt.date]:
+    """List the dates that have a partition in any format, in order."""
+    dates = set()
+    for filepath in output_dir.glob("noaa-metrics-*"):
+        try:
+            date = dt.date.fromisoformat(filepath.stem[len("noaa-metrics-") :])
+        except ValueError:
+            continue
+        if filepath.suffix[1:] in {f.value for f in PartitionFormat}:
+            dates.add(date)
+    return sorted(dates)
+
+
+def remove_other_partitions(
+    date: dt.date,
+    *,
+    partition_format: PartitionFormat,
+    output_dir: Path = JSON_OUTPUT_DIR,
+) -> None:
+    """Remove `date`'s files in formats other than `partition_format`.
+
+    Otherwise a re-ingested day could be shadowed by a stale file in a format that
+    is preferred when reading.
+    """
+    for other_format in PartitionFormat:
+        if other_format == partition_format:
+            continue
+        filepath = partition_filepath(
+            date, partition_format=other_format, output_dir=output_dir
+        )
+        if filepath.is_file():
+            os.remove(filepath)
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    # Strings repeated on many rows are dictionary-encoded.
+    string_type = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("date", pa.date32()),
+            ("ip_address", string_type),
+            ("download_bytes", pa.int64()),
+            ("dataset", string_type),
+            ("file_path", pa.string()),
+            ("ip_location", string_type),
+        ]
+    )
+
+
+def _parquet_array(column: Column, field_type):
+    import numpy as np
+    import pyarrow as pa
+
+    if isinstance(column, DateColumn):
+        days = np.frombuffer(column.ordinals, dtype=np.int32) - _EPOCH_ORDINAL
+        return pa.array(days, type=pa.int32()).cast(field_type)
+    if isinstance(column, IntColumn):
+        return pa.array(np.frombuffer(column.values, dtype=np.int64), type=field_type)
+
+    array = pa.DictionaryArray.from_arrays(
+        pa.array(np.frombuffer(column.codes, dtype=np.int32), type=pa.int32()),
+        pa.array(column.values, type=pa.string()),
+    )
+    return array if pa.types.is_dictionary(field_type) else array.dictionary_decode()
+
+
+def _compact_dictionaries(table):
+    """Re-encode the dictionary columns of a slice with only the strings it uses.
+
+    A slice shares its table's dictionaries, which would otherwise be written in
+    full to every row group.
+    """
+    import pyarrow as pa
+
+    return pa.Table.from_arrays(
+        [
+            (
+                column.combine_chunks().dictionary_decode().dictionary_encode()
+                if pa.types.is_dictionary(column.type)
+                else column
+            )
+            for column in table.columns
+        ],
+        schema=table.schema,
+    )
+
+
+def write_parquet_partition(
+    log_batch: RecordBatch[ProcessedLogFields], *, filepath: Path
+) -> None:
+    """Write a batch straight from its columns; encoded strings stay encoded.
+
+    Rows are ordered by dataset, keeping their order within each, and every
+    dataset gets row groups of its own. Their statistics then let `read_partition`
+    skip the row groups of other datasets.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    table = pa.Table.from_arrays(
+        [_parquet_array(log_batch.columns[field.name], field.type) for field in schema],
+        schema=schema,
+    )
+
+    datasets = cast(StringColumn, log_batch.columns["dataset"])
+    value_ranks = np.empty(len(datasets.values), dtype=np.int32)
+    value_ranks[np.argsort(np.array(datasets.values, dtype=object))] = np.arange(
+        len(datasets.values)
+    )
+    ranks = value_ranks[np.frombuffer(datasets.codes, dtype=np.int32)]
+    table = table.take(pa.array(np.argsort(ranks, kind="stable")))
+
+    with pq.ParquetWriter(filepath, schema) as writer:
+        start = 0
+        for rows in np.bincount(ranks, minlength=len(datasets.values)).tolist():
+            if rows:
+                writer.write_table(_compact_dictionaries(table.slice(start, rows)))
+                start += rows
+
+
+def _json_values(column: Column) -> Iterator[str]:
+    """Lazily encode a column's rows as JSON, encoding each distinct value once."""
+    if isinstance(column, DateColumn):
+        encoded_dates = {
+            ordinal: json.dumps(dt.date.fromordinal(ordinal).isoformat())
+            for ordinal in set(column.ordinals)
+        }
+        return map(encoded_dates.__getitem__, column.ordinals)
+    if isinstance(column, IntColumn):
+        return map(str, column.values)
+
+    encoded_values = [json.dumps(value) for value in column.values]
+    return map(encoded_values.__getitem__, column.codes)
+
+
+def _json_records(log_batch: RecordBatch) -> Iterator[str]:
+    """Lazily encode a batch's records as JSON objects, as `json.dumps` would."""
+    record_template = (
+        "{" + ", ".join(f"{json.dumps(name)}: %s" for name in log_batch.columns) + "}"
+    )
+    columns = [_json_values(column) for column in log_batch.columns.values()]
+    return (record_template % row for row in zip(*columns))
+
+
+def write_json_partition(
+    log_batch: RecordBatch[ProcessedLogFields], *, filepath: Path, lines: bool = False
+) -> None:
+    """Write a batch as a JSON array, or as newline-delimited JSON with `lines`.
+
+    Records are written as they are encoded, rather than encoding the whole day
+    first.
+    """
+    records = _json_records(log_batch)
+    with open(filepath, "w") as f:
+        if not lines:
+            f.write("[")
+        separator = "\n" if lines else ", "
+        first = True
+        while chunk := list(islice(records, _JSON_WRITE_ROWS)):
+            if lines:
+                f.write(separator.join(chunk) + separator)
+            else:
+                f.write(("" if first else separator) + separator.join(chunk))
+            first = False
+        if not lines:
+            f.write("]")
+
+
+def write_partition(
+    log_batch: RecordBatch[ProcessedLogFields], *, filepath: Path
+) -> None:
+    """Write a daily partition, in the format its file extension says."""
+    if filepath.suffix == f".{PartitionFormat.PARQUET.value}":
+        write_parquet_partition(log_batch, filepath=filepath)
+    else:
+        write_json_partition(
+            log_batch,
+            filepath=filepath,
+            lines=filepath.suffix == f".{PartitionFormat.NDJSON.value}",
+        )
+
+
+def read_partition_dicts(filepath: Path) -> list[dict]:
+    """Read a daily partition back into the records it was written from."""
+    if filepath.suffix == f".{PartitionFormat.PARQUET.value}":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(filepath).to_pylist()
+
+    with open(filepath) as f:
+        if filepath.suffix == f".{PartitionFormat.NDJSON.value}":
+            log_dicts = [json.loads(line) for line in f]
+        else:
+            log_dicts = json.load(f)
+    for log_dict in log_dicts:
+        log_dict["date"] = dt.date.fromisoformat(log_dict["date"])
+    return log_dicts
+
+
+def read_partition(
+    filepath: Path,
+    *,
+    columns: Optional[list[str]] = None,
+    dataset: Optional[str] = None,
+) -> "pd.DataFrame":
+    """Read a daily partition, optionally only the given columns and the rows of
+    one dataset.
+
+    From Parquet, only the row groups that can hold `dataset` are read. NDJSON is
+    parsed and filtered a chunk at a time. A JSON array is parsed whole, but only
+    the records of `dataset` are built into the frame. Dates are returned as
+    datetimes whatever the format. pandas is imported here rather than with the
+    module, so ingest can write partitions without it.
+    """
+    import pandas as pd
+
+    def select(data: "pd.DataFrame") -> "pd.DataFrame":
+        if dataset is not None:
+            data = data[data["dataset"] == dataset]
+        return data if columns is None else data[columns]
+
+    if filepath.suffix == f".{PartitionFormat.PARQUET.value}":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(
+            filepath,
+            columns=columns,
+            filters=None if dataset is None else [("dataset", "==", dataset)],
+        )
+        data = table.to_pandas(date_as_object=False)
+        # Dictionary-encoded columns come back categorical, with the categories in
+        # order of appearance. Sort them so grouped output is ordered the same as
+        # for plain strings.
+        for column in data.select_dtypes("category").columns:
+            data[column] = data[column].cat.reorder_categories(
+                sorted(data[column].cat.categories)
+            )
+        return data
+
+    if filepath.suffix == f".{PartitionFormat.NDJSON.value}":
+        # Parsed in chunks, keeping only the wanted rows and columns of each.
+        chunks = pd.read_json(filepath, lines=True, chunksize=NDJSON_CHUNK_ROWS)
+        return pd.concat(select(chunk) for chunk in chunks)
+
+    with open(filepath) as f:
+        log_dicts = json.load(f)
+    if dataset is not None:
+        log_dicts = [
+            log_dict for log_dict in log_dicts if log_dict["dataset"] == dataset
+        ]
+    data = pd.DataFrame.from_records(log_dicts, columns=columns)
+    if "date" in data:
+        data["date"] = pd.to_datetime(data["date"])
+    return data
+
+
+def partition_is_empty(filepath: Path) -> bool:
+    """Check for a day without downloads, without reading the whole file."""
+    if filepath.suffix == f".{PartitionFormat.PARQUET.value}":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(filepath).metadata.num_rows == 0
+
+    # An empty JSON partition is just "[]", and an empty NDJSON one has no lines.
+    return os.path.getsize(filepath) <= 2
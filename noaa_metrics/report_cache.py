@@ -0,0 +1,135 @@
+import datetime as dt
+import hashlib
+import json
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from noaa_metrics.constants.paths import REPORT_CACHE_DIR
+from noaa_metrics.run_metrics import count
+
+# The summary and the by day, dataset and location tables of a report
+ReportTables = tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]
+
+REPORT_CACHE_MAX_BYTES = 64 * 2**20
+
+
+def report_cache_key(
+    input_filepaths: Iterable[Path],
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    dataset: str,
+    approximate_users: Optional[float] = None,
+    from_rollups: bool = False,
+) -> str:
+    """Hash what a report's tables depend on into a cache key.
+
+    The inputs are identified by their name, size and modification time, so
+    re-ingesting a day changes the key of every report that read it, without
+    hashing the files' contents. A missing input is part of the key too.
+    """
+    inputs: list[tuple[str, Optional[int], Optional[int]]] = []
+    for filepath in input_filepaths:
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            inputs.append((str(filepath), None, None))
+        else:
+            inputs.append((str(filepath), stat.st_size, stat.st_mtime_ns))
+    key = {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "dataset": dataset,
+        "approximate_users": approximate_users,
+        "from_rollups": from_rollups,
+        "inputs": inputs,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def _table_to_dict(table: pd.DataFrame) -> dict:
+    return {
+        "index_name": table.index.name,
+        "index": table.index.tolist(),
+        "columns": table.columns.tolist(),
+        "data": json.loads(table.to_json(orient="values")),
+    }
+
+
+def _table_from_dict(table: dict) -> pd.DataFrame:
+    return pd.DataFrame(
+        table["data"],
+        index=pd.Index(table["index"], name=table["index_name"]),
+        columns=table["columns"],
+    )
+
+
+class ReportCache:
+    """Report tables stored as JSON files in `cache_dir`, one per cache key.
+
+    Once the files add up to more than `max_bytes`, the least recently used are
+    deleted. Entries for inputs that have since changed are never looked up again,
+    so they're the first to go.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = REPORT_CACHE_DIR,
+        *,
+        max_bytes: int = REPORT_CACHE_MAX_BYTES,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _filepath(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[ReportTables]:
+        """Return the cached tables of `key`, if any."""
+        filepath = self._filepath(key)
+        try:
+            with open(filepath) as f:
+                tables = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            count("report_cache_misses")
+            return None
+
+        # The modification time records when the entry was last used.
+        os.utime(filepath)
+        count("report_cache_hits")
+        summary_df, by_day_df, by_dataset_df, by_location_df = map(
+            _table_from_dict, tables
+        )
+        return summary_df, by_day_df, by_dataset_df, by_location_df
+
+    def set(self, key: str, tables: ReportTables) -> None:
+        """Store the tables of `key`, replacing any file atomically, then evict the
+        least recently used entries over `max_bytes`."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        filepath = self._filepath(key)
+        tmp_filepath = filepath.with_name(f".{filepath.name}.tmp")
+        with open(tmp_filepath, "w") as f:
+            json.dump([_table_to_dict(table) for table in tables], f)
+        os.replace(tmp_filepath, filepath)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for filepath in self.cache_dir.glob("*.json"):
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                # Evicted by another run.
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, filepath))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, filepath in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            filepath.unlink(missing_ok=True)
+            total_bytes -= size
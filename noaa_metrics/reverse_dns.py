@@ -0,0 +1,222 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from socket import gethostbyaddr
+from typing import Optional, Union
+
+from noaa_metrics.constants.country_codes import COUNTRY_CODES
+from noaa_metrics.constants.paths import DNS_CACHE_FILEPATH
+from noaa_metrics.run_metrics import count, observe_dns_lookup
+
+# Takes an IP address and returns its hostname, raising `socket.herror` if the
+# address doesn't have one, or another `OSError` if the lookup failed. Swap in a
+# fake to resolve without a network.
+Resolver = Callable[[str], str]
+
+DNS_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+DNS_CACHE_NEGATIVE_TTL_SECONDS = 24 * 60 * 60
+DNS_LOOKUP_TIMEOUT_SECONDS = 5.0
+DNS_LOOKUP_WORKERS = 32
+
+# How often to check for lookups that have run past their timeout.
+_POLL_INTERVAL_SECONDS = 0.05
+
+
+def gethostname(ip_address: str) -> str:
+    """Get the hostname of an IP address from the system resolver."""
+    return gethostbyaddr(ip_address)[0]
+
+
+def hostname_to_ip_location(hostname: str) -> str:
+    """Use the country codes dictionary to match the hostname's suffix with the
+    country/domain location."""
+    host_suffix = hostname.split(".")[-1]
+    # Add to unrecognized category if suffix isn't in list
+    return COUNTRY_CODES.get(host_suffix, COUNTRY_CODES[""])
+
+
+def ip_address_to_ip_location(
+    ip_address: str, *, resolver: Resolver = gethostname
+) -> tuple[str, bool]:
+    """Look up the location of a single IP address.
+
+    Also returns whether the address had a hostname at all.
+    """
+    try:
+        hostname = resolver(ip_address)
+    except socket.herror:
+        return COUNTRY_CODES[""], False
+    return hostname_to_ip_location(hostname), True
+
+
+class DnsCache:
+    """IP address to location cache, persisted as JSON so it's shared across runs.
+
+    Entries expire after `ttl` seconds. Addresses without a hostname are cached too,
+    for the shorter `negative_ttl`.
+    """
+
+    def __init__(
+        self,
+        filepath: Optional[Path] = DNS_CACHE_FILEPATH,
+        *,
+        ttl: float = DNS_CACHE_TTL_SECONDS,
+        negative_ttl: float = DNS_CACHE_NEGATIVE_TTL_SECONDS,
+    ) -> None:
+        self.filepath = filepath
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # IP address -> (location, expiry as seconds since the epoch)
+        self._entries: dict[str, tuple[str, float]] = {}
+
+        if filepath is not None and filepath.is_file():
+            with open(filepath) as f:
+                entries = json.load(f)
+            now = time.time()
+            self._entries = {
+                ip_address: (location, expires)
+                for ip_address, (location, expires) in entries.items()
+                if expires > now
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, ip_address: str) -> Optional[str]:
+        """Return the cached location of `ip_address`, if it hasn't expired."""
+        entry = self._entries.get(ip_address)
+        if entry is None:
+            return None
+
+        location, expires = entry
+        if expires <= time.time():
+            del self._entries[ip_address]
+            return None
+        return location
+
+    def set(self, ip_address: str, location: str, *, negative: bool = False) -> None:
+        ttl = self.negative_ttl if negative else self.ttl
+        self._entries[ip_address] = (location, time.time() + ttl)
+
+    def save(self) -> None:
+        """Write the cache to disk, replacing the previous file atomically."""
+        if self.filepath is None:
+            return
+
+        tmp_filepath = self.filepath.with_name(f".{self.filepath.name}.tmp")
+        with open(tmp_filepath, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_filepath, self.filepath)
+
+
+def resolve_ip_locations(
+    ip_addresses: Iterable[str],
+    *,
+    cache: DnsCache,
+    resolver: Resolver = gethostname,
+    max_workers: int = DNS_LOOKUP_WORKERS,
+    timeout: float = DNS_LOOKUP_TIMEOUT_SECONDS,
+) -> dict[str, str]:
+    """Look up the location of each distinct IP address.
+
+    Addresses in `cache` are not looked up again. The rest are resolved concurrently
+    and each lookup gets `timeout` seconds. Lookups that time out or fail, e.g. on a
+    temporary resolver error, are reported as unrecognized but not cached, so they
+    are retried on the next run.
+
+    The lookups run on daemon threads. A lookup that timed out can't be interrupted,
+    but it's left behind rather than waited for, even when the process exits.
+    """
+    ip_locations: dict[str, str] = {}
+    to_resolve = []
+    for ip_address in set(ip_addresses):
+        location = cache.get(ip_address)
+        if location is None:
+            to_resolve.append(ip_address)
+        else:
+            ip_locations[ip_address] = location
+    count("dns_cache_hits", len(ip_locations))
+    count("dns_cache_misses", len(to_resolve))
+
+    if not to_resolve:
+        return ip_locations
+
+    addresses: queue.SimpleQueue[str] = queue.SimpleQueue()
+    for ip_address in to_resolve:
+        addresses.put(ip_address)
+    # IP address -> its location and whether it had a hostname, None if the lookup
+    # failed, or the exception the resolver raised unexpectedly
+    results: queue.SimpleQueue[
+        tuple[str, Union[tuple[str, bool], None, Exception]]
+    ] = queue.SimpleQueue()
+    started: dict[str, float] = {}
+    stopped = threading.Event()
+
+    def lookup(ip_address: str) -> Optional[tuple[str, bool]]:
+        started[ip_address] = start = time.monotonic()
+        try:
+            return ip_address_to_ip_location(ip_address, resolver=resolver)
+        except OSError:
+            return None
+        finally:
+            observe_dns_lookup(time.monotonic() - start)
+
+    def work() -> None:
+        while not stopped.is_set():
+            try:
+                ip_address = addresses.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results.put((ip_address, lookup(ip_address)))
+            except Exception as e:
+                results.put((ip_address, e))
+
+    for _ in range(min(max_workers, len(to_resolve))):
+        threading.Thread(target=work, name="dns-lookup", daemon=True).start()
+
+    pending = set(to_resolve)
+    try:
+        while pending:
+            finished = []
+            try:
+                finished.append(results.get(timeout=_POLL_INTERVAL_SECONDS))
+                while True:
+                    finished.append(results.get_nowait())
+            except queue.Empty:
+                pass
+            for ip_address, result in finished:
+                if isinstance(result, Exception):
+                    raise result
+                if ip_address not in pending:
+                    # Finished after timing out.
+                    continue
+                pending.remove(ip_address)
+                if result is None:
+                    ip_locations[ip_address] = COUNTRY_CODES[""]
+                    count("dns_lookup_errors")
+                    continue
+                location, found = result
+                cache.set(ip_address, location, negative=not found)
+                ip_locations[ip_address] = location
+
+            now = time.monotonic()
+            timed_out = {
+                ip_address
+                for ip_address in pending
+                if ip_address in started and now - started[ip_address] > timeout
+            }
+            for ip_address in timed_out:
+                ip_locations[ip_address] = COUNTRY_CODES[""]
+            count("dns_lookup_timeouts", len(timed_out))
+            pending -= timed_out
+    finally:
+        # Workers stuck in a lookup finish it on their own, but start no others.
+        stopped.set()
+
+    return ip_locations
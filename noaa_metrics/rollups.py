@@ -0,0 +1,116 @@
+import datetime as dt
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional, cast
+
+from noaa_metrics.constants.paths import JSON_OUTPUT_DIR
+from noaa_metrics.partitions import find_partition, read_partition_dicts
+from noaa_metrics.util.batches import DateColumn, IntColumn, RecordBatch, StringColumn
+from noaa_metrics.util.dataclasses import ProcessedLogFields, RollupFields
+from noaa_metrics.util.hyperloglog import DEFAULT_PRECISION, HyperLogLog
+from noaa_metrics.util.json import DateFriendlyJSONEncoder
+
+# Reports asking for less precision reduce the stored sketches.
+ROLLUP_SKETCH_PRECISION = DEFAULT_PRECISION
+# Sketches of fewer IP addresses aren't stored, but rebuilt from the addresses when
+# needed. That's quick for so few, and most rollups have only a handful.
+ROLLUP_SKETCH_MIN_IP_ADDRESSES = 100
+
+
+def rollup_filepath(date: dt.date, *, output_dir: Path = JSON_OUTPUT_DIR) -> Path:
+    return output_dir / f"noaa-metrics-rollup-{date:%Y-%m-%d}.json"
+
+
+def build_rollups(log_batch: RecordBatch[ProcessedLogFields]) -> list[RollupFields]:
+    """Roll up download records by date, dataset and location.
+
+    Rollups keep the set of IP addresses, so distinct users can still be counted
+    exactly after merging them. Those with at least `ROLLUP_SKETCH_MIN_IP_ADDRESSES`
+    also keep a sketch of it for approximate counts.
+    """
+    dates = cast(DateColumn, log_batch.columns["date"])
+    datasets = cast(StringColumn, log_batch.columns["dataset"])
+    ip_locations = cast(StringColumn, log_batch.columns["ip_location"])
+    ip_addresses = cast(StringColumn, log_batch.columns["ip_address"])
+    download_bytes = cast(IntColumn, log_batch.columns["download_bytes"])
+
+    # Grouped on the encoded columns; strings are only decoded once per group.
+    files: Counter[tuple[int, int, int]] = Counter()
+    total_bytes: Counter[tuple[int, int, int]] = Counter()
+    ip_codes: defaultdict[tuple[int, int, int], set[int]] = defaultdict(set)
+    for key, ip_code, row_bytes in zip(
+        zip(dates.ordinals, datasets.codes, ip_locations.codes),
+        ip_addresses.codes,
+        download_bytes.values,
+    ):
+        files[key] += 1
+        total_bytes[key] += row_bytes
+        ip_codes[key].add(ip_code)
+
+    rollups = []
+    for key in files:
+        date_ordinal, dataset_code, ip_location_code = key
+        rollup_ip_addresses = sorted(
+            ip_addresses.values[code] for code in ip_codes[key]
+        )
+        ip_sketch = None
+        if len(rollup_ip_addresses) >= ROLLUP_SKETCH_MIN_IP_ADDRESSES:
+            ip_sketch = HyperLogLog(ROLLUP_SKETCH_PRECISION)
+            ip_sketch.update(rollup_ip_addresses)
+        rollups.append(
+            RollupFields(
+                date=dt.date.fromordinal(date_ordinal),
+                dataset=datasets.values[dataset_code],
+                ip_location=ip_locations.values[ip_location_code],
+                files=files[key],
+                download_bytes=total_bytes[key],
+                ip_addresses=rollup_ip_addresses,
+                ip_sketch=None if ip_sketch is None else ip_sketch.to_string(),
+            )
+        )
+    rollups.sort(key=lambda rollup: (rollup.date, rollup.dataset, rollup.ip_location))
+    return rollups
+
+
+def write_rollups(
+    rollups: list[RollupFields], *, date: dt.date, output_dir: Path = JSON_OUTPUT_DIR
+) -> None:
+    # Shallow copies; `asdict` would copy every list of IP addresses. Encoded in one
+    # go, which is much faster than `json.dump`'s many small writes.
+    rollup_dicts = [vars(rollup) for rollup in rollups]
+    with open(rollup_filepath(date, output_dir=output_dir), "w") as f:
+        f.write(json.dumps(rollup_dicts, cls=DateFriendlyJSONEncoder))
+
+
+def read_rollups(
+    date: dt.date, *, output_dir: Path = JSON_OUTPUT_DIR
+) -> Optional[list[RollupFields]]:
+    """Read a day's rollups.
+
+    Days ingested before rollups existed are rolled up from their partition file.
+    Returns None if the day wasn't ingested at all.
+    """
+    filepath = rollup_filepath(date, output_dir=output_dir)
+    if filepath.is_file():
+        with open(filepath) as f:
+            rollup_dicts = json.load(f)
+        for rollup_dict in rollup_dicts:
+            rollup_dict["date"] = dt.date.fromisoformat(rollup_dict["date"])
+        return [RollupFields(**rollup_dict) for rollup_dict in rollup_dicts]
+
+    partition = find_partition(date, output_dir=output_dir)
+    if partition is None:
+        return None
+    return build_rollups(
+        RecordBatch.from_dicts(ProcessedLogFields, read_partition_dicts(partition))
+    )
+
+
+def rollup_ip_sketch(rollup: RollupFields) -> HyperLogLog:
+    """Get the sketch of a rollup's IP addresses, building it if it wasn't stored."""
+    if rollup.ip_sketch is None:
+        ip_sketch = HyperLogLog(ROLLUP_SKETCH_PRECISION)
+        ip_sketch.update(rollup.ip_addresses)
+        return ip_sketch
+    return HyperLogLog.from_string(rollup.ip_sketch)
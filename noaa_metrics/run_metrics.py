@@ -0,0 +1,273 @@
+import cProfile
+import dataclasses
+import datetime as dt
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from noaa_metrics.util.dataclasses import StageMetrics
+
+# Upper bounds of the DNS lookup latency histogram buckets, in seconds
+DNS_LOOKUP_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# The run being recorded, if any. Like logging, instrumented code records into it
+# without having to be handed it.
+_current_run: Optional["RunMetrics"] = None
+
+
+def peak_rss_bytes() -> int:
+    """Get the most memory this process has held so far."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In kibibytes on Linux, but bytes on macOS.
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+class RunMetrics:
+    """Timings and counts of one `ingest` or `report` run.
+
+    Stages are timed in wall and CPU time; a stage entered more than once adds up.
+    Counters count anything else, like the lines dropped by each filter. Work done
+    in worker processes is timed as part of the stage that started the pool, but
+    isn't counted.
+    """
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.started = dt.datetime.now(dt.timezone.utc)
+        self.stages: dict[str, StageMetrics] = {}
+        self.counters: dict[str, int] = {}
+        # Lookups that took up to each of `DNS_LOOKUP_BUCKETS`, then longer ones
+        self.dns_lookup_counts = [0] * (len(DNS_LOOKUP_BUCKETS) + 1)
+        self.dns_lookup_seconds = 0.0
+        # The first error the run failed with
+        self.error: Optional[str] = None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        # Lookups are observed from a pool of threads.
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_dns_lookup(self, seconds: float) -> None:
+        bucket = next(
+            (i for i, bound in enumerate(DNS_LOOKUP_BUCKETS) if seconds <= bound),
+            len(DNS_LOOKUP_BUCKETS),
+        )
+        with self._lock:
+            self.dns_lookup_counts[bucket] += 1
+            self.dns_lookup_seconds += seconds
+
+    def finish(self) -> None:
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+
+    def summary(self) -> dict:
+        """Get the metrics as a JSON-serializable summary of the run."""
+        hits = self.counters.get("dns_cache_hits", 0)
+        misses = self.counters.get("dns_cache_misses", 0)
+        cumulative_counts = [
+            sum(self.dns_lookup_counts[: i + 1])
+            for i in range(len(self.dns_lookup_counts))
+        ]
+        return {
+            "command": self.command,
+            "started": self.started.isoformat(),
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "error": self.error,
+            "stages": {
+                name: dataclasses.asdict(stage) for name, stage in self.stages.items()
+            },
+            "counters": self.counters,
+            "dns": {
+                "cache_hit_rate": hits / (hits + misses) if hits + misses else None,
+                "lookup_seconds": {
+                    "buckets": dict(
+                        zip([*map(str, DNS_LOOKUP_BUCKETS), "+Inf"], cumulative_counts)
+                    ),
+                    "sum": self.dns_lookup_seconds,
+                    "count": cumulative_counts[-1],
+                },
+            },
+        }
+
+
+@contextmanager
+def stage(name: str, *, records_in: Optional[int] = None) -> Iterator[StageMetrics]:
+    """Time a stage of the current run, if one is being recorded.
+
+    Set `records_out` on the result when the stage has an output to count.
+    """
+    metrics = StageMetrics(records_in=records_in)
+    run = _current_run
+    if run is None:
+        yield metrics
+        return
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield metrics
+    except BaseException as e:
+        if run.error is None:
+            run.error = f"{name}: {e!r}"
+        raise
+    finally:
+        metrics.wall_seconds = time.perf_counter() - wall_start
+        metrics.cpu_seconds = time.process_time() - cpu_start
+        metrics.peak_rss_bytes = peak_rss_bytes()
+        with run._lock:
+            total = run.stages.get(name)
+            if total is None:
+                run.stages[name] = metrics
+            else:
+                total.wall_seconds += metrics.wall_seconds
+                total.cpu_seconds += metrics.cpu_seconds
+                total.peak_rss_bytes = metrics.peak_rss_bytes
+                for field in ("records_in", "records_out"):
+                    value = getattr(metrics, field)
+                    if value is not None:
+                        setattr(total, field, (getattr(total, field) or 0) + value)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add `value` to a counter of the current run, if one is being recorded."""
+    if _current_run is not None:
+        _current_run.count(name, value)
+
+
+def observe_dns_lookup(seconds: float) -> None:
+    if _current_run is not None:
+        _current_run.observe_dns_lookup(seconds)
+
+
+def record_error(error: BaseException) -> None:
+    """Record that the current run failed, unless it already failed in a stage."""
+    if _current_run is not None and _current_run.error is None:
+        _current_run.error = repr(error)
+
+
+def _prometheus_labels(**labels: str) -> str:
+    escaped = {
+        name: value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for name, value in labels.items()
+    }
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped.items()) + "}"
+
+
+def prometheus_text(run: RunMetrics) -> str:
+    """Format the metrics of a run in the Prometheus text exposition format."""
+    summary = run.summary()
+    command = run.command
+    lines = []
+
+    def gauge(name: str, description: str, samples: list[tuple[dict, float]]) -> None:
+        lines.append(f"# HELP noaa_metrics_{name} {description}")
+        lines.append(f"# TYPE noaa_metrics_{name} gauge")
+        for labels, value in samples:
+            label_text = _prometheus_labels(command=command, **labels)
+            lines.append(f"noaa_metrics_{name}{label_text} {value}")
+
+    gauge("run_success", "Whether the run succeeded.", [({}, int(run.error is None))])
+    gauge(
+        "run_timestamp_seconds",
+        "When the run finished, in seconds since the epoch.",
+        [({}, time.time())],
+    )
+    gauge("run_wall_seconds", "Wall time of the run.", [({}, run.wall_seconds)])
+    gauge("run_cpu_seconds", "CPU time of the run.", [({}, run.cpu_seconds)])
+    gauge(
+        "run_peak_rss_bytes",
+        "Most memory held by the run.",
+        [({}, summary["peak_rss_bytes"])],
+    )
+    for field, description in (
+        ("wall_seconds", "Wall time of each stage."),
+        ("cpu_seconds", "CPU time of each stage."),
+        ("records_in", "Records into each stage."),
+        ("records_out", "Records out of each stage."),
+    ):
+        gauge(
+            f"stage_{field}",
+            description,
+            [
+                ({"stage": name}, stage[field])
+                for name, stage in summary["stages"].items()
+                if stage[field] is not None
+            ],
+        )
+    gauge(
+        "count",
+        "Counts of lines dropped by each filter, DNS cache hits, and so on.",
+        [({"name": name}, value) for name, value in run.counters.items()],
+    )
+
+    name = "noaa_metrics_dns_lookup_seconds"
+    lookup_seconds = summary["dns"]["lookup_seconds"]
+    lines.append(f"# HELP {name} Latency of reverse DNS lookups.")
+    lines.append(f"# TYPE {name} histogram")
+    for bound, cumulative_count in lookup_seconds["buckets"].items():
+        labels = _prometheus_labels(command=command, le=bound)
+        lines.append(f"{name}_bucket{labels} {cumulative_count}")
+    labels = _prometheus_labels(command=command)
+    lines.append(f"{name}_sum{labels} {lookup_seconds['sum']}")
+    lines.append(f"{name}_count{labels} {lookup_seconds['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomically(filepath: Path, text: str) -> None:
+    # So a collector never reads a half-written file.
+    tmp_filepath = filepath.with_name(f".{filepath.name}.tmp")
+    with open(tmp_filepath, "w") as f:
+        f.write(text)
+    os.replace(tmp_filepath, filepath)
+
+
+@contextmanager
+def record_run(
+    command: str,
+    *,
+    summary_filepath: Optional[Path] = None,
+    prometheus_filepath: Optional[Path] = None,
+    profile_filepath: Optional[Path] = None,
+) -> Iterator[RunMetrics]:
+    """Record the metrics of a run, and write them out when it ends.
+
+    The summary is written as JSON to `summary_filepath` and in the Prometheus
+    textfile format to `prometheus_filepath`, if given, even if the run fails. With
+    `profile_filepath`, the run is also profiled with cProfile; read the dump with
+    `pstats` or a viewer like snakeviz.
+    """
+    global _current_run
+    run = RunMetrics(command)
+    previous_run, _current_run = _current_run, run
+    profile = cProfile.Profile()
+    if profile_filepath is not None:
+        profile.enable()
+    try:
+        yield run
+    except BaseException as e:
+        if run.error is None:
+            run.error = repr(e)
+        raise
+    finally:
+        if profile_filepath is not None:
+            profile.disable()
+            profile.dump_stats(profile_filepath)
+        _current_run = previous_run
+        run.finish()
+        if summary_filepath is not None:
+            _write_atomically(summary_filepath, json.dumps(run.summary(), indent=2))
+        if prometheus_filepath is not None:
+            _write_atomically(prometheus_filepath, prometheus_text(run))
@@ -0,0 +1,367 @@
+import datetime as dt
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from noaa_metrics.aggregate_logs import (
+    AggregateBy,
+    format_downloads_by,
+    format_summary_stats,
+    read_partition_timed,
+)
+from noaa_metrics.constants.defaults import SERVE_CACHE_SIZE, SERVE_REFRESH_SECONDS
+from noaa_metrics.constants.paths import JSON_OUTPUT_DIR
+from noaa_metrics.partitions import find_partition, partition_dates
+
+logger = logging.getLogger(__name__)
+
+# Column headers of the `downloads_by` tables, as in the report.
+_COLUMN_HEADERS = {
+    AggregateBy.DATE: "Date",
+    AggregateBy.DATASET: "Dataset",
+    AggregateBy.TLD: "Domain",
+}
+
+
+class MetricsStore:
+    """The daily partitions of `output_dir`, held in memory to answer report queries.
+
+    Each day is stored as the files and volume of each (dataset, location, IP
+    address), with locations and IP addresses as integer codes shared by all days.
+    That is all the report tables need, and far smaller than the download records.
+    Days are split by dataset, so a query concatenates only the pieces it asks for.
+    `refresh` loads only the days whose files are new or changed, without blocking
+    queries while it reads them. Query results are cached until a refresh changes
+    something.
+    """
+
+    def __init__(
+        self, output_dir: Path = JSON_OUTPUT_DIR, *, cache_size: int = SERVE_CACHE_SIZE
+    ) -> None:
+        self.output_dir = output_dir
+        # (Date, dataset) -> the day's totals of the dataset
+        self._days: dict[tuple[dt.date, str], pd.DataFrame] = {}
+        # Date -> the file and modification time its totals are from
+        self._day_sources: dict[dt.date, tuple[Path, int]] = {}
+        self._ip_codes: dict[str, int] = {}
+        self._location_codes: dict[str, int] = {}
+        # Counts the refreshes that changed something, so results cached before one
+        # are never returned after it.
+        self._generation = 0
+        # Guards the days against queries while a refresh swaps them. Only one
+        # refresh runs at a time.
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._query = lru_cache(maxsize=cache_size)(self._uncached_query)
+
+    def _shared_codes(
+        self, values: pd.Series, codes_by_value: dict[str, int]
+    ) -> np.ndarray:
+        """Encode values with the codes shared by all days, adding new ones."""
+        codes, uniques = pd.factorize(values)
+        with self._lock:
+            shared_codes = np.array(
+                [
+                    codes_by_value.setdefault(value, len(codes_by_value))
+                    for value in uniques
+                ],
+                dtype=np.int64,
+            )
+        return shared_codes[codes]
+
+    def _load_day(self, filepath: Path) -> dict[str, pd.DataFrame]:
+        log_df, seconds = read_partition_timed(
+            filepath, columns=["ip_address", "download_bytes", "dataset", "ip_location"]
+        )
+        logger.info(f"Read {filepath} in {seconds:.3f}s")
+        if log_df is None:
+            return {}
+
+        day_df = (
+            log_df.assign(
+                location_code=self._shared_codes(
+                    log_df["ip_location"], self._location_codes
+                ),
+                ip_code=self._shared_codes(log_df["ip_address"], self._ip_codes),
+            )
+            .groupby(["dataset", "location_code", "ip_code"], observed=True)
+            .agg(
+                files=("download_bytes", "size"),
+                download_bytes=("download_bytes", "sum"),
+            )
+            .reset_index(["location_code", "ip_code"])
+        )
+        return {
+            dataset: dataset_df.reset_index(drop=True)
+            for dataset, dataset_df in day_df.groupby(level="dataset", observed=True)
+        }
+
+    def refresh(self) -> bool:
+        """Load the days whose partitions are new or changed since the last refresh.
+
+        Returns whether anything changed.
+        """
+        with self._refresh_lock:
+            dates = set(partition_dates(self.output_dir))
+            loaded: dict[dt.date, dict[str, pd.DataFrame]] = {}
+            sources = {}
+            for date in sorted(dates):
+                filepath = find_partition(date, output_dir=self.output_dir)
+                if filepath is None:
+                    continue
+                try:
+                    source = (filepath, os.stat(filepath).st_mtime_ns)
+                except FileNotFoundError:
+                    # Replaced by the ingest since it was listed.
+                    continue
+                if self._day_sources.get(date) == source:
+                    continue
+
+                loaded[date] = self._load_day(filepath)
+                sources[date] = source
+
+            removed = set(self._day_sources) - dates
+            if not (loaded or removed):
+                return False
+
+            with self._lock:
+                replaced = removed | set(loaded)
+                self._days = {
+                    key: day_df
+                    for key, day_df in self._days.items()
+                    if key[0] not in replaced
+                }
+                for date, dataset_dfs in loaded.items():
+                    for dataset, dataset_df in dataset_dfs.items():
+                        self._days[date, dataset] = dataset_df
+                for date in removed:
+                    del self._day_sources[date]
+                self._day_sources.update(sources)
+                self._generation += 1
+                self._query.cache_clear()
+        return True
+
+    def dates(self) -> list[dt.date]:
+        with self._lock:
+            return sorted(self._day_sources)
+
+    def _select(
+        self, *, start_date: dt.date, end_date: dt.date, dataset: str
+    ) -> pd.DataFrame:
+        keys = [
+            (date, day_dataset)
+            for date, day_dataset in self._days
+            if start_date <= date <= end_date and dataset in ("all", day_dataset)
+        ]
+        if not keys:
+            return pd.DataFrame(
+                columns=["date", "dataset", "ip_location", "ip_code"]
+                + ["files", "download_bytes"]
+            ).astype({"files": np.int64, "download_bytes": np.int64})
+
+        # Concatenated as arrays, which is much faster than `pd.concat` of hundreds
+        # of small frames. The date and dataset of each piece are repeated.
+        day_dfs = [self._days[key] for key in keys]
+        rows = [len(day_df) for day_df in day_dfs]
+        # Every column is int64, so each frame is a single block.
+        location_codes, ip_codes, files, download_bytes = np.concatenate(
+            [day_df.to_numpy() for day_df in day_dfs]
+        ).T
+        datasets, dataset_codes = np.unique(
+            [key[1] for key in keys], return_inverse=True
+        )
+        locations = list(self._location_codes)
+        return pd.DataFrame(
+            {
+                "date": np.repeat(
+                    np.array([key[0] for key in keys], dtype="datetime64[ns]"), rows
+                ),
+                "dataset": pd.Categorical.from_codes(
+                    np.repeat(dataset_codes, rows), datasets
+                ),
+                "ip_location": pd.Categorical.from_codes(
+                    location_codes, locations
+                ).reorder_categories(sorted(locations)),
+                "ip_code": ip_codes,
+                "files": files,
+                "download_bytes": download_bytes,
+            }
+        )
+
+    def summary(
+        self, *, start_date: dt.date, end_date: dt.date, dataset: str = "all"
+    ) -> pd.DataFrame:
+        """Get the summary table of a report."""
+        return self._query(None, start_date, end_date, dataset, self._generation)
+
+    def downloads_by(
+        self,
+        by: AggregateBy,
+        *,
+        start_date: dt.date,
+        end_date: dt.date,
+        dataset: str = "all",
+    ) -> pd.DataFrame:
+        """Get the same table as `aggregate_logs.downloads_by` for a report."""
+        return self._query(by, start_date, end_date, dataset, self._generation)
+
+    def _uncached_query(
+        self,
+        by: Optional[AggregateBy],
+        start_date: dt.date,
+        end_date: dt.date,
+        dataset: str,
+        generation: int,
+    ) -> pd.DataFrame:
+        with self._lock:
+            selected_df = self._select(
+                start_date=start_date, end_date=end_date, dataset=dataset
+            )
+        if by is None:
+            return format_summary_stats(
+                total_files=selected_df["files"].sum(),
+                total_download_bytes=selected_df["download_bytes"].sum(),
+                unique_users=selected_df["ip_code"].nunique(),
+            )
+
+        aggregated_df = (
+            selected_df.groupby(by.value, observed=True)
+            .agg(
+                nunique=("ip_code", "nunique"),
+                count=("files", "sum"),
+                sum=("download_bytes", "sum"),
+            )
+            .sort_index()
+        )
+        return format_downloads_by(aggregated_df, by, column_header=_COLUMN_HEADERS[by])
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Answer `GET /summary` and `GET /downloads?by=...` with JSON tables.
+
+    Both take optional `start_date` and `end_date` (YYYY-MM-DD) and `dataset`
+    parameters, defaulting to every day in the store and all datasets.
+    `/downloads` groups `by` "date", "dataset" or "ip_location".
+    """
+
+    server: "MetricsServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        store = self.server.store
+
+        try:
+            dates = store.dates()
+            start_date = (
+                dt.date.fromisoformat(params["start_date"])
+                if "start_date" in params
+                else (dates[0] if dates else dt.date.min)
+            )
+            end_date = (
+                dt.date.fromisoformat(params["end_date"])
+                if "end_date" in params
+                else (dates[-1] if dates else dt.date.min)
+            )
+            dataset = params.get("dataset", "all")
+            if url.path == "/summary":
+                table = store.summary(
+                    start_date=start_date, end_date=end_date, dataset=dataset
+                )
+            elif url.path == "/downloads":
+                table = store.downloads_by(
+                    AggregateBy(params.get("by", AggregateBy.DATASET.value)),
+                    start_date=start_date,
+                    end_date=end_date,
+                    dataset=dataset,
+                )
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+                return
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        except Exception:
+            logger.exception(f"Failed to answer {self.path}")
+            self._send_json(
+                HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."}
+            )
+            return
+
+        self._send_json(
+            HTTPStatus.OK, json.loads(table.reset_index().to_json(orient="records"))
+        )
+
+    def _send_json(self, status: HTTPStatus, body: object) -> None:
+        encoded = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves the store's metrics, refreshing it every `refresh_seconds` in a
+    background thread, so no request waits for new files to load."""
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        store: MetricsStore,
+        *,
+        refresh_seconds: float = SERVE_REFRESH_SECONDS,
+    ) -> None:
+        super().__init__(address, MetricsRequestHandler)
+        self.store = store
+        self.refresh_seconds = refresh_seconds
+        self._closed = threading.Event()
+        self._refresher = threading.Thread(
+            target=self._refresh_periodically, name="refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def _refresh_periodically(self) -> None:
+        while not self._closed.wait(self.refresh_seconds):
+            try:
+                if self.store.refresh():
+                    logger.info("Loaded new or changed daily files.")
+            except Exception:
+                # Keep serving what's loaded; the next refresh may succeed.
+                logger.exception("Failed to refresh the daily files.")
+
+    def server_close(self) -> None:
+        self._closed.set()
+        self._refresher.join()
+        super().server_close()
+
+
+def serve_metrics(
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    output_dir: Path = JSON_OUTPUT_DIR,
+    refresh_seconds: float = SERVE_REFRESH_SECONDS,
+    cache_size: int = SERVE_CACHE_SIZE,
+) -> None:
+    """Load the daily partitions and answer report queries over HTTP until
+    interrupted."""
+    store = MetricsStore(output_dir, cache_size=cache_size)
+    store.refresh()
+    logger.info(f"Loaded {len(store.dates())} days of downloads.")
+    with MetricsServer((host, port), store, refresh_seconds=refresh_seconds) as server:
+        logger.info(f"Serving on http://{host}:{server.server_address[1]}")
+        server.serve_forever()
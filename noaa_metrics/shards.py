@@ -0,0 +1,136 @@
+import datetime as dt
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Optional, cast
+
+from noaa_metrics.constants.paths import DATASET_RULES_FILEPATH, NGINX_DOWNLOAD_LOG_FILE
+from noaa_metrics.datasets import DatasetRules
+from noaa_metrics.ingest_logs import (
+    _is_compressed,
+    _line_start_at_or_after,
+    filter_raw_fields,
+    find_date_offset,
+    get_log_lines,
+    lines_to_raw_fields,
+    select_log_files,
+)
+from noaa_metrics.util.batches import RecordBatch, StringColumn
+from noaa_metrics.util.dataclasses import RawLogFields
+
+# Several shards per worker even out workers that get through theirs faster.
+SHARDS_PER_WORKER = 4
+
+# A log file and the (start, end) byte offsets of a run of whole lines in it. The
+# offsets of a compressed log are None; it's read whole, from `start_date`.
+Shard = tuple[Path, Optional[int], Optional[int]]
+
+
+def log_shards(
+    log_file: Path, *, start_date: dt.date, end_date: dt.date, shards: int
+) -> list[Shard]:
+    """Split the bytes logged from `start_date` to `end_date` into `shards` ranges.
+
+    Ranges start and end on line boundaries and cover the dates in log order. Some
+    may be empty. Compressed logs can't be split, so they're a single shard.
+    """
+    if _is_compressed(log_file):
+        return [(log_file, None, None)]
+
+    with open(log_file, "rb") as f:
+        start = find_date_offset(f, start_date)
+        end = find_date_offset(f, end_date + dt.timedelta(days=1))
+        size = end - start
+        boundaries = [start]
+        for shard in range(1, shards):
+            boundary = _line_start_at_or_after(f, start + size * shard // shards)
+            boundaries.append(max(min(boundary, end), boundaries[-1]))
+        boundaries.append(end)
+    return [(log_file, start, end) for start, end in zip(boundaries, boundaries[1:])]
+
+
+def read_shard_lines(
+    shard: Shard, *, start_date: dt.date, end_date: dt.date
+) -> Iterator[str]:
+    log_file, start, end = shard
+    if start is None or end is None:
+        yield from get_log_lines(
+            start_date=start_date, end_date=end_date, log_file=log_file
+        )
+        return
+
+    with open(log_file, "rb") as f:
+        f.seek(start)
+        offset = start
+        for raw_line in f:
+            if offset >= end:
+                break
+            offset += len(raw_line)
+            yield raw_line.decode().rstrip()
+
+
+def parse_shard(
+    shard: Shard,
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    dataset_rules_filepath: Path,
+) -> tuple[RecordBatch[RawLogFields], StringColumn]:
+    """Parse, filter and classify the downloads in one shard of the logs.
+
+    Batches are compact to send back from the worker, too.
+    """
+    dataset_rules = DatasetRules.from_file(dataset_rules_filepath)
+    log_lines = read_shard_lines(shard, start_date=start_date, end_date=end_date)
+    raw_batch = RecordBatch.from_records(
+        RawLogFields,
+        filter_raw_fields(
+            lines_to_raw_fields(log_lines), start_date=start_date, end_date=end_date
+        ),
+    )
+    datasets = dataset_rules.classify_column(
+        cast(StringColumn, raw_batch.columns["file_path"])
+    )
+    return raw_batch, datasets
+
+
+def get_sharded_raw_fields(
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    workers: int,
+    log_files: Sequence[Path] = (NGINX_DOWNLOAD_LOG_FILE,),
+    dataset_rules_filepath: Path = DATASET_RULES_FILEPATH,
+) -> tuple[RecordBatch[RawLogFields], StringColumn]:
+    """Parse, filter and classify the logs in a pool of `workers` processes.
+
+    Shards are gathered in log order, so the records and their datasets come out
+    exactly as from a single process.
+    """
+    shards = [
+        shard
+        for log_file in select_log_files(
+            log_files, start_date=start_date, end_date=end_date
+        )
+        for shard in log_shards(
+            log_file,
+            start_date=start_date,
+            end_date=end_date,
+            shards=workers * SHARDS_PER_WORKER,
+        )
+    ]
+    parse = partial(
+        parse_shard,
+        start_date=start_date,
+        end_date=end_date,
+        dataset_rules_filepath=dataset_rules_filepath,
+    )
+
+    raw_batch = RecordBatch(RawLogFields)
+    datasets = StringColumn()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard_raw_batch, shard_datasets in executor.map(parse, shards):
+            raw_batch.extend_batch(shard_raw_batch)
+            datasets.extend(shard_datasets)
+    return raw_batch, datasets
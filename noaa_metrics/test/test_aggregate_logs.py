@@ -0,0 +1,170 @@
+import datetime as dt
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from noaa_metrics import aggregate_logs
+from noaa_metrics.aggregate_logs import (
+    REPORT_COLUMNS,
+    AggregateBy,
+    aggregate_downloads,
+    create_dataframe,
+    downloads_by,
+    format_downloads_by,
+    get_summary_stats,
+    report_tables,
+    stream_report_tables,
+)
+from noaa_metrics.partitions import PartitionFormat, partition_filepath, write_partition
+from noaa_metrics.util.batches import RecordBatch
+from noaa_metrics.util.dataclasses import ProcessedLogFields
+
+START_DATE = dt.date(2023, 1, 1)
+END_DATE = dt.date(2023, 1, 4)
+DATASETS = ["G00001", "G00002", "G00003"]
+LOCATIONS = ["United States", "Canada", "Unrecognized"]
+# Each day in a different format; the third has no downloads.
+PARTITION_FORMATS = [
+    PartitionFormat.JSON,
+    PartitionFormat.NDJSON,
+    PartitionFormat.JSON,
+    PartitionFormat.PARQUET,
+]
+HEADERS = {
+    AggregateBy.DATE: "Date",
+    AggregateBy.DATASET: "Dataset",
+    AggregateBy.TLD: "Domain",
+}
+
+
+def _day_records(date: dt.date, *, downloads: int) -> list[ProcessedLogFields]:
+    # Users come back on other days and for other datasets.
+    return [
+        ProcessedLogFields(
+            date=date,
+            ip_address=f"10.0.0.{(index * 7 + date.day) % 11}",
+            download_bytes=(index + 1) * 1000 + date.day,
+            dataset=DATASETS[(index + date.day) % len(DATASETS)],
+            file_path=f"/usr/share/nginx/html/NOAA/file{index}.nc",
+            ip_location=LOCATIONS[index % len(LOCATIONS)],
+        )
+        for index in range(downloads)
+    ]
+
+
+@pytest.fixture
+def partitions_dir(tmp_path: Path) -> Path:
+    output_dir = tmp_path / "ingest"
+    output_dir.mkdir()
+    for day, partition_format in enumerate(PARTITION_FORMATS):
+        date = START_DATE + dt.timedelta(days=day)
+        records = _day_records(date, downloads=0 if day == 2 else 20 + day)
+        write_partition(
+            RecordBatch.from_records(ProcessedLogFields, records),
+            filepath=partition_filepath(
+                date, partition_format=partition_format, output_dir=output_dir
+            ),
+        )
+    return output_dir
+
+
+def _to_csv(tables) -> list[str]:
+    return [table.to_csv() for table in tables]
+
+
+@pytest.mark.parametrize("dataset", ["all", "G00002"])
+@pytest.mark.parametrize("approximate_users", [None, 0.01])
+def test_stream_report_tables_match_report_tables(
+    tmp_path, monkeypatch, partitions_dir, dataset, approximate_users
+):
+    spilled_pairs = []
+    add = aggregate_logs.SpilledUsers.add
+
+    def spy_add(self, grouping, pairs):
+        pairs = list(pairs)
+        spilled_pairs.extend(pairs)
+        add(self, grouping, pairs)
+
+    monkeypatch.setattr(aggregate_logs.SpilledUsers, "add", spy_add)
+    log_df = create_dataframe(
+        partitions_dir,
+        start_date=START_DATE,
+        end_date=END_DATE,
+        columns=REPORT_COLUMNS,
+        dataset=None if dataset == "all" else dataset,
+    )
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+
+    streamed = stream_report_tables(
+        partitions_dir,
+        start_date=START_DATE,
+        end_date=END_DATE,
+        dataset=dataset,
+        approximate_users=approximate_users,
+        spill_dir=spill_dir,
+    )
+
+    assert _to_csv(streamed) == _to_csv(
+        report_tables(log_df, approximate_users=approximate_users)
+    )
+    # Exact counts always go through the SQLite database, which is cleaned up.
+    assert bool(spilled_pairs) == (approximate_users is None)
+    assert not any(spill_dir.iterdir())
+
+
+def _random_log_df(*, rows: int, users: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    ip_addresses = pd.Series([f"10.0.{i // 256}.{i % 256}" for i in range(users)])
+    return pd.DataFrame(
+        {
+            "date": pd.Timestamp("2023-01-01")
+            + pd.to_timedelta(np.sort(rng.integers(0, 5, rows)), unit="D"),
+            "ip_address": ip_addresses.iloc[rng.integers(0, users, rows)].to_numpy(),
+            "download_bytes": rng.integers(1, 10**7, rows),
+            "dataset": rng.integers(0, 7, rows).astype(str).astype(object),
+            "file_path": "/usr/share/nginx/html/NOAA/G02158/file.tar",
+            "ip_location": rng.integers(0, 4, rows).astype(str).astype(object),
+        }
+    )
+
+
+@pytest.mark.parametrize("approximate_users", [None, 0.01])
+def test_aggregate_downloads_matches_downloads_by(approximate_users):
+    log_df = _random_log_df(rows=2000, users=300)
+
+    summary_df, tables = aggregate_downloads(
+        log_df, approximate_users=approximate_users
+    )
+
+    assert summary_df.equals(
+        get_summary_stats(log_df, approximate_users=approximate_users)
+    )
+    for by, header in HEADERS.items():
+        assert format_downloads_by(tables[by], by, column_header=header).equals(
+            downloads_by(
+                log_df, by, column_header=header, approximate_users=approximate_users
+            )
+        )
+
+
+@pytest.mark.parametrize("dataset", [None, "G00002"])
+def test_aggregate_downloads_matches_downloads_by_on_partitions(
+    partitions_dir, dataset
+):
+    # Columnar partitions are read as categorical columns, with unused categories
+    # when filtered by dataset.
+    log_df = create_dataframe(
+        partitions_dir, start_date=START_DATE, end_date=END_DATE, dataset=dataset
+    )
+
+    summary_df, tables = aggregate_downloads(log_df)
+
+    assert summary_df.to_csv() == get_summary_stats(log_df).to_csv()
+    for by, header in HEADERS.items():
+        assert (
+            format_downloads_by(tables[by], by, column_header=header).to_csv()
+            == downloads_by(log_df, by, column_header=header).to_csv()
+        )
@@ -0,0 +1,47 @@
+import json
+
+from click.testing import CliRunner
+
+from noaa_metrics import convert_logs
+from noaa_metrics.cli import cli
+
+
+def _convert(tmp_path, summary_filepath):
+    access_log = tmp_path / "access.log"
+    access_log.write_bytes(b"")
+    return CliRunner().invoke(
+        cli,
+        [
+            "--metrics-json",
+            str(summary_filepath),
+            "convert",
+            str(access_log),
+            "-o",
+            str(tmp_path / "download.log"),
+        ],
+    )
+
+
+def test_run_metrics_record_success(tmp_path):
+    summary_filepath = tmp_path / "metrics.json"
+
+    result = _convert(tmp_path, summary_filepath)
+
+    assert result.exit_code == 0
+    summary = json.loads(summary_filepath.read_text())
+    assert summary["command"] == "convert"
+    assert summary["error"] is None
+
+
+def test_run_metrics_record_failure(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(convert_logs, "convert_logs", fail)
+    summary_filepath = tmp_path / "metrics.json"
+
+    result = _convert(tmp_path, summary_filepath)
+
+    assert result.exit_code == 1
+    summary = json.loads(summary_filepath.read_text())
+    assert summary["error"] == "OSError('No space left on device')"
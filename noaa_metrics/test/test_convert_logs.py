@@ -0,0 +1,33 @@
+import io
+
+from noaa_metrics.convert_logs import convert_access_lines, convert_logs
+
+ACCESS_LINES = (
+    b'71.6.1.82 - - [04/Jan/2025:00:00:03 +0000] "GET /NOAA/G02158/unmasked/2025/01_Jan/SNODAS_unmasked_20250103.tar HTTP/1.1" 200 34191360 "-" "Wget/1.19.4 (linux-gnu)" "71.6.1.82"\n'
+    b'128.138.1.2 - - [04/Jan/2025:00:00:04 +0000] "GET /NOAA/G02135/north/daily/data/N_seaice_extent_daily_v3.0.csv HTTP/2.0" 206 1024 "https://nsidc.org/" "Mozilla/5.0 (X11; Linux x86_64)" "-"\n'
+    b'10.0.0.1 - - [04/Jan/2025:00:00:05 +0000] "GET /NOAA/G02158/ HTTP/1.1" 200 5120 "-" "curl/8.5.0" "-"\n'
+    b'10.0.0.2 - - [04/Jan/2025:00:00:06 +0000] "POST /NOAA/search.json HTTP/1.1" 200 87 "-" "python-requests/2.31.0" "-"\n'
+    b'10.0.0.3 - - [04/Jan/2025:00:00:07 +0000] "-" 400 0 "-" "-" "-"\n'
+    b"not an access log line\n"
+    b'10.0.0.4 - - [04/Jan/2025:00:00:08 +0000] "GET /robots.txt HTTP/1.1" 404 153 "-" "Googlebot/2.1" "-"'
+)
+
+DOWNLOAD_LINES = (
+    b"[04/Jan/2025:00:00:03 +0000] 1.234 71.6.1.82 34191360 /usr/share/nginx/html/NOAA/G02158/unmasked/2025/01_Jan/SNODAS_unmasked_20250103.tar 200\n"
+    b"[04/Jan/2025:00:00:04 +0000] 1.234 128.138.1.2 1024 /usr/share/nginx/html/NOAA/G02135/north/daily/data/N_seaice_extent_daily_v3.0.csv 206\n"
+    b"[04/Jan/2025:00:00:08 +0000] 1.234 10.0.0.4 153 /usr/share/nginx/html/robots.txt 404\n"
+)
+
+
+def test_convert_access_lines():
+    assert convert_access_lines(ACCESS_LINES) == DOWNLOAD_LINES
+
+
+def test_convert_logs_in_chunks(tmp_path):
+    access_log = tmp_path / "access.log"
+    access_log.write_bytes(ACCESS_LINES)
+    download_log = io.BytesIO()
+
+    convert_logs([access_log], download_log, chunk_bytes=100)
+
+    assert download_log.getvalue() == DOWNLOAD_LINES
@@ -0,0 +1,65 @@
+import pytest
+
+from noaa_metrics.datasets import UNKNOWN_DATASET, DatasetRules
+
+RULES = [
+    {"pattern": "NOAA/(?P<dataset>[^/]+)"},
+    {"pattern": "nsidc-0057", "dataset": "nsidc-0057"},
+    {"pattern": "nsidc-0008", "dataset": "nsidc-0008"},
+    {"pattern": "GPDP", "dataset": "GPDP"},
+]
+
+
+@pytest.mark.parametrize(
+    "file_path, dataset",
+    [
+        ("/usr/share/nginx/html/NOAA/G00001/data/file.nc", "G00001"),
+        ("/x/nsidc-0008/file.txt", "nsidc-0008"),
+        # An earlier rule matching the file name beats the directory's rule.
+        ("/x/nsidc-0008/nsidc-0057.txt", "nsidc-0057"),
+        ("/x/nsidc-0057/nsidc-0008.txt", "nsidc-0057"),
+        ("/x/GPDP.txt", "GPDP"),
+        ("/x/other.txt", UNKNOWN_DATASET),
+    ],
+)
+def test_classify(file_path, dataset):
+    assert DatasetRules(RULES).classify(file_path) == dataset
+
+
+def test_classify_is_cached_per_directory():
+    rules = DatasetRules(RULES)
+    file_paths = [
+        "/x/nsidc-0008/file.txt",
+        "/x/nsidc-0008/nsidc-0057.txt",
+        "/x/nsidc-0008/file.txt",
+        "/x/nsidc-0008/GPDP.txt",
+    ]
+
+    assert [rules.classify(file_path) for file_path in file_paths] == [
+        "nsidc-0008",
+        "nsidc-0057",
+        "nsidc-0008",
+        "nsidc-0008",
+    ]
+
+
+def test_classify_captures_from_the_whole_path():
+    rules = DatasetRules(
+        [
+            {"pattern": "nsidc-0057", "dataset": "nsidc-0057"},
+            {"pattern": "NOAA/(?P<dataset>.+)"},
+        ]
+    )
+    file_paths = [
+        "/x/NOAA/G00001/file1.nc",
+        "/x/NOAA/G00001/file2.nc",
+        "/x/NOAA/G00001/nsidc-0057.txt",
+        "/x/NOAA/G00001/data/file1.nc",
+    ]
+
+    assert [rules.classify(file_path) for file_path in file_paths] == [
+        "G00001/file1.nc",
+        "G00001/file2.nc",
+        "nsidc-0057",
+        "G00001/data/file1.nc",
+    ]
@@ -0,0 +1,204 @@
+import datetime as dt
+import gzip
+from pathlib import Path
+
+import pytest
+
+from noaa_metrics import shards
+from noaa_metrics.checkpoint import read_checkpoint
+from noaa_metrics.ingest_logs import (
+    LocationEngine,
+    _continues_checkpoint,
+    date_from_log_line,
+    find_date_offset,
+    ingest_logs,
+    ingest_logs_incremental,
+    read_log_from_date,
+)
+from noaa_metrics.partitions import PartitionFormat
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+FIXTURE_LOG = FIXTURES_DIR / "download.log"
+IP_DATABASE = FIXTURES_DIR / "ip-country.csv"
+START_DATE = dt.date(2022, 12, 31)
+END_DATE = dt.date(2023, 1, 3)
+LINES = FIXTURE_LOG.read_text().splitlines(keepends=True)
+# Nothing was logged on 1 January.
+GAP_DATE = dt.date(2023, 1, 1)
+GAP_LINES = [line.encode() for line in LINES if date_from_log_line(line) != GAP_DATE]
+# Before the first line, between days, on each day and after the last line
+SEARCH_DATES = [START_DATE + dt.timedelta(days=day) for day in range(-1, 5)]
+
+
+def _read_output(output_dir: Path) -> dict[str, bytes]:
+    return {
+        str(filepath.relative_to(output_dir)): filepath.read_bytes()
+        for filepath in sorted(output_dir.rglob("*"))
+        if filepath.is_file()
+    }
+
+
+def _ingest(output_dir: Path, *, log_files: list[Path], **kwargs) -> dict[str, bytes]:
+    output_dir.mkdir()
+    ingest_logs(
+        log_files=log_files,
+        location_engine=LocationEngine.IP_DATABASE,
+        ip_database_filepath=IP_DATABASE,
+        output_dir=output_dir,
+        **kwargs,
+    )
+    return _read_output(output_dir)
+
+
+def _ingest_lines(tmp_path: Path, lines: list[str]) -> dict[str, bytes]:
+    """Ingest `lines` all at once, over the days they span."""
+    log_file = tmp_path / "expected.log"
+    log_file.write_text("".join(lines))
+    return _ingest(
+        tmp_path / "expected",
+        log_files=[log_file],
+        start_date=date_from_log_line(lines[0]),
+        end_date=date_from_log_line(lines[-1]),
+    )
+
+
+@pytest.mark.parametrize("partition_format", list(PartitionFormat))
+def test_sharded_ingest_matches_serial_ingest(tmp_path, monkeypatch, partition_format):
+    # Many more shards than lines, so most hold a line or none.
+    monkeypatch.setattr(shards, "SHARDS_PER_WORKER", 8)
+
+    serial = _ingest(
+        tmp_path / "serial",
+        log_files=[FIXTURE_LOG],
+        start_date=START_DATE,
+        end_date=END_DATE,
+        partition_format=partition_format,
+        workers=1,
+    )
+    sharded = _ingest(
+        tmp_path / "sharded",
+        log_files=[FIXTURE_LOG],
+        start_date=START_DATE,
+        end_date=END_DATE,
+        partition_format=partition_format,
+        workers=3,
+    )
+
+    assert len(serial) > (END_DATE - START_DATE).days
+    assert sharded == serial
+
+
+class IncrementalIngest:
+    """Ingests a log in `tmp_path` as it's written to, rotated and truncated."""
+
+    def __init__(self, tmp_path: Path) -> None:
+        self.log_file = tmp_path / "download.log"
+        self.checkpoint_filepath = tmp_path / "checkpoint.json"
+        self.output_dir = tmp_path / "incremental"
+        self.output_dir.mkdir()
+        self.log_file.touch()
+
+    def write(self, text: str) -> None:
+        with open(self.log_file, "a") as f:
+            f.write(text)
+
+    def ingest(self) -> dict[str, bytes]:
+        ingest_logs_incremental(
+            log_file=self.log_file,
+            checkpoint_filepath=self.checkpoint_filepath,
+            location_engine=LocationEngine.IP_DATABASE,
+            ip_database_filepath=IP_DATABASE,
+            output_dir=self.output_dir,
+        )
+        return _read_output(self.output_dir)
+
+    def continues_checkpoint(self) -> bool:
+        checkpoint = read_checkpoint(self.checkpoint_filepath)
+        assert checkpoint is not None
+        return _continues_checkpoint(self.log_file, checkpoint)
+
+
+def test_incremental_ingest_resumes_after_appended_lines(tmp_path):
+    log = IncrementalIngest(tmp_path)
+    log.write("".join(LINES[:6]))
+    log.ingest()
+
+    log.write("".join(LINES[6:]))
+    assert log.continues_checkpoint()
+
+    assert log.ingest() == _ingest_lines(tmp_path, LINES)
+
+
+def test_incremental_ingest_finishes_rotated_log(tmp_path):
+    log = IncrementalIngest(tmp_path)
+    log.write("".join(LINES[:5]))
+    log.ingest()
+
+    # Logged before the rotation, but not yet ingested
+    log.write("".join(LINES[5:9]))
+    log.log_file.rename(tmp_path / "download.log.1")
+    log.write("".join(LINES[9:]))
+    assert not log.continues_checkpoint()
+
+    assert log.ingest() == _ingest_lines(tmp_path, LINES)
+
+
+def test_incremental_ingest_restarts_truncated_log(tmp_path):
+    log = IncrementalIngest(tmp_path)
+    log.write("".join(LINES[:8]))
+    log.ingest()
+
+    log.log_file.write_text("".join(LINES[8:]))
+    assert not log.continues_checkpoint()
+
+    assert log.ingest() == _ingest_lines(tmp_path, LINES)
+
+
+def test_incremental_ingest_leaves_partial_last_line(tmp_path):
+    log = IncrementalIngest(tmp_path)
+    partial_line = LINES[6][:20]
+    log.write("".join(LINES[:6]) + partial_line)
+
+    ingested = log.ingest()
+
+    checkpoint = read_checkpoint(log.checkpoint_filepath)
+    assert checkpoint is not None
+    assert checkpoint.offset == len("".join(LINES[:6]).encode())
+    (tmp_path / "partial").mkdir()
+    assert ingested == _ingest_lines(tmp_path / "partial", LINES[:6])
+
+    log.write(LINES[6][len(partial_line) :] + "".join(LINES[7:]))
+    assert log.ingest() == _ingest_lines(tmp_path, LINES)
+
+
+def _lines_from_date(date: dt.date) -> list[bytes]:
+    """Find the lines from `date` on by reading every line."""
+    for index, line in enumerate(GAP_LINES):
+        if date_from_log_line(line.decode()) >= date:
+            return GAP_LINES[index:]
+    return []
+
+
+@pytest.mark.parametrize("date", SEARCH_DATES)
+def test_find_date_offset_matches_linear_scan(tmp_path, date):
+    log_file = tmp_path / "download.log"
+    log_file.write_bytes(b"".join(GAP_LINES))
+
+    with open(log_file, "rb") as f:
+        offset = find_date_offset(f, date)
+
+    assert offset == len(b"".join(GAP_LINES)) - len(b"".join(_lines_from_date(date)))
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+@pytest.mark.parametrize("date", SEARCH_DATES)
+def test_read_log_from_date_matches_linear_scan(tmp_path, date, compressed):
+    if compressed:
+        log_file = tmp_path / "download.log.2.gz"
+        with gzip.open(log_file, "wb") as f:
+            f.write(b"".join(GAP_LINES))
+    else:
+        log_file = tmp_path / "download.log"
+        log_file.write_bytes(b"".join(GAP_LINES))
+
+    assert list(read_log_from_date(log_file, date)) == _lines_from_date(date)
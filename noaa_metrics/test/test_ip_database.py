@@ -0,0 +1,109 @@
+import gzip
+import ipaddress
+from pathlib import Path
+
+import pytest
+
+from noaa_metrics.constants.country_codes import COUNTRY_CODES
+from noaa_metrics.ip_database import IpDatabase
+
+# 10.0.0.1-10.0.0.3 and 10.0.0.8/29 in the US, 10.0.0.5-10.0.0.6 and 2001:db8::/32
+# in Canada
+IP_DATABASE = Path(__file__).parent / "fixtures" / "ip-country.csv"
+US = COUNTRY_CODES["us"]
+CANADA = COUNTRY_CODES["ca"]
+UNRECOGNIZED = COUNTRY_CODES[""]
+
+
+@pytest.mark.parametrize(
+    "ip_address, location",
+    [
+        ("10.0.0.0", UNRECOGNIZED),
+        ("10.0.0.1", US),
+        ("10.0.0.3", US),
+        ("10.0.0.4", UNRECOGNIZED),
+        ("10.0.0.5", CANADA),
+        ("10.0.0.6", CANADA),
+        ("10.0.0.7", UNRECOGNIZED),
+        ("10.0.0.8", US),
+        ("10.0.0.15", US),
+        ("10.0.0.16", UNRECOGNIZED),
+        ("255.255.255.255", UNRECOGNIZED),
+    ],
+)
+def test_locate_ipv4_range_boundaries_and_gaps(ip_address, location):
+    assert IpDatabase.from_file(IP_DATABASE).locate([ip_address]) == {
+        ip_address: location
+    }
+
+
+@pytest.mark.parametrize(
+    "ip_address, location",
+    [
+        ("2001:db7:ffff:ffff:ffff:ffff:ffff:ffff", UNRECOGNIZED),
+        ("2001:db8::", CANADA),
+        ("2001:DB8::1", CANADA),
+        ("2001:db8:ffff:ffff:ffff:ffff:ffff:ffff", CANADA),
+        ("2001:db9::", UNRECOGNIZED),
+        ("::1", UNRECOGNIZED),
+        # IPv4-mapped addresses are looked up as IPv4.
+        ("::ffff:10.0.0.5", CANADA),
+        ("::ffff:10.0.0.4", UNRECOGNIZED),
+    ],
+)
+def test_locate_ipv6(ip_address, location):
+    assert IpDatabase.from_file(IP_DATABASE).locate([ip_address]) == {
+        ip_address: location
+    }
+
+
+@pytest.mark.parametrize(
+    "ip_address", ["", "-", "not-an-ip", "10.0.0.256", "10.0.0", " 10.0.0.1", "::g"]
+)
+def test_locate_invalid_addresses(ip_address):
+    assert IpDatabase.from_file(IP_DATABASE).locate([ip_address]) == {
+        ip_address: UNRECOGNIZED
+    }
+
+
+def test_locate_each_distinct_address(tmp_path):
+    gzipped = tmp_path / "ip-country.csv.gz"
+    with gzip.open(gzipped, "wb") as f:
+        f.write(IP_DATABASE.read_bytes())
+
+    ip_locations = IpDatabase.from_file(gzipped).locate(
+        ["10.0.0.1", "2001:db8::1", "10.0.0.1", "10.0.0.4"]
+    )
+
+    assert ip_locations == {
+        "10.0.0.1": US,
+        "2001:db8::1": CANADA,
+        "10.0.0.4": UNRECOGNIZED,
+    }
+
+
+@pytest.mark.parametrize(
+    "ranges",
+    [
+        # Overlapping
+        [("10.0.0.0", "10.0.0.9", "US"), ("10.0.0.9", "10.0.0.20", "CA")],
+        # Reversed
+        [("10.0.0.9", "10.0.0.0", "US")],
+        # Mixed versions
+        [("10.0.0.0", "2001:db8::", "US")],
+    ],
+)
+def test_invalid_ranges(ranges):
+    with pytest.raises(ValueError):
+        IpDatabase(
+            (ipaddress.ip_address(first), ipaddress.ip_address(last), country_code)
+            for first, last, country_code in ranges
+        )
+
+
+def test_invalid_rows(tmp_path):
+    filepath = tmp_path / "ip-country.csv"
+    filepath.write_text("network,country_code\n10.0.0.0/24,US\n10.0.1.0/33,CA\n")
+
+    with pytest.raises(ValueError, match="row 3"):
+        IpDatabase.from_file(filepath)
@@ -0,0 +1,65 @@
+import datetime as dt
+from pathlib import Path
+
+import pytest
+
+from noaa_metrics.ingest_logs import LogParser, get_filtered_raw_fields
+from noaa_metrics.parse_frames import (
+    extend_raw_batch,
+    filter_raw_frame,
+    read_raw_frames,
+)
+from noaa_metrics.run_metrics import record_run
+from noaa_metrics.util.batches import RecordBatch
+from noaa_metrics.util.dataclasses import RawLogFields
+
+# Spans the days around the range below, with non-2xx statuses, robots.txt, a file
+# path with a space and a line with extra whitespace.
+FIXTURE_LOG = Path(__file__).parent / "fixtures" / "download.log"
+START_DATE = dt.date(2023, 1, 1)
+END_DATE = dt.date(2023, 1, 2)
+
+
+def _parse(parser: LogParser) -> tuple[list[RawLogFields], dict[str, int]]:
+    with record_run("ingest") as run:
+        raw_batch = get_filtered_raw_fields(
+            start_date=START_DATE,
+            end_date=END_DATE,
+            parser=parser,
+            log_files=[FIXTURE_LOG],
+        )
+    return list(raw_batch), run.counters
+
+
+def test_batch_parser_matches_line_parser():
+    line_records, line_counters = _parse(LogParser.LINE)
+    batch_records, batch_counters = _parse(LogParser.BATCH)
+
+    assert batch_records == line_records
+    assert batch_counters == line_counters
+    assert [record.ip_address for record in line_records] == [
+        "10.0.0.1",
+        "10.0.0.4",
+        "10.0.0.7",
+        "10.0.0.8",
+        "10.0.0.1",
+    ]
+
+
+@pytest.mark.parametrize("chunk_lines", [1, 4, 100])
+def test_batch_parser_chunks(chunk_lines):
+    line_records, _ = _parse(LogParser.LINE)
+
+    raw_batch = RecordBatch(RawLogFields)
+    for raw_frame in read_raw_frames(
+        start_date=START_DATE,
+        end_date=END_DATE,
+        log_file=FIXTURE_LOG,
+        chunk_lines=chunk_lines,
+    ):
+        extend_raw_batch(
+            raw_batch,
+            filter_raw_frame(raw_frame, start_date=START_DATE, end_date=END_DATE),
+        )
+
+    assert list(raw_batch) == line_records
@@ -0,0 +1,57 @@
+import datetime as dt
+
+import pytest
+
+from noaa_metrics.partitions import (
+    PartitionFormat,
+    partition_filepath,
+    read_partition,
+    write_partition,
+)
+from noaa_metrics.util.batches import RecordBatch
+from noaa_metrics.util.dataclasses import ProcessedLogFields
+
+DATE = dt.date(2023, 1, 1)
+RECORDS = [
+    ProcessedLogFields(
+        date=DATE,
+        ip_address=f"10.0.0.{index % 3}",
+        download_bytes=index * 1024,
+        dataset=dataset,
+        file_path=f"/usr/share/nginx/html/NOAA/{dataset}/file{index}.nc",
+        ip_location=location,
+    )
+    for index, (dataset, location) in enumerate(
+        [
+            ("G00001", "us"),
+            ("G00002", "ca"),
+            ("G00001", "ca"),
+            ("G00003", "Unknown"),
+            ("G00001", "us"),
+        ]
+    )
+]
+COLUMNS = ["date", "ip_address", "download_bytes", "dataset", "ip_location"]
+
+
+@pytest.mark.parametrize("partition_format", list(PartitionFormat))
+@pytest.mark.parametrize("dataset", [None, "G00001", "G00004"])
+def test_read_partition_dataset(tmp_path, partition_format, dataset):
+    filepath = partition_filepath(
+        DATE, partition_format=partition_format, output_dir=tmp_path
+    )
+    write_partition(
+        RecordBatch.from_records(ProcessedLogFields, RECORDS), filepath=filepath
+    )
+
+    data = read_partition(filepath, columns=COLUMNS, dataset=dataset)
+
+    expected = [
+        record for record in RECORDS if dataset is None or record.dataset == dataset
+    ]
+    assert list(data.columns) == COLUMNS
+    # Parquet rows are ordered by dataset.
+    assert sorted(data["download_bytes"]) == [
+        record.download_bytes for record in expected
+    ]
+    assert (data["date"] == DATE.isoformat()).all()
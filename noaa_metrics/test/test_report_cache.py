@@ -0,0 +1,103 @@
+import datetime as dt
+import os
+from typing import Any
+
+import pandas as pd
+import pytest
+
+from noaa_metrics.report_cache import ReportCache, report_cache_key
+
+START_DATE = dt.date(2023, 1, 1)
+END_DATE = dt.date(2023, 1, 31)
+OPTIONS: dict[str, Any] = {
+    "start_date": START_DATE,
+    "end_date": END_DATE,
+    "dataset": "all",
+    "approximate_users": None,
+    "from_rollups": False,
+}
+TABLES = tuple(
+    pd.DataFrame(
+        [[3, 10, 1.5], [1, 2, 0.25]],
+        index=pd.Index([f"{name}1", "Total"], name=name),
+        columns=["Distinct Users", "Files Sent", "Download Volume (MB)"],
+    )
+    for name in ["Summary", "Date", "Dataset", "Domain"]
+)
+
+
+@pytest.fixture
+def partition(tmp_path):
+    filepath = tmp_path / "noaa-metrics-2023-01-01.json"
+    filepath.write_text('[{"ip_address": "10.0.0.1"}]')
+    os.utime(filepath, ns=(1_000_000_000, 1_000_000_000))
+    return filepath
+
+
+def test_cached_tables_are_reused(tmp_path, partition):
+    cache = ReportCache(tmp_path / "cache")
+    key = report_cache_key([partition], **OPTIONS)
+    cache.set(key, TABLES)
+
+    tables = ReportCache(tmp_path / "cache").get(
+        report_cache_key([partition], **OPTIONS)
+    )
+
+    assert tables is not None
+    for table, expected in zip(tables, TABLES):
+        pd.testing.assert_frame_equal(table, expected)
+
+
+@pytest.mark.parametrize(
+    "content, mtime_ns",
+    [
+        # A new size
+        ('[{"ip_address": "10.0.0.1"}, {"ip_address": "10.0.0.2"}]', 1_000_000_000),
+        # The same size, but a new modification time
+        ('[{"ip_address": "10.0.0.3"}]', 2_000_000_000),
+    ],
+)
+def test_rewritten_inputs_miss_the_cache(tmp_path, partition, content, mtime_ns):
+    cache = ReportCache(tmp_path / "cache")
+    cache.set(report_cache_key([partition], **OPTIONS), TABLES)
+
+    partition.write_text(content)
+    os.utime(partition, ns=(mtime_ns, mtime_ns))
+
+    assert cache.get(report_cache_key([partition], **OPTIONS)) is None
+
+
+@pytest.mark.parametrize(
+    "option, value",
+    [
+        ("start_date", dt.date(2023, 1, 2)),
+        ("end_date", dt.date(2023, 1, 30)),
+        ("dataset", "G00001"),
+        ("approximate_users", 0.01),
+        ("from_rollups", True),
+    ],
+)
+def test_other_options_miss_the_cache(tmp_path, partition, option, value):
+    cache = ReportCache(tmp_path / "cache")
+    cache.set(report_cache_key([partition], **OPTIONS), TABLES)
+
+    options = {**OPTIONS, option: value}
+
+    assert cache.get(report_cache_key([partition], **options)) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache_dir = tmp_path / "cache"
+    ReportCache(cache_dir).set("a", TABLES)
+    entry_bytes = os.path.getsize(cache_dir / "a.json")
+    # Room for two entries
+    cache = ReportCache(cache_dir, max_bytes=2 * entry_bytes)
+    cache.set("b", TABLES)
+    os.utime(cache_dir / "a.json", ns=(1_000_000_000, 1_000_000_000))
+    os.utime(cache_dir / "b.json", ns=(2_000_000_000, 2_000_000_000))
+
+    # Using "a" makes "b" the least recently used.
+    assert cache.get("a") is not None
+    cache.set("c", TABLES)
+
+    assert sorted(path.name for path in cache_dir.iterdir()) == ["a.json", "c.json"]
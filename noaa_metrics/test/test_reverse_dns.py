@@ -0,0 +1,151 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from noaa_metrics.constants.country_codes import COUNTRY_CODES
+from noaa_metrics.reverse_dns import DnsCache, resolve_ip_locations
+from noaa_metrics.run_metrics import record_run
+
+UNRECOGNIZED = COUNTRY_CODES[""]
+HOSTNAMES = {
+    "10.0.0.1": "host.example.us",
+    "10.0.0.2": "host.example.ca",
+}
+
+
+class FakeResolver:
+    """Resolves `HOSTNAMES`, and counts the lookups of each address."""
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, ip_address: str) -> str:
+        with self._lock:
+            self.calls[ip_address] = self.calls.get(ip_address, 0) + 1
+        try:
+            return HOSTNAMES[ip_address]
+        except KeyError:
+            raise socket.herror(1, "Unknown host") from None
+
+
+def test_resolves_each_distinct_address_once():
+    resolver = FakeResolver()
+
+    ip_locations = resolve_ip_locations(
+        ["10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.1", "10.0.0.3"],
+        cache=DnsCache(None),
+        resolver=resolver,
+    )
+
+    assert ip_locations == {
+        "10.0.0.1": COUNTRY_CODES["us"],
+        "10.0.0.2": COUNTRY_CODES["ca"],
+        "10.0.0.3": UNRECOGNIZED,
+    }
+    assert resolver.calls == {"10.0.0.1": 1, "10.0.0.2": 1, "10.0.0.3": 1}
+
+
+def test_cached_addresses_are_not_looked_up():
+    cache = DnsCache(None)
+    cache.set("10.0.0.1", "Cached")
+    resolver = FakeResolver()
+
+    with record_run("ingest") as run:
+        ip_locations = resolve_ip_locations(
+            ["10.0.0.1", "10.0.0.2"], cache=cache, resolver=resolver
+        )
+
+    assert ip_locations == {"10.0.0.1": "Cached", "10.0.0.2": COUNTRY_CODES["ca"]}
+    assert resolver.calls == {"10.0.0.2": 1}
+    assert run.counters["dns_cache_hits"] == 1
+    assert run.counters["dns_cache_misses"] == 1
+    assert cache.get("10.0.0.2") == COUNTRY_CODES["ca"]
+
+
+def test_addresses_without_hostname_are_cached_for_the_negative_ttl(tmp_path):
+    cache = DnsCache(tmp_path / "dns-cache.json", ttl=1000, negative_ttl=10)
+
+    before = time.time()
+    resolve_ip_locations(["10.0.0.1", "10.0.0.3"], cache=cache, resolver=FakeResolver())
+    cache.save()
+
+    entries = json.loads((tmp_path / "dns-cache.json").read_text())
+    assert entries["10.0.0.3"][0] == UNRECOGNIZED
+    assert before + 10 <= entries["10.0.0.3"][1] < before + 1000
+    assert entries["10.0.0.1"][1] >= before + 1000
+
+
+@pytest.mark.parametrize(
+    "error", [socket.gaierror(socket.EAI_AGAIN, "Temporary failure"), TimeoutError()]
+)
+def test_failed_lookups_are_unrecognized_and_not_cached(error):
+    def resolver(ip_address: str) -> str:
+        if ip_address == "10.0.0.2":
+            raise error
+        return HOSTNAMES[ip_address]
+
+    cache = DnsCache(None)
+
+    with record_run("ingest") as run:
+        ip_locations = resolve_ip_locations(
+            ["10.0.0.1", "10.0.0.2"], cache=cache, resolver=resolver
+        )
+
+    assert ip_locations == {"10.0.0.1": COUNTRY_CODES["us"], "10.0.0.2": UNRECOGNIZED}
+    assert run.counters["dns_lookup_errors"] == 1
+    assert cache.get("10.0.0.1") == COUNTRY_CODES["us"]
+    assert cache.get("10.0.0.2") is None
+
+
+def test_lookups_that_time_out_are_unrecognized_and_not_cached():
+    released = threading.Event()
+
+    def resolver(ip_address: str) -> str:
+        if ip_address == "10.0.0.2":
+            released.wait()
+        return HOSTNAMES[ip_address]
+
+    cache = DnsCache(None)
+    try:
+        with record_run("ingest") as run:
+            start = time.monotonic()
+            ip_locations = resolve_ip_locations(
+                ["10.0.0.1", "10.0.0.2"], cache=cache, resolver=resolver, timeout=0.1
+            )
+            seconds = time.monotonic() - start
+    finally:
+        released.set()
+
+    assert ip_locations == {"10.0.0.1": COUNTRY_CODES["us"], "10.0.0.2": UNRECOGNIZED}
+    assert seconds < 2
+    assert run.counters["dns_lookup_timeouts"] == 1
+    assert cache.get("10.0.0.2") is None
+
+
+def test_unexpected_resolver_errors_are_raised():
+    def resolver(ip_address: str) -> str:
+        raise ValueError(ip_address)
+
+    with pytest.raises(ValueError):
+        resolve_ip_locations(["10.0.0.1"], cache=DnsCache(None), resolver=resolver)
+
+
+def test_cache_round_trip_drops_expired_entries(tmp_path):
+    filepath = tmp_path / "dns-cache.json"
+    cache = DnsCache(filepath, ttl=1000, negative_ttl=-1)
+    cache.set("10.0.0.1", COUNTRY_CODES["us"])
+    cache.set("10.0.0.3", UNRECOGNIZED, negative=True)
+
+    # Expired as soon as it was set
+    assert cache.get("10.0.0.3") is None
+    cache.set("10.0.0.3", UNRECOGNIZED, negative=True)
+    cache.save()
+    loaded = DnsCache(filepath)
+
+    assert len(loaded) == 1
+    assert loaded.get("10.0.0.1") == COUNTRY_CODES["us"]
+    assert loaded.get("10.0.0.3") is None
@@ -0,0 +1,115 @@
+import datetime as dt
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from noaa_metrics.aggregate_logs import AggregateBy
+from noaa_metrics.partitions import PartitionFormat, partition_filepath, write_partition
+from noaa_metrics.serve import MetricsServer, MetricsStore
+from noaa_metrics.util.batches import RecordBatch
+from noaa_metrics.util.dataclasses import ProcessedLogFields
+
+DAY1 = dt.date(2023, 1, 1)
+DAY2 = dt.date(2023, 1, 2)
+
+
+def _write_day(output_dir, date, downloads):
+    records = [
+        ProcessedLogFields(
+            date=date,
+            ip_address=ip_address,
+            download_bytes=download_bytes,
+            dataset=dataset,
+            file_path=f"/usr/share/nginx/html/NOAA/{dataset}/file.nc",
+            ip_location="us",
+        )
+        for ip_address, dataset, download_bytes in downloads
+    ]
+    write_partition(
+        RecordBatch.from_records(ProcessedLogFields, records),
+        filepath=partition_filepath(
+            date, partition_format=PartitionFormat.JSON, output_dir=output_dir
+        ),
+    )
+
+
+def _downloads_by_dataset(store, **kwargs):
+    table = store.downloads_by(AggregateBy.DATASET, **kwargs)
+    return table.to_dict("index")
+
+
+def test_store_selects_dates_and_dataset(tmp_path):
+    _write_day(tmp_path, DAY1, [("10.0.0.1", "G00001", 10), ("10.0.0.2", "G00002", 20)])
+    _write_day(tmp_path, DAY2, [("10.0.0.1", "G00001", 30), ("10.0.0.3", "G00001", 40)])
+    store = MetricsStore(tmp_path)
+
+    assert store.refresh()
+    assert not store.refresh()
+    assert store.dates() == [DAY1, DAY2]
+    assert _downloads_by_dataset(store, start_date=DAY1, end_date=DAY2) == {
+        "G00001": {
+            "Distinct Users": 2,
+            "Files Sent": 3,
+            "Download Volume (MB)": 80,
+        },
+        "G00002": {"Distinct Users": 1, "Files Sent": 1, "Download Volume (MB)": 20},
+        "Total": {"Distinct Users": 3, "Files Sent": 4, "Download Volume (MB)": 100},
+    }
+    summary = store.summary(start_date=DAY2, end_date=DAY2, dataset="G00002")
+    assert summary["Values"].tolist() == [0, 0, 0]
+    summary = store.summary(start_date=DAY1, end_date=DAY2, dataset="G00001")
+    assert summary["Values"].tolist() == [3, 80, 2]
+
+
+def test_server_refreshes_in_background(tmp_path):
+    _write_day(tmp_path, DAY1, [("10.0.0.1", "G00001", 10)])
+    store = MetricsStore(tmp_path)
+    store.refresh()
+
+    with MetricsServer(("127.0.0.1", 0), store, refresh_seconds=0.01):
+        _write_day(tmp_path, DAY2, [("10.0.0.2", "G00001", 20)])
+        deadline = time.monotonic() + 5
+        while store.dates() != [DAY1, DAY2] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert store.dates() == [DAY1, DAY2]
+    summary = store.summary(start_date=DAY1, end_date=DAY2)
+    assert summary["Values"].tolist() == [2, 30, 2]
+
+
+def _get(server, path):
+    host, port = server.server_address
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}{path}") as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_server_answers_errors_with_json(tmp_path, monkeypatch):
+    _write_day(tmp_path, DAY1, [("10.0.0.1", "G00001", 10)])
+    store = MetricsStore(tmp_path)
+    store.refresh()
+
+    def fail(**kwargs):
+        raise RuntimeError("Broken")
+
+    with MetricsServer(("127.0.0.1", 0), store, refresh_seconds=60) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            ok = _get(server, "/summary")
+            bad_request = _get(server, "/downloads?by=nothing")
+            not_found = _get(server, "/nothing")
+            monkeypatch.setattr(store, "summary", fail)
+            server_error = _get(server, "/summary")
+        finally:
+            server.shutdown()
+            thread.join()
+
+    assert ok[0] == 200
+    assert bad_request[0] == 400
+    assert not_found == (404, {"error": "Not found."})
+    assert server_error == (500, {"error": "Internal server error."})
@@ -0,0 +1,221 @@
+import datetime as dt
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import fields
+from typing import Any, Generic, TypeVar, Union
+
+Record = TypeVar("Record")
+
+
+class DateColumn:
+    """Dates stored as 32-bit ordinals."""
+
+    def __init__(self) -> None:
+        self.ordinals = array("i")
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def __getitem__(self, index: int) -> dt.date:
+        return dt.date.fromordinal(self.ordinals[index])
+
+    def __iter__(self) -> Iterator[dt.date]:
+        return map(dt.date.fromordinal, self.ordinals)
+
+    def append(self, date: dt.date) -> None:
+        self.ordinals.append(date.toordinal())
+
+    def extend(self, dates: Iterable[dt.date]) -> None:
+        if isinstance(dates, DateColumn):
+            self.ordinals.extend(dates.ordinals)
+        else:
+            self.ordinals.extend(date.toordinal() for date in dates)
+
+    def take(self, indexes: Sequence[int]) -> "DateColumn":
+        column = DateColumn()
+        ordinals = self.ordinals
+        column.ordinals = array("i", [ordinals[index] for index in indexes])
+        return column
+
+
+class IntColumn:
+    """64-bit integers."""
+
+    def __init__(self) -> None:
+        self.values = array("q")
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: int) -> int:
+        return self.values[index]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.values)
+
+    def append(self, value: int) -> None:
+        self.values.append(value)
+
+    def extend(self, values: Iterable[int]) -> None:
+        self.values.extend(values.values if isinstance(values, IntColumn) else values)
+
+    def take(self, indexes: Sequence[int]) -> "IntColumn":
+        column = IntColumn()
+        values = self.values
+        column.values = array("q", [values[index] for index in indexes])
+        return column
+
+
+class StringColumn:
+    """Dictionary-encoded strings: each distinct string is stored once, and each row
+    as a 32-bit code into `values`."""
+
+    def __init__(self) -> None:
+        self.codes = array("i")
+        self.values: list[str] = []
+        self._codes_by_value: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[self.codes[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        values = self.values
+        return (values[code] for code in self.codes)
+
+    def _code(self, value: str) -> int:
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = self._codes_by_value[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value: str) -> None:
+        self.codes.append(self._code(value))
+
+    def encode(self, values: Iterable[str]) -> list[int]:
+        """Get the code of each of `values`, adding those not seen before."""
+        return [self._code(value) for value in values]
+
+    def extend(self, values: Iterable[str]) -> None:
+        if isinstance(values, StringColumn):
+            # Only the distinct values need looking up.
+            recoded = [self._code(value) for value in values.values]
+            self.codes.extend(recoded[code] for code in values.codes)
+        else:
+            self.codes.extend(self._code(value) for value in values)
+
+    def take(self, indexes: Sequence[int]) -> "StringColumn":
+        column = StringColumn()
+        values, codes = self.values, self.codes
+        column.extend(values[codes[index]] for index in indexes)
+        return column
+
+    def map(self, func: Callable[[str], str]) -> "StringColumn":
+        """Apply `func` to every row, calling it once per distinct value."""
+        column = StringColumn()
+        mapped = [column._code(func(value)) for value in self.values]
+        column.codes = array("i", [mapped[code] for code in self.codes])
+        return column
+
+    def count(self, value: str) -> int:
+        code = self._codes_by_value.get(value)
+        return 0 if code is None else self.codes.count(code)
+
+
+Column = Union[DateColumn, IntColumn, StringColumn]
+
+_COLUMN_TYPES: dict[Any, type] = {
+    dt.date: DateColumn,
+    int: IntColumn,
+    str: StringColumn,
+}
+
+
+class RecordBatch(Generic[Record]):
+    """A batch of dataclass records, stored column by column in compact arrays.
+
+    Holding millions of records as objects takes an object, a `__dict__` and copies
+    of every string per record. Batches are built, filtered and written without
+    creating records; iterate over one to get them back.
+    """
+
+    def __init__(self, record_type: type[Record]) -> None:
+        self.record_type = record_type
+        self.columns: dict[str, Column] = {
+            field.name: _COLUMN_TYPES[field.type]()
+            for field in fields(record_type)  # type: ignore[arg-type]
+        }
+
+    @classmethod
+    def from_records(
+        cls, record_type: type[Record], records: Iterable[Record]
+    ) -> "RecordBatch[Record]":
+        batch = cls(record_type)
+        batch.extend(records)
+        return batch
+
+    @classmethod
+    def from_dicts(
+        cls, record_type: type[Record], record_dicts: Iterable[dict]
+    ) -> "RecordBatch[Record]":
+        batch = cls(record_type)
+        for record_dict in record_dicts:
+            for name, column in batch.columns.items():
+                column.append(record_dict[name])
+        return batch
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def __iter__(self) -> Iterator[Record]:
+        return (
+            self.record_type(**dict(zip(self.columns, row)))
+            for row in zip(*self.columns.values())
+        )
+
+    def append(self, record: Record) -> None:
+        for name, column in self.columns.items():
+            column.append(getattr(record, name))
+
+    def extend(self, records: Iterable[Record]) -> None:
+        for record in records:
+            self.append(record)
+
+    def extend_batch(self, other: "RecordBatch[Record]") -> None:
+        for name, column in self.columns.items():
+            column.extend(other.columns[name])  # type: ignore[arg-type]
+
+    def take(self, indexes: Sequence[int]) -> "RecordBatch[Record]":
+        """Get the records at `indexes`, in that order."""
+        batch = RecordBatch(self.record_type)
+        batch.columns = {
+            name: column.take(indexes) for name, column in self.columns.items()
+        }
+        return batch
+
+    def indexes_by(self, name: str) -> dict[Any, list[int]]:
+        """Group the indexes of the records by the value of one column."""
+        column = self.columns[name]
+        codes: Iterable[int]
+        decode: Callable[[int], Any]
+        if isinstance(column, DateColumn):
+            codes, decode = column.ordinals, dt.date.fromordinal
+        elif isinstance(column, StringColumn):
+            codes, decode = column.codes, column.values.__getitem__
+        else:
+            codes, decode = column.values, int
+
+        indexes_by_code: dict[int, list[int]] = {}
+        for index, code in enumerate(codes):
+            indexes = indexes_by_code.get(code)
+            if indexes is None:
+                indexes = indexes_by_code[code] = []
+            indexes.append(index)
+        return {decode(code): indexes for code, indexes in indexes_by_code.items()}
+
+    def to_dicts(self) -> list[dict]:
+        names = list(self.columns)
+        return [dict(zip(names, row)) for row in zip(*self.columns.values())]
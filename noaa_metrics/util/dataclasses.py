@@ -1,8 +1,10 @@
 import datetime as dt
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class RawLogFields:
     date: dt.date
     ip_address: str
@@ -11,7 +13,7 @@ class RawLogFields:
     status: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessedLogFields:
     date: dt.date
     ip_address: str
@@ -25,3 +27,74 @@ class ProcessedLogFields:
 class YearMonth:
     month: int
     year: int
+
+
+@dataclass
+class IngestCheckpoint:
+    """How far into the download log the last incremental ingest got."""
+
+    inode: int
+    # Just past the last complete line ingested.
+    offset: int
+    # Of the last complete line ingested; None if nothing was ingested yet.
+    last_timestamp: Optional[dt.datetime]
+
+
+@dataclass
+class RollupFields:
+    """Downloads of one dataset from one location on one day."""
+
+    date: dt.date
+    dataset: str
+    ip_location: str
+    files: int
+    download_bytes: int
+    ip_addresses: list[str]
+    # Serialized `HyperLogLog` of `ip_addresses`; None for rollups of few addresses
+    # and those written before sketches were added.
+    ip_sketch: Optional[str] = None
+
+
+@dataclass
+class LogSource:
+    """A download log file and the times of its first and last lines."""
+
+    log_file: Path
+    first_timestamp: dt.datetime
+    # None when the end can't be told without reading the whole file.
+    last_timestamp: Optional[dt.datetime]
+
+
+@dataclass
+class ReportSpec:
+    """One report of a batch: the downloads of a dataset over a period."""
+
+    # A dataset name, "all", or "each" for one report per dataset with downloads.
+    dataset: str
+    start_date: dt.date
+    end_date: dt.date
+
+
+@dataclass
+class BenchStage:
+    """How long one stage of a benchmark took, and the memory used by then."""
+
+    name: str
+    seconds: float
+    # Log lines or downloads handled by the stage.
+    rows: int
+    # The most the process has held up to the end of the stage.
+    peak_rss_bytes: int
+
+
+@dataclass
+class StageMetrics:
+    """Time and records of one stage of an `ingest` or `report` run."""
+
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    # None for stages that don't count their records
+    records_in: Optional[int] = None
+    records_out: Optional[int] = None
+    # The most the process has held up to the end of the stage
+    peak_rss_bytes: int = 0
@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import math
+import zlib
+from collections.abc import Iterable
+from typing import Optional
+
+# Precisions below 11 would need more than 53 bits of hash per register, which the
+# vectorized pandas path can't compute exactly.
+MIN_PRECISION = 11
+MAX_PRECISION = 16
+# About 0.8% standard error in 16KiB.
+DEFAULT_PRECISION = 14
+
+_HASH_BITS = 64
+
+
+def hash_value(value: str) -> int:
+    """Hash a value to 64 bits, the same way in every process and run."""
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=_HASH_BITS // 8).digest(), "big"
+    )
+
+
+def precision_for_error(error: float) -> int:
+    """Get the smallest precision with a standard error of at most `error`."""
+    precision = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(precision, MIN_PRECISION), MAX_PRECISION)
+
+
+def _alpha(registers_count: int) -> float:
+    return 0.7213 / (1 + 1.079 / registers_count)
+
+
+class HyperLogLog:
+    """Mergeable sketch for approximately counting distinct values.
+
+    Uses 2**precision one-byte registers, for a standard error of about
+    1.04 / sqrt(2**precision). Sketches of the same values merge to the sketch of
+    their union, so they can be stored per day and unioned over any period.
+    """
+
+    def __init__(
+        self, precision: int = DEFAULT_PRECISION, registers: Optional[bytearray] = None
+    ) -> None:
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(
+                f"Precision must be from {MIN_PRECISION} to {MAX_PRECISION}, got"
+                f" {precision}."
+            )
+        self.precision = precision
+        self.registers = (
+            registers if registers is not None else bytearray(2**precision)
+        )
+
+    def add_hash(self, value_hash: int) -> None:
+        index_bits = _HASH_BITS - self.precision
+        index = value_hash >> index_bits
+        rest = value_hash & ((1 << index_bits) - 1)
+        rank = index_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value: str) -> None:
+        self.add_hash(hash_value(value))
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Add the values counted by `other`, at the lower of the two precisions."""
+        if other.precision < self.precision:
+            reduced = self.reduce(other.precision)
+            self.precision, self.registers = reduced.precision, reduced.registers
+        elif other.precision > self.precision:
+            other = other.reduce(self.precision)
+
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def reduce(self, precision: int) -> "HyperLogLog":
+        """Fold the sketch down to a lower precision, as if it had been built at it."""
+        if precision >= self.precision:
+            return self
+
+        dropped_bits = self.precision - precision
+        reduced = HyperLogLog(precision)
+        for index, rank in enumerate(self.registers):
+            if rank == 0:
+                continue
+            # The dropped index bits become the leading bits of the rest of the hash.
+            dropped = index & ((1 << dropped_bits) - 1)
+            if dropped:
+                rank = dropped_bits - dropped.bit_length() + 1
+            else:
+                rank += dropped_bits
+            reduced_index = index >> dropped_bits
+            if rank > reduced.registers[reduced_index]:
+                reduced.registers[reduced_index] = rank
+        return reduced
+
+    def count(self) -> int:
+        registers_count = len(self.registers)
+        estimate = (
+            _alpha(registers_count)
+            * registers_count**2
+            / sum(2.0**-rank for rank in self.registers)
+        )
+        empty_registers = self.registers.count(0)
+        if estimate <= 2.5 * registers_count and empty_registers:
+            # Linear counting is more accurate for small counts.
+            estimate = registers_count * math.log(registers_count / empty_registers)
+        return round(estimate)
+
+    def to_string(self) -> str:
+        """Serialize the sketch compactly; mostly empty sketches compress well."""
+        compressed = zlib.compress(bytes(self.registers))
+        return f"{self.precision}:{base64.b64encode(compressed).decode()}"
+
+    @classmethod
+    def from_string(cls, sketch: str) -> "HyperLogLog":
+        precision, compressed = sketch.split(":", 1)
+        registers = bytearray(zlib.decompress(base64.b64decode(compressed)))
+        return cls(int(precision), registers)
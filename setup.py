@@ -8,6 +8,7 @@ setup(
     author="National Snow and Ice Data Center",
     author_email="nsidc@nsidc.org",
     packages=find_packages(),
+    package_data={"noaa_metrics": ["constants/*.json"]},
     entry_points={"console_scripts": ["noaa_metrics = noaa_metrics.cli:cli"]},
     include_package_data=True,
 )
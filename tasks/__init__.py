@@ -2,9 +2,10 @@
 
 from invoke import Collection
 
-from . import env, format, test
+from . import benchmark, env, format, test
 
 ns = Collection()
 ns.add_collection(format)
 ns.add_collection(test)
 ns.add_collection(env)
+ns.add_collection(benchmark)
@@ -0,0 +1,237 @@
+import sys
+import time
+
+from invoke import task
+
+from .util import PROJECT_DIR, print_and_run
+
+sys.path.append(str(PROJECT_DIR))
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@task(
+    help={
+        "rows": "Number of download records.",
+        "users": "Number of distinct IP addresses.",
+        "groups": "Number of datasets to group by.",
+        "error": "Relative error of the approximate counts.",
+    }
+)
+def distinct_users(ctx, rows=2_000_000, users=200_000, groups=50, error=0.01):
+    """Compare approximate (HyperLogLog) against exact distinct user counts."""
+    import numpy as np
+    import pandas as pd
+
+    from noaa_metrics.aggregate_logs import AggregateBy, downloads_by
+
+    rng = np.random.default_rng(0)
+    log_df = pd.DataFrame(
+        {
+            "ip_address": pd.Series(
+                [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(users)]
+            ).iloc[rng.integers(0, users, rows)],
+            "dataset": rng.integers(0, groups, rows).astype(str),
+            "file_path": "/usr/share/nginx/html/NOAA/G02158/file.tar",
+            "download_bytes": rng.integers(1, 10**7, rows),
+        }
+    )
+
+    exact, exact_seconds = _timed(
+        downloads_by, log_df, AggregateBy.DATASET, column_header="Dataset"
+    )
+    approximate, approximate_seconds = _timed(
+        downloads_by,
+        log_df,
+        AggregateBy.DATASET,
+        column_header="Dataset",
+        approximate_users=float(error),
+    )
+
+    exact_users = exact["Distinct Users"].drop("Total")
+    approximate_users = approximate["Distinct Users"].drop("Total")
+    relative_errors = (approximate_users - exact_users).abs() / exact_users
+    print(f"{rows} rows, {users} users, {groups} groups")
+    print(f"Exact:       {exact_seconds:.3f}s")
+    print(f"Approximate: {approximate_seconds:.3f}s (target error {error})")
+    print(
+        f"Relative error: mean {relative_errors.mean():.4f},"
+        f" max {relative_errors.max():.4f}"
+    )
+
+
+def _access_log_lines(lines):
+    """Generate access log lines, a mix of ones that are and aren't converted."""
+    import random
+
+    rng = random.Random(0)
+    requests = [
+        "GET /NOAA/G02158/unmasked/2025/01_Jan/SNODAS_unmasked_20250103.tar HTTP/1.1",
+        "GET /NOAA/G02135/north/daily/data/N_seaice_extent_daily_v3.0.csv HTTP/1.1",
+        "GET /NOAA/G02158/unmasked/2025/01_Jan/ HTTP/1.1",
+        "GET /NOAA/G10010/file.nc?download=1 HTTP/1.1",
+        "HEAD /NOAA/G02158/unmasked/2025/01_Jan/SNODAS_unmasked_20250103.tar HTTP/1.1",
+        "POST /login HTTP/1.1",
+        "GET /robots.txt HTTP/1.1",
+        "-",
+    ]
+    for i in range(lines):
+        ip_address = f"10.{i % 7}.{i % 251}.{i % 13}"
+        timestamp = (
+            f"[04/Jan/2025:{i // 3600 % 24:02}:{i // 60 % 60:02}:{i % 60:02} +0000]"
+        )
+        request = rng.choice(requests)
+        status = rng.choice(["200", "206", "304", "404"])
+        yield (
+            f'{ip_address} - - {timestamp} "{request}" {status} {rng.randrange(10**8)}'
+            f' "-" "Wget/1.19.4 (linux-gnu)" "{ip_address}"\n'
+        )
+
+
+@task(
+    help={
+        "lines": "Number of access log lines.",
+        "repeat": "Times to repeat the Python conversion, to time it reliably.",
+    }
+)
+def convert(ctx, lines=20_000, repeat=20):
+    """Compare `noaa_metrics convert` against `scripts/parse_nginx_lines.sh`."""
+    import io
+    import subprocess
+    import tempfile
+    from pathlib import Path
+
+    from noaa_metrics.convert_logs import convert_logs
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        access_log_file = Path(tmp_dir) / "access.log"
+        with open(access_log_file, "w") as f:
+            f.writelines(_access_log_lines(lines))
+
+        script = PROJECT_DIR / "scripts" / "parse_nginx_lines.sh"
+        script_result, script_seconds = _timed(
+            subprocess.run,
+            ["bash", str(script), str(access_log_file)],
+            capture_output=True,
+            check=True,
+        )
+
+        python_seconds = float("inf")
+        for _ in range(repeat):
+            download_log = io.BytesIO()
+            _, seconds = _timed(convert_logs, [access_log_file], download_log)
+            python_seconds = min(python_seconds, seconds)
+
+    if download_log.getvalue() != script_result.stdout:
+        raise RuntimeError("The converted logs differ from the script's.")
+
+    converted_lines = len(script_result.stdout.splitlines())
+    print(f"{lines} lines, {converted_lines} converted")
+    print(f"Script: {script_seconds:.3f}s ({lines / script_seconds:,.0f} lines/s)")
+    print(f"Python: {python_seconds:.4f}s ({lines / python_seconds:,.0f} lines/s)")
+    print(f"Speedup: {script_seconds / python_seconds:,.0f}x")
+
+
+@task(
+    help={
+        "rows": "Number of download records.",
+        "users": "Number of distinct IP addresses.",
+        "days": "Number of days.",
+        "datasets": "Number of datasets.",
+        "locations": "Number of locations.",
+    }
+)
+def aggregate(ctx, rows=2_000_000, users=200_000, days=31, datasets=50, locations=100):
+    """Compare single-pass report aggregation against a `groupby` per table."""
+    import numpy as np
+    import pandas as pd
+
+    from noaa_metrics.aggregate_logs import (
+        AggregateBy,
+        aggregate_downloads,
+        downloads_by,
+        format_downloads_by,
+        get_summary_stats,
+    )
+
+    rng = np.random.default_rng(0)
+    ip_addresses = pd.Series(
+        [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(users)]
+    )
+    log_df = pd.DataFrame(
+        {
+            "date": pd.Timestamp("2023-01-01")
+            + pd.to_timedelta(np.sort(rng.integers(0, days, rows)), unit="D"),
+            "ip_address": ip_addresses.iloc[rng.integers(0, users, rows)].to_numpy(),
+            "download_bytes": rng.integers(1, 10**7, rows),
+            "dataset": rng.integers(0, datasets, rows).astype(str).astype(object),
+            "file_path": "/usr/share/nginx/html/NOAA/G02158/file.tar",
+            "ip_location": rng.integers(0, locations, rows).astype(str).astype(object),
+        }
+    )
+    headers = {
+        AggregateBy.DATASET: "Dataset",
+        AggregateBy.DATE: "Date",
+        AggregateBy.TLD: "Domain",
+    }
+
+    def separate_passes():
+        summary_df = get_summary_stats(log_df)
+        return summary_df, {
+            by: downloads_by(log_df, by, column_header=header)
+            for by, header in headers.items()
+        }
+
+    def single_pass():
+        summary_df, tables = aggregate_downloads(log_df)
+        return summary_df, {
+            by: format_downloads_by(tables[by], by, column_header=header)
+            for by, header in headers.items()
+        }
+
+    _, separate_seconds = _timed(separate_passes)
+    _, single_seconds = _timed(single_pass)
+
+    print(f"{rows} rows, {users} users, {days} days, {datasets} datasets,", end=" ")
+    print(f"{locations} locations")
+    print(f"Separate passes: {separate_seconds:.3f}s")
+    print(f"Single pass:     {single_seconds:.3f}s")
+    print(f"Speedup: {separate_seconds / single_seconds:.1f}x")
+
+
+@task(
+    help={
+        "days": "Number of days in the synthetic log.",
+        "lines_per_day": "Number of log lines per day.",
+        "users": "Number of distinct IP addresses.",
+        "datasets": "Number of distinct datasets.",
+        "baseline": "JSON file of an earlier run to compare against.",
+        "save_baseline": "Save this run to a JSON file.",
+    }
+)
+def suite(
+    ctx,
+    days=3,
+    lines_per_day=100_000,
+    users=20_000,
+    datasets=50,
+    baseline=None,
+    save_baseline=None,
+):
+    """Time each stage of ingest and report on a synthetic log.
+
+    Fails if a stage got slower than in `baseline`.
+    """
+    cmd = (
+        f"cd {PROJECT_DIR} && python -m noaa_metrics.cli bench --days {days}"
+        f" --lines-per-day {lines_per_day} --users {users} --datasets {datasets}"
+    )
+    if baseline:
+        cmd += f" --baseline {baseline}"
+    if save_baseline:
+        cmd += f" --save-baseline {save_baseline}"
+    print_and_run(cmd)
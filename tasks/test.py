@@ -1,6 +1,11 @@
+import configparser
+import shutil
+import subprocess
 import sys
+import time
 
 from invoke import task
+from invoke.exceptions import Exit
 
 from .util import PROJECT_DIR, print_and_run
 
@@ -16,9 +21,77 @@ def typecheck(ctx):
     print("🎉🦆 Type checking passed.")
 
 
+@task(aliases=("pytest",))
+def unit(ctx):
+    """Run the unit tests using pytest."""
+    print_and_run(f"pytest {PACKAGE_DIR}/")
+    print("🎉🧪 Unit tests passed.")
+
+
+# Modules too slow to import for every CLI run; commands import them when needed.
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow")
+
+
+def _pinned_python():
+    """Find an interpreter of the Python version the project is pinned to."""
+    mypy_config = configparser.ConfigParser()
+    mypy_config.read(PROJECT_DIR / ".mypy.ini")
+    version = mypy_config["mypy"]["python_version"]
+    if f"{sys.version_info.major}.{sys.version_info.minor}" == version:
+        return sys.executable
+
+    python = shutil.which(f"python{version}")
+    if python is None:
+        raise Exit(f"No Python {version} found on the PATH; pass one with --python.")
+    return python
+
+
+def _run_python(python, *args):
+    result = subprocess.run(
+        [python, *args], cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise Exit(f"`python {' '.join(args)}` failed:\n{result.stderr}")
+    return result.stdout
+
+
+@task(
+    aliases=("imports",),
+    help={
+        "limit": "Most seconds `noaa_metrics --help` may take.",
+        "python": "Interpreter to check with; the project's pinned version by default.",
+    },
+)
+def startup(ctx, limit=0.5, python=None):
+    """Check that the CLI and ingest start without importing heavy modules."""
+    if python is None:
+        python = _pinned_python()
+    print(f"Checking with {python}.")
+
+    check = (
+        "import sys, noaa_metrics.cli, noaa_metrics.ingest_logs;"
+        f" print(*(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    )
+    imported = _run_python(python, "-c", check).split()
+    if imported:
+        raise Exit(f"Importing the CLI imports {', '.join(imported)}.")
+
+    seconds = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        _run_python(python, "-m", "noaa_metrics.cli", "--help")
+        seconds = min(seconds, time.perf_counter() - start)
+    print(f"`noaa_metrics --help` took {seconds:.3f}s.")
+    if seconds > float(limit):
+        raise Exit(f"That's slower than {limit}s.")
+    print("🎉🚀 Startup checks passed.")
+
+
 @task(
     pre=[
         typecheck,
+        unit,
+        startup,
     ],
     default=True,
 )